@@ -2,35 +2,62 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
-from flask_marshmallow import Marshmallow
 from flask_cors import CORS
+from app.config import install_sqlite_pragmas, load_config
+from app.json_provider import OrjsonProvider, orjson
+from app.metrics import init_metrics
 
 db = SQLAlchemy()
-ma = Marshmallow()
 jwt = JWTManager()
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
 
-    # Configuration
-    app.config['SECRET_KEY'] = 'your-secret-key'  # Change in production
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///healthcare.db'  # Use proper DB in production
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['JWT_SECRET_KEY'] = 'jwt-secret-key'  # Change in production
+    # Configuration (defaults, config file, environment, then overrides)
+    load_config(app, config)
 
     # Initialize extensions
     db.init_app(app)
-    ma.init_app(app)
+    with app.app_context():
+        install_sqlite_pragmas(app, db.engines.values())
+        # Per-request latency, SQL and serialization histograms for /metrics
+        init_metrics(app, db.engines.values())
     jwt.init_app(app)
     CORS(app)
 
-    # Register blueprints
-    from app.routes import auth, users, doctors, chambers, visits
-    app.register_blueprint(auth.bp)
-    app.register_blueprint(users.bp)
-    app.register_blueprint(doctors.bp)
-    app.register_blueprint(chambers.bp)
-    app.register_blueprint(visits.bp)
+    # current_user on @jwt_required routes is the cached Identity of the token's user
+    from app.identity import load_identity
+    jwt.user_lookup_loader(load_identity)
+
+    # Add columns, tables and indexes the models gained to databases created before them
+    from app import search  # noqa: F401 - creates the search tables with db.create_all()
+    from app.migrations import ensure_schema
+    ensure_schema(app)
+
+    # Background jobs and the subsystems that queue them
+    from app.jobs import init_jobs
+    from app.payments import init_payments
+    from app.reminders import init_reminders
+    from app import notifications  # noqa: F401 - registers notification jobs
+    init_jobs(app)
+    init_payments(app)
+    init_reminders(app)
+
+    # Register blueprints, now or on the first request (LAZY_BLUEPRINTS)
+    from app.routes import init_blueprints
+    init_blueprints(app)
+
+    # CLI commands
+    from app.cli import analytics_cli, import_cli, jobs_cli, payments_cli, reminders_cli, schema_cli, search_cli
+    app.cli.add_command(search_cli)
+    app.cli.add_command(import_cli)
+    app.cli.add_command(payments_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(reminders_cli)
+    app.cli.add_command(analytics_cli)
+    app.cli.add_command(schema_cli)
 
     return app
\ No newline at end of file
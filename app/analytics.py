@@ -0,0 +1,294 @@
+# app/analytics.py
+"""Per-day doctor and chamber rollups for the reporting endpoints.
+
+``DailyRollup`` rows are adjusted in the same transaction as the writes
+they summarize: visit inserts, updates and deletes through the ORM (an
+after_flush hook subtracts each visit's old contribution and adds its
+new one) and payments as they settle (``record_payment``). Reports read
+only the rollup table.
+
+Writes that bypass the ORM, such as bulk inserts into ``visit``, are not
+seen; ``rebuild`` recomputes the whole table from ``Visit`` and
+``Payment`` (vectorized with NumPy when it is installed) and
+``check_parity`` compares it against GROUP BYs over the raw tables. Run
+the rebuild while visit and payment writes are quiet.
+"""
+from collections import defaultdict
+from datetime import date
+from functools import cache
+
+from sqlalchemy import String, case, cast, event, func, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import DailyRollup, Payment, Visit, db
+
+KEY = ('day', 'doctor_id', 'chamber_id')
+COUNTERS = ('bookings', 'cancellations', 'cost_total', 'costed_visits', 'payment_net')
+CANCELLED = 'cancelled'
+# Visit attributes a rollup row depends on
+TRACKED = ('appointment_time', 'doctor_id', 'chamber_id', 'visit_status', 'visit_cost')
+# Cents; sums of float costs may differ in the last bits between methods
+TOLERANCE = 0.005
+INSERT_BATCH_SIZE = 5000
+# Backends whose insert() has on_conflict_do_update; others update row by row
+UPSERT_DIALECTS = {'postgresql': postgresql, 'sqlite': sqlite}
+
+
+def _cost(value):
+    # Unflushed attributes hold whatever was assigned, e.g. a numeric string
+    try:
+        return None if value is None or isinstance(value, bool) else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _visit_contribution(values, sign, deltas):
+    appointment_time, doctor_id, chamber_id, status, cost = values
+    if appointment_time is None or doctor_id is None or chamber_id is None:
+        return
+    counters = deltas[(appointment_time.date(), doctor_id, chamber_id)]
+    counters['bookings'] += sign
+    counters['cancellations'] += sign * (status == CANCELLED)
+    cost = _cost(cost)
+    if cost is not None:
+        counters['cost_total'] += sign * cost
+        counters['costed_visits'] += sign
+
+
+def _new_deltas():
+    return defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+
+def _apply(connection, deltas):
+    """Add ``{(day, doctor_id, chamber_id): counters}`` onto the rollup rows."""
+    rows = [dict(zip(KEY, key), **counters) for key, counters in deltas.items() if any(counters.values())]
+    if not rows:
+        return
+    table = DailyRollup.__table__
+    dialect = UPSERT_DIALECTS.get(connection.dialect.name)
+    if dialect is None:
+        _update_or_insert(connection, table, rows)
+        return
+    statement = dialect.insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(KEY),
+        set_={name: table.c[name] + statement.excluded[name] for name in COUNTERS}
+    )
+    connection.execute(statement, rows)
+
+
+def _update_or_insert(connection, table, rows):
+    """Row-by-row ``_apply`` for backends without ON CONFLICT DO UPDATE."""
+    for row in rows:
+        key = [table.c[name] == row[name] for name in KEY]
+        added = {name: table.c[name] + row[name] for name in COUNTERS}
+        if connection.execute(update(table).where(*key).values(added)).rowcount:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(insert(table).values(row))
+        except IntegrityError:
+            # Another transaction inserted the row first
+            connection.execute(update(table).where(*key).values(added))
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+# Load the pre-change value of tracked attributes even when they were
+# expired, so the old contribution can be subtracted
+for _name in TRACKED:
+    event.listen(getattr(Visit, _name), 'set', _keep_old_value, active_history=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def _roll_up_visits(session, flush_context):
+    deltas = _new_deltas()
+    for visit in session.new:
+        if isinstance(visit, Visit):
+            _visit_contribution([getattr(visit, name) for name in TRACKED], 1, deltas)
+    for visit in session.dirty:
+        if isinstance(visit, Visit) and session.is_modified(visit):
+            attrs = inspect(visit).attrs
+            old = [attrs[name].history.deleted[0] if attrs[name].history.deleted else getattr(visit, name)
+                   for name in TRACKED]
+            new = [getattr(visit, name) for name in TRACKED]
+            if old != new:
+                _visit_contribution(old, -1, deltas)
+                _visit_contribution(new, 1, deltas)
+    for visit in session.deleted:
+        if isinstance(visit, Visit):
+            _visit_contribution([getattr(visit, name) for name in TRACKED], -1, deltas)
+    if deltas:
+        _apply(session.connection(), deltas)
+
+
+def record_payment(payment_id):
+    """Add a payment that just settled to its day's rollup, in the current transaction."""
+    row = db.session.execute(
+        select(Payment.timestamp, Payment.amount, Visit.doctor_id, Visit.chamber_id)
+        .join(Visit, Visit.id == Payment.visit_id)
+        .where(Payment.id == payment_id)
+    ).first()
+    if row is None or row.doctor_id is None or row.chamber_id is None:
+        return
+    deltas = _new_deltas()
+    deltas[(row.timestamp.date(), row.doctor_id, row.chamber_id)]['payment_net'] = row.amount
+    _apply(db.session.connection(), deltas)
+
+
+def _settled_statuses():
+    from app.payments import COMPLETED, REFUNDED
+    return (COMPLETED, REFUNDED)
+
+
+def _source_columns():
+    """Visit and settled-payment columns for a rebuild, one tuple per column.
+
+    Days come back as ISO strings and cancellations as 0/1 so no Python
+    objects have to be built per row.
+    """
+    visits = db.session.execute(
+        select(cast(func.date(Visit.appointment_time), String), Visit.doctor_id, Visit.chamber_id,
+               case((Visit.visit_status == CANCELLED, 1), else_=0), Visit.visit_cost)
+        .where(Visit.appointment_time.is_not(None), Visit.doctor_id.is_not(None), Visit.chamber_id.is_not(None))
+    ).all()
+    payments = db.session.execute(
+        select(cast(func.date(Payment.timestamp), String), Visit.doctor_id, Visit.chamber_id, Payment.amount)
+        .join(Visit, Visit.id == Payment.visit_id)
+        .where(Payment.status.in_(_settled_statuses()),
+               Visit.doctor_id.is_not(None), Visit.chamber_id.is_not(None))
+    ).all()
+    return list(zip(*visits)) or [()] * 5, list(zip(*payments)) or [()] * 4
+
+
+def _aggregate_python(visits, payments):
+    totals = _new_deltas()
+    for day, doctor_id, chamber_id, cancelled, cost in zip(*visits):
+        counters = totals[(day, doctor_id, chamber_id)]
+        counters['bookings'] += 1
+        counters['cancellations'] += cancelled
+        if cost is not None:
+            counters['cost_total'] += cost
+            counters['costed_visits'] += 1
+    for day, doctor_id, chamber_id, amount in zip(*payments):
+        totals[(day, doctor_id, chamber_id)]['payment_net'] += amount
+    return [dict(day=date.fromisoformat(day), doctor_id=doctor_id, chamber_id=chamber_id, **counters)
+            for (day, doctor_id, chamber_id), counters in totals.items() if any(counters.values())]
+
+
+@cache
+def _numpy():
+    # Imported on first rebuild rather than at startup, where it costs ~100 ms
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return numpy
+
+
+def numpy_available():
+    return _numpy() is not None
+
+
+def _aggregate_numpy(visits, payments):
+    np = _numpy()
+    visit_days, visit_doctors, visit_chambers, cancelled, costs = visits
+    payment_days, payment_doctors, payment_chambers, amounts = payments
+    visit_count = len(visit_days)
+    if not visit_count + len(payment_days):
+        return []
+
+    # Pack (day, doctor, chamber) into one int64 per visit, then per payment
+    days = np.array(visit_days + payment_days, dtype='datetime64[D]').astype(np.int64)
+    doctors = np.array(visit_doctors + payment_doctors, dtype=np.int64)
+    chambers = np.array(visit_chambers + payment_chambers, dtype=np.int64)
+    first_day = days.min()
+    doctor_span, chamber_span = int(doctors.max()) + 1, int(chambers.max()) + 1
+    keys = ((days - first_day) * doctor_span + doctors) * chamber_span + chambers
+    unique_keys, group = np.unique(keys, return_inverse=True)
+    size = len(unique_keys)
+    visit_group, payment_group = group[:visit_count], group[visit_count:]
+
+    cost = np.array(costs, dtype=np.float64)
+    costed = ~np.isnan(cost)
+    counters = [
+        np.bincount(visit_group, minlength=size),
+        np.bincount(visit_group, weights=np.array(cancelled, dtype=np.int64), minlength=size).astype(np.int64),
+        np.bincount(visit_group[costed], weights=cost[costed], minlength=size),
+        np.bincount(visit_group[costed], minlength=size),
+        np.bincount(payment_group, weights=np.array(amounts, dtype=np.float64), minlength=size),
+    ]
+    # Deposits and refunds that cancel out on a day without visits leave nothing
+    kept = (counters[0] > 0) | (counters[4] != 0)
+    unique_keys = unique_keys[kept]
+
+    epoch = date(1970, 1, 1).toordinal()
+    day_numbers = (unique_keys // chamber_span // doctor_span + first_day).tolist()
+    columns = [
+        [date.fromordinal(epoch + day) for day in day_numbers],
+        (unique_keys // chamber_span % doctor_span).tolist(),
+        (unique_keys % chamber_span).tolist(),
+        *(values[kept].tolist() for values in counters),
+    ]
+    return [dict(zip(KEY + COUNTERS, values)) for values in zip(*columns)]
+
+
+def rebuild(use_numpy=None):
+    """Recompute every rollup row from ``Visit`` and ``Payment``; returns how many were written."""
+    visits, payments = _source_columns()
+    if use_numpy is None:
+        use_numpy = numpy_available()
+    rows = _aggregate_numpy(visits, payments) if use_numpy else _aggregate_python(visits, payments)
+
+    table = DailyRollup.__table__
+    db.session.execute(table.delete())
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + INSERT_BATCH_SIZE])
+    db.session.commit()
+    return len(rows)
+
+
+def _raw_totals():
+    """The rollup computed by GROUP BYs over the raw tables."""
+    totals = _new_deltas()
+    visit_day = func.date(Visit.appointment_time)
+    for day, doctor_id, chamber_id, bookings, cancellations, cost_total, costed_visits in db.session.execute(
+        select(visit_day, Visit.doctor_id, Visit.chamber_id, func.count(),
+               func.sum(case((Visit.visit_status == CANCELLED, 1), else_=0)),
+               func.coalesce(func.sum(Visit.visit_cost), 0), func.count(Visit.visit_cost))
+        .where(Visit.doctor_id.is_not(None), Visit.chamber_id.is_not(None))
+        .group_by(visit_day, Visit.doctor_id, Visit.chamber_id)
+    ):
+        totals[(date.fromisoformat(str(day)), doctor_id, chamber_id)].update(
+            bookings=bookings, cancellations=cancellations, cost_total=cost_total, costed_visits=costed_visits
+        )
+    payment_day = func.date(Payment.timestamp)
+    for day, doctor_id, chamber_id, net in db.session.execute(
+        select(payment_day, Visit.doctor_id, Visit.chamber_id, func.sum(Payment.amount))
+        .join(Visit, Visit.id == Payment.visit_id)
+        .where(Payment.status.in_(_settled_statuses()),
+               Visit.doctor_id.is_not(None), Visit.chamber_id.is_not(None))
+        .group_by(payment_day, Visit.doctor_id, Visit.chamber_id)
+    ):
+        totals[(date.fromisoformat(str(day)), doctor_id, chamber_id)]['payment_net'] = net
+    return totals
+
+
+def check_parity():
+    """Rollup rows that disagree with the raw tables, as ``(key, rollup, raw)`` tuples."""
+    expected = {key: counters for key, counters in _raw_totals().items() if any(counters.values())}
+    actual = {
+        (row.day, row.doctor_id, row.chamber_id): {name: getattr(row, name) for name in COUNTERS}
+        for row in DailyRollup.query
+    }
+    zero = dict.fromkeys(COUNTERS, 0)
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys()):
+        rolled, raw = actual.get(key, zero), expected.get(key, zero)
+        if any(abs(rolled[name] - raw[name]) > TOLERANCE for name in COUNTERS):
+            mismatches.append((key, rolled, raw))
+    return mismatches
@@ -0,0 +1,327 @@
+# app/bulk_import.py
+"""Streamed bulk upserts of doctors and chambers from CSV or NDJSON.
+
+Records are parsed lazily from a binary stream and written in batches,
+one transaction per batch, with executemany inserts and updates. Invalid
+rows are reported with their line number and skipped; the rest of the
+batch is still written.
+
+CSV list columns (``specializations``, ``doctor_ids``, ...) are
+``;``-separated and ``schedule`` holds a JSON document. NDJSON records
+use native lists and objects.
+"""
+import csv
+import io
+import json
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models import Chamber, Doctor, Schedule, chamber_operator, db, doctor_chamber
+from app.response_cache import directory_cache
+from app.search import index_chambers, index_doctors, reindex_chamber_doctors
+from app.slots import ScheduleError, compile_schedule, schedule_cache
+
+DEFAULT_BATCH_SIZE = 1000
+# Rows buffered per transaction; 1 is row-by-row, larger holds more of the upload in memory
+MAX_BATCH_SIZE = 10000
+DOCTOR_LIST_FIELDS = ('specializations', 'hospital_affiliations', 'degrees')
+
+
+class RowError(ValueError):
+    pass
+
+
+def iter_records(stream, fmt):
+    """Yield ``(line_number, record)`` from a binary stream of CSV or NDJSON."""
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(text_stream, start=1):
+            if line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError as exc:
+                    yield line_number, exc
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def _list(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(';') if item.strip()]
+    if not isinstance(value, list):
+        raise RowError('expected a list')
+    return value
+
+
+def _ids(value):
+    try:
+        return [int(item) for item in _list(value)]
+    except (TypeError, ValueError):
+        raise RowError('expected a list of integer ids')
+
+
+def _doctor_row(record):
+    if not isinstance(record, dict):
+        raise RowError('record must be an object')
+    if not record.get('name') or not record.get('contact_number'):
+        raise RowError('name and contact_number are required')
+    row = {'name': record['name'], 'contact_number': str(record['contact_number'])}
+    for field in DOCTOR_LIST_FIELDS:
+        row[field] = _list(record.get(field))
+    return row
+
+
+def _chamber_row(record):
+    if not isinstance(record, dict):
+        raise RowError('record must be an object')
+    if not record.get('location'):
+        raise RowError('location is required')
+
+    schedule = record.get('schedule')
+    if isinstance(schedule, str):
+        try:
+            schedule = json.loads(schedule) if schedule else None
+        except ValueError:
+            raise RowError('schedule is not valid JSON')
+    try:
+        compile_schedule(schedule)
+    except ScheduleError as exc:
+        raise RowError(f'schedule: {exc}') from None
+
+    row = {
+        'id': int(record['id']) if record.get('id') else None,
+        'location': record['location'],
+        'schedule': schedule,
+        'doctor_ids': _ids(record['doctor_ids']) if record.get('doctor_ids') not in (None, '') else None,
+        'doctor_contact_numbers': _list(record.get('doctor_contact_numbers')) or None,
+        'operator_ids': _ids(record['operator_ids']) if record.get('operator_ids') not in (None, '') else None,
+    }
+    return row
+
+
+class ImportResult:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def error(self, line, message):
+        self.errors.append({'line': line, 'error': str(message)})
+
+    def to_dict(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'failed': len(self.errors),
+            'errors': self.errors,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_sec': round(self.processed / elapsed, 1) if elapsed else None
+        }
+
+
+def _run_batches(records, parse_row, write_batch, batch_size):
+    result = ImportResult()
+    batch = []
+
+    def write(rows):
+        inserted, updated = write_batch(rows)
+        db.session.commit()
+        result.inserted += inserted
+        result.updated += updated
+
+    def flush():
+        try:
+            write(batch)
+        except SQLAlchemyError:
+            db.session.rollback()
+            # Retry row by row so one bad row does not sink the batch
+            for line, row in batch:
+                try:
+                    write([(line, row)])
+                except SQLAlchemyError as exc:
+                    db.session.rollback()
+                    result.error(line, getattr(exc, 'orig', exc))
+        batch.clear()
+
+    for line, record in records:
+        result.processed += 1
+        if isinstance(record, Exception):
+            result.error(line, record)
+            continue
+        try:
+            batch.append((line, parse_row(record)))
+        except (RowError, TypeError, ValueError) as exc:
+            result.error(line, exc)
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+    directory_cache.invalidate()
+    return result.to_dict()
+
+
+def _write_doctors(batch):
+    # Last occurrence of a contact number within the batch wins
+    rows = {row['contact_number']: row for _, row in batch}
+    doctor_table = Doctor.__table__
+
+    existing = dict(db.session.execute(
+        select(doctor_table.c.contact_number, doctor_table.c.id)
+        .where(doctor_table.c.contact_number.in_(list(rows)))
+    ).all())
+
+    inserts = [row for key, row in rows.items() if key not in existing]
+    updates = [dict(row, _id=existing[key]) for key, row in rows.items() if key in existing]
+
+    if inserts:
+        ids = db.session.execute(
+            doctor_table.insert().returning(doctor_table.c.id, sort_by_parameter_order=True), inserts
+        ).scalars().all()
+        for row, doctor_id in zip(inserts, ids):
+            existing[row['contact_number']] = doctor_id
+    if updates:
+        db.session.execute(
+            doctor_table.update().where(doctor_table.c.id == bindparam('_id')),
+            updates
+        )
+
+    index_doctors(SimpleNamespace(id=existing[key], **row) for key, row in rows.items())
+    return len(inserts), len(updates)
+
+
+def _write_chambers(batch):
+    # Copies: ids assigned here must not leak into a row-by-row retry
+    rows = [dict(row) for _, row in batch]
+    chamber_table = Chamber.__table__
+    schedule_table = Schedule.__table__
+
+    known_ids = [row['id'] for row in rows if row['id']]
+    existing = dict(db.session.execute(
+        select(chamber_table.c.id, chamber_table.c.schedule_id).where(chamber_table.c.id.in_(known_ids))
+    ).all()) if known_ids else {}
+
+    # Rewrite schedules that already exist, create the rest
+    schedule_updates = [
+        {'_id': existing[row['id']], 'time_slots': row['schedule']}
+        for row in rows if row['schedule'] is not None and existing.get(row['id'])
+    ]
+    if schedule_updates:
+        db.session.execute(
+            schedule_table.update().where(schedule_table.c.id == bindparam('_id')).values(
+                version=schedule_table.c.version + 1
+            ),
+            schedule_updates
+        )
+        for update in schedule_updates:
+            schedule_cache.invalidate(update['_id'])
+
+    new_schedules = [row for row in rows if row['schedule'] is not None and not existing.get(row['id'])]
+    if new_schedules:
+        schedule_ids = db.session.execute(
+            schedule_table.insert().returning(schedule_table.c.id, sort_by_parameter_order=True),
+            [{'time_slots': row['schedule'], 'version': 1} for row in new_schedules]
+        ).scalars().all()
+        for row, schedule_id in zip(new_schedules, schedule_ids):
+            row['schedule_id'] = schedule_id
+
+    inserts = [row for row in rows if row['id'] not in existing]
+    updates = [row for row in rows if row['id'] in existing]
+    with_ids = [row for row in inserts if row['id']]
+    if with_ids:
+        db.session.execute(chamber_table.insert(), [
+            {'id': row['id'], 'location': row['location'], 'schedule_id': row.get('schedule_id')}
+            for row in with_ids
+        ])
+    without_ids = [row for row in inserts if not row['id']]
+    if without_ids:
+        ids = db.session.execute(
+            chamber_table.insert().returning(chamber_table.c.id, sort_by_parameter_order=True),
+            [{'location': row['location'], 'schedule_id': row.get('schedule_id')} for row in without_ids]
+        ).scalars().all()
+        for row, chamber_id in zip(without_ids, ids):
+            row['id'] = chamber_id
+    if updates:
+        db.session.execute(
+            chamber_table.update().where(chamber_table.c.id == bindparam('_id')),
+            [{'_id': row['id'], 'location': row['location']} for row in updates]
+        )
+        linked = [row for row in updates if row.get('schedule_id')]
+        if linked:
+            db.session.execute(
+                chamber_table.update().where(chamber_table.c.id == bindparam('_id')),
+                [{'_id': row['id'], 'schedule_id': row['schedule_id']} for row in linked]
+            )
+
+    # Resolve doctors given by contact number with one query
+    contact_numbers = {number for row in rows for number in row['doctor_contact_numbers'] or []}
+    doctor_ids_by_contact = dict(db.session.execute(
+        select(Doctor.contact_number, Doctor.id).where(Doctor.contact_number.in_(contact_numbers))
+    ).all()) if contact_numbers else {}
+
+    affected_doctors = set()
+    doctor_links = {}
+    for row in rows:
+        if row['doctor_ids'] is None and row['doctor_contact_numbers'] is None:
+            continue
+        doctor_ids = set(row['doctor_ids'] or [])
+        doctor_ids.update(doctor_ids_by_contact[number] for number in row['doctor_contact_numbers'] or []
+                          if number in doctor_ids_by_contact)
+        doctor_links[row['id']] = doctor_ids
+
+    if doctor_links:
+        affected_doctors.update(db.session.execute(
+            select(doctor_chamber.c.doctor_id).where(doctor_chamber.c.chamber_id.in_(list(doctor_links)))
+        ).scalars())
+        db.session.execute(doctor_chamber.delete().where(doctor_chamber.c.chamber_id.in_(list(doctor_links))))
+        links = [{'chamber_id': chamber_id, 'doctor_id': doctor_id}
+                 for chamber_id, doctor_ids in doctor_links.items() for doctor_id in doctor_ids]
+        if links:
+            db.session.execute(doctor_chamber.insert(), links)
+        affected_doctors.update(link['doctor_id'] for link in links)
+
+    operator_links = {row['id']: set(row['operator_ids']) for row in rows if row['operator_ids'] is not None}
+    if operator_links:
+        db.session.execute(chamber_operator.delete().where(chamber_operator.c.chamber_id.in_(list(operator_links))))
+        links = [{'chamber_id': chamber_id, 'operator_id': operator_id}
+                 for chamber_id, operator_ids in operator_links.items() for operator_id in operator_ids]
+        if links:
+            db.session.execute(chamber_operator.insert(), links)
+
+    index_chambers(SimpleNamespace(id=row['id'], location=row['location']) for row in rows)
+    if updates:
+        affected_doctors.update(db.session.execute(
+            select(doctor_chamber.c.doctor_id).where(doctor_chamber.c.chamber_id.in_([row['id'] for row in updates]))
+        ).scalars())
+    reindex_chamber_doctors(affected_doctors)
+    return len(inserts), len(updates)
+
+
+def import_doctors(records, batch_size=DEFAULT_BATCH_SIZE):
+    """Upsert doctors keyed by ``contact_number``."""
+    return _run_batches(records, _doctor_row, _write_doctors, batch_size)
+
+
+def import_chambers(records, batch_size=DEFAULT_BATCH_SIZE):
+    """Upsert chambers (keyed by ``id`` when given) with schedules, doctors and operators."""
+    return _run_batches(records, _chamber_row, _write_chambers, batch_size)
+
+
+IMPORTERS = {
+    'doctors': import_doctors,
+    'chambers': import_chambers,
+}
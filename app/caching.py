@@ -0,0 +1,72 @@
+# app/caching.py
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU mapping with hit/miss counters.
+
+    With ``ttl`` set, entries older than ``ttl`` seconds are treated as
+    missing and dropped on access.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._expires = {}
+        self._lock = Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if self.ttl is not None and self._expires[key] <= monotonic():
+                del self._data[key]
+                del self._expires[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if self.ttl is not None:
+                self._expires[key] = monotonic() + self.ttl
+            while len(self._data) > self.maxsize:
+                evicted, _ = self._data.popitem(last=False)
+                self._expires.pop(evicted, None)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            self._expires.pop(key, None)
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,147 @@
+# app/cli.py
+import time
+
+import click
+from flask.cli import AppGroup
+
+search_cli = AppGroup('search', help='Maintain doctor search indexes.')
+import_cli = AppGroup('import', help='Bulk import doctors and chambers.')
+payments_cli = AppGroup('payments', help='Process payments against the bKash gateway.')
+jobs_cli = AppGroup('jobs', help='Run and maintain background jobs.')
+reminders_cli = AppGroup('reminders', help='Schedule appointment reminders.')
+analytics_cli = AppGroup('analytics', help='Maintain the reporting rollups.')
+schema_cli = AppGroup('schema', help='Bring an existing database up to the current models.')
+
+
+@search_cli.command('rebuild')
+@click.option('--batch-size', default=1000, show_default=True)
+def rebuild_search(batch_size):
+    """Rebuild the doctor lookup tables from the Doctor rows."""
+    from app.search import rebuild_doctor_index
+    rebuild_doctor_index(batch_size=batch_size)
+    click.echo('Doctor search index rebuilt')
+
+
+@import_cli.command('run')
+@click.argument('kind', type=click.Choice(['doctors', 'chambers']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+def run_import(kind, path, fmt, batch_size):
+    """Upsert KIND records from a CSV or NDJSON file at PATH."""
+    from app.bulk_import import IMPORTERS, MAX_BATCH_SIZE, iter_records
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise click.BadParameter(f'must be from 1 to {MAX_BATCH_SIZE}', param_hint='--batch-size')
+    fmt = fmt or ('csv' if path.endswith('.csv') else 'ndjson')
+    with open(path, 'rb') as stream:
+        result = IMPORTERS[kind](iter_records(stream, fmt), batch_size=batch_size)
+
+    for error in result['errors']:
+        click.echo(f"line {error['line']}: {error['error']}", err=True)
+    click.echo(f"{result['processed']} rows: {result['inserted']} inserted, {result['updated']} updated, "
+               f"{result['failed']} failed in {result['elapsed_seconds']}s ({result['rows_per_sec']} rows/s)")
+
+
+@payments_cli.command('reconcile')
+def reconcile_payments():
+    """Queue payments left pending or stuck in processing."""
+    from flask import current_app
+    processor = current_app.extensions['payments']
+    if not processor.configured:
+        raise click.ClickException('BKASH_BASE_URL is not set')
+    click.echo(f'Queued {processor.reconcile()} payments for reconciliation')
+
+
+@jobs_cli.command('work')
+@click.option('--concurrency', type=int, help='Worker threads; defaults to JOB_WORKERS.')
+@click.option('--burst', is_flag=True, help='Exit once no job is ready.')
+def work_jobs(concurrency, burst):
+    """Run job workers in this process until interrupted."""
+    from flask import current_app
+    from app.jobs import WorkerPool
+    pool = current_app.extensions['jobs'] = WorkerPool(current_app._get_current_object(), concurrency)
+    if burst:
+        count = 0
+        while pool.run_once():
+            count += 1
+        click.echo(f'Ran {count} jobs')
+        return
+    if not pool.concurrency:
+        raise click.ClickException('Concurrency must be at least 1')
+    current_app.extensions['payments'].start_reconciler()
+    pool.start()
+    click.echo(f'Running {pool.concurrency} job workers; Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pool.stop(timeout=30)
+
+
+@jobs_cli.command('prune')
+@click.option('--days', default=7, show_default=True, help='Keep finished jobs this many days.')
+def prune_jobs(days):
+    """Delete finished jobs older than --days."""
+    from datetime import datetime, timedelta
+    from app.jobs import prune
+    from app.models import db
+    count = prune(datetime.utcnow() - timedelta(days=days))
+    db.session.commit()
+    click.echo(f'Deleted {count} finished jobs')
+
+
+@reminders_cli.command('run')
+def run_reminders():
+    """Run the reminder scheduler (and job workers) until interrupted."""
+    from flask import current_app
+    service = current_app.extensions['reminders']
+    click.echo(f'Loaded {service.resync()} upcoming visits')
+    service.start()
+    current_app.extensions['jobs'].start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        service.stop(timeout=10)
+        current_app.extensions['jobs'].stop(timeout=30)
+
+
+def _check_rollups():
+    from app.analytics import check_parity
+    mismatches = check_parity()
+    for key, rolled, raw in mismatches[:20]:
+        click.echo(f'{key}: rollup {rolled} != raw {raw}', err=True)
+    if mismatches:
+        raise click.ClickException(f'{len(mismatches)} rollup rows disagree with the raw tables')
+    click.echo('Rollups match the raw tables')
+
+
+@analytics_cli.command('rebuild')
+@click.option('--python', 'pure_python', is_flag=True, help='Aggregate without NumPy.')
+@click.option('--check', is_flag=True, help='Compare the result against the raw tables.')
+def rebuild_analytics(pure_python, check):
+    """Recompute the daily rollups from every visit and payment."""
+    from app.analytics import rebuild
+    started = time.perf_counter()
+    count = rebuild(use_numpy=False if pure_python else None)
+    click.echo(f'Wrote {count} rollup rows in {time.perf_counter() - started:.2f}s')
+    if check:
+        _check_rollups()
+
+
+@analytics_cli.command('check')
+def check_analytics():
+    """Compare the daily rollups against GROUP BYs over the raw tables."""
+    _check_rollups()
+
+
+@schema_cli.command('upgrade')
+def upgrade_schema():
+    """Create missing tables, and columns and indexes missing from existing tables."""
+    from app.migrations import MigrationError, upgrade
+    try:
+        applied = upgrade()
+    except MigrationError as exc:
+        raise click.ClickException(str(exc))
+    click.echo(f'Added {", ".join(applied)}' if applied else 'Schema is up to date')
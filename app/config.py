@@ -0,0 +1,169 @@
+# app/config.py
+"""Application and database engine configuration.
+
+Settings are layered: ``DEFAULTS``, then the file named by
+``MEDIGO_CONFIG`` (.py, .json or .toml), then ``DATABASE_URL``, then any
+``MEDIGO_<KEY>`` environment variable (values parsed as JSON where
+possible, e.g. ``MEDIGO_DB_POOL_SIZE=20``), then overrides passed to
+``create_app``.
+"""
+import json
+import os
+import tomllib
+from functools import partial
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+DEFAULTS = {
+    'SECRET_KEY': 'your-secret-key',  # Change in production
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///healthcare.db',  # Use proper DB in production
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'JWT_SECRET_KEY': 'jwt-secret-key',  # Change in production
+
+    # Connection pool; None keeps SQLAlchemy's default for the backend
+    'DB_POOL_SIZE': None,
+    'DB_MAX_OVERFLOW': None,
+    'DB_POOL_TIMEOUT': None,
+    'DB_POOL_RECYCLE': None,
+    'DB_POOL_PRE_PING': False,
+    'DB_ECHO': False,
+
+    # Pragmas applied to every new SQLite connection; None skips one
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+
+    # Visit document blobs; None means <instance path>/documents
+    'DOCUMENT_STORE_PATH': None,
+    'DOCUMENT_MAX_BYTES': 50 * 1024 * 1024,
+
+    # bKash gateway; payments are refused while BKASH_BASE_URL is unset
+    'BKASH_BASE_URL': None,
+    'BKASH_APP_KEY': None,
+    'BKASH_APP_SECRET': None,
+    'BKASH_TIMEOUT': 10.0,
+    'BKASH_POOL_SIZE': 8,
+
+    # Payments run as background jobs; stuck ones are reconciled periodically
+    'PAYMENT_MAX_ATTEMPTS': 5,
+    'PAYMENT_RECONCILE_INTERVAL': 30,
+    'PAYMENT_STALE_SECONDS': 60,
+
+    # Background jobs; JOB_WORKERS threads run in every app process, or
+    # set it to 0 and run `flask jobs work` as a separate worker process
+    'JOB_WORKERS': 2,
+    'JOB_POLL_INTERVAL': 1.0,
+    'JOB_MAX_ATTEMPTS': 5,
+    'JOB_RETRY_BASE_SECONDS': 2.0,
+    'JOB_RETRY_MAX_SECONDS': 600.0,
+    'JOB_VISIBILITY_TIMEOUT': 300,
+
+    # Users allowed to list and retry dead jobs (e.g. MEDIGO_ADMIN_USER_IDS='[1]')
+    'ADMIN_USER_IDS': [],
+
+    # Class sending patient notifications, as module:Class
+    'NOTIFICATION_SENDER': 'app.notifications:LogSender',
+
+    # Import route modules on the first request instead of in create_app
+    'LAZY_BLUEPRINTS': False,
+
+    # Request instrumentation served at /metrics; None turns a slow log off
+    'METRICS_ENABLED': True,
+    'SLOW_REQUEST_MS': 1000,
+    'SLOW_QUERY_MS': 250,
+
+    # Appointment reminders; enable in exactly one process
+    'REMINDERS_ENABLED': False,
+    'REMINDER_LEAD_MINUTES': [24 * 60, 60],
+    'REMINDER_WINDOW_HOURS': 48,
+    'REMINDER_RESYNC_SECONDS': 300,
+}
+
+POOL_OPTIONS = (
+    ('DB_POOL_SIZE', 'pool_size'),
+    ('DB_MAX_OVERFLOW', 'max_overflow'),
+    ('DB_POOL_TIMEOUT', 'pool_timeout'),
+    ('DB_POOL_RECYCLE', 'pool_recycle'),
+)
+
+
+def load_config(app, overrides=None):
+    app.config.from_mapping(DEFAULTS)
+
+    config_file = os.environ.get('MEDIGO_CONFIG')
+    if config_file:
+        if config_file.endswith('.json'):
+            app.config.from_file(config_file, load=json.load)
+        elif config_file.endswith('.toml'):
+            app.config.from_file(config_file, load=tomllib.load, text=False)
+        else:
+            app.config.from_pyfile(config_file)
+
+    if os.environ.get('DATABASE_URL'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['DATABASE_URL']
+    app.config.from_prefixed_env('MEDIGO')
+    if overrides:
+        app.config.update(overrides)
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(config):
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+
+    # In-memory SQLite uses a static single-connection pool
+    if not _is_memory_sqlite(url):
+        for key, option in POOL_OPTIONS:
+            if config.get(key) is not None:
+                options.setdefault(option, config[key])
+    if config.get('DB_POOL_PRE_PING'):
+        options.setdefault('pool_pre_ping', True)
+    if config.get('DB_ECHO'):
+        options.setdefault('echo', True)
+    return options
+
+
+def _apply_sqlite_pragmas(pragmas, dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in pragmas:
+        cursor.execute(f'PRAGMA {pragma} = {value}')
+    cursor.close()
+
+
+def install_sqlite_pragmas(app, engines):
+    pragmas = [
+        (pragma, app.config[key])
+        for key, pragma in (
+            ('SQLITE_BUSY_TIMEOUT_MS', 'busy_timeout'),
+            ('SQLITE_JOURNAL_MODE', 'journal_mode'),
+            ('SQLITE_SYNCHRONOUS', 'synchronous'),
+        )
+        if app.config.get(key) is not None
+    ]
+    for engine in engines:
+        if engine.dialect.name == 'sqlite' and pragmas:
+            event.listen(engine, 'connect', partial(_apply_sqlite_pragmas, pragmas))
+
+
+def begin_write(session):
+    """Open ``session``'s database transaction now, before any SAVEPOINT.
+
+    pysqlite only starts a transaction ahead of the first INSERT, UPDATE
+    or DELETE, so a SAVEPOINT issued before one becomes the outermost
+    transaction and releasing it commits. On SQLite this issues BEGIN
+    IMMEDIATE, which also takes the write lock up front; other backends
+    need nothing.
+    """
+    begin_immediate(session.connection())
+
+
+def begin_immediate(connection):
+    """Start ``connection``'s transaction holding the SQLite write lock; a no-op elsewhere."""
+    if connection.dialect.name == 'sqlite' and not connection.connection.driver_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN IMMEDIATE')
@@ -0,0 +1,107 @@
+# app/documents.py
+"""Content-addressed storage for visit document blobs.
+
+Blobs live under ``<root>/<aa>/<bb>/<sha256>`` and are written once:
+uploads with the same bytes share one file. Uploads are spooled in
+chunks to a temporary file in the same directory tree while being
+hashed, then atomically renamed into place, so a blob never passes
+through memory in full.
+"""
+import hashlib
+import os
+import tempfile
+
+from flask import current_app
+from werkzeug.formparser import parse_form_data
+
+
+class HashingSpool:
+    """Writable temp file that hashes and counts what is written to it.
+
+    Used as the werkzeug multipart ``stream_factory`` so uploaded parts
+    go straight into the store's temp directory.
+    """
+
+    def __init__(self, directory):
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix='upload-', delete=False)
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    @property
+    def name(self):
+        return self._file.name
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class DocumentStore:
+    def __init__(self, root):
+        self.root = root
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, sha256):
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def spool(self, *args, **kwargs):
+        return HashingSpool(self.tmp_dir)
+
+    def commit(self, spool):
+        """Move a finished spool into place and return ``(sha256, size)``."""
+        spool.flush()
+        os.fsync(spool.fileno())
+        spool.close()
+        sha256 = spool.hexdigest()
+        target = self.path(sha256)
+        if os.path.exists(target):
+            os.unlink(spool.name)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(spool.name, target)
+        return sha256, spool.size
+
+    def discard(self, spool):
+        spool.close()
+        if os.path.exists(spool.name):
+            os.unlink(spool.name)
+
+    def parse_upload(self, environ, max_content_length=None):
+        """Parse a multipart request, spooling file parts into the store.
+
+        Returns the werkzeug ``(form, files)`` pair; each file's
+        ``stream`` is a ``HashingSpool`` to pass to ``commit``. If parsing
+        fails (too large, client gone) the parts spooled so far are
+        discarded before the error propagates.
+        """
+        spools = []
+
+        def stream_factory(*args, **kwargs):
+            spools.append(self.spool())
+            return spools[-1]
+
+        try:
+            _, form, files = parse_form_data(
+                environ, stream_factory=stream_factory, max_content_length=max_content_length
+            )
+        except BaseException:
+            for spool in spools:
+                self.discard(spool)
+            raise
+        return form, files
+
+
+def get_document_store():
+    store = current_app.extensions.get('document_store')
+    if store is None:
+        root = current_app.config.get('DOCUMENT_STORE_PATH') or os.path.join(current_app.instance_path, 'documents')
+        store = current_app.extensions['document_store'] = DocumentStore(root)
+    return store
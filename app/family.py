@@ -0,0 +1,60 @@
+# app/family.py
+"""Account trees (a primary user, their dependents, theirs...) in one query.
+
+Each helper compiles to a single statement with recursive CTEs, so a
+household costs one round-trip however deep it goes. ``MAX_DEPTH`` bounds
+the recursion in case ``primary_user_id`` ever forms a cycle.
+"""
+from sqlalchemy import literal, select
+
+from app.models import User, db
+
+MAX_DEPTH = 16
+
+
+def _subtree(root):
+    """CTE of ``(id, primary_user_id, depth)`` for ``root`` and everyone below it."""
+    tree = (
+        select(User.id, User.primary_user_id, literal(0).label('depth'))
+        .where(User.id == root)
+        .cte('family_tree', recursive=True)
+    )
+    return tree.union_all(
+        select(User.id, User.primary_user_id, tree.c.depth + 1)
+        .join(tree, User.primary_user_id == tree.c.id)
+        .where(tree.c.depth < MAX_DEPTH)
+    )
+
+
+def _root_of(user_id):
+    """Scalar subquery: the topmost primary user above ``user_id``."""
+    chain = (
+        select(User.id, User.primary_user_id, literal(0).label('height'))
+        .where(User.id == user_id)
+        .cte('family_chain', recursive=True)
+    )
+    chain = chain.union_all(
+        select(User.id, User.primary_user_id, chain.c.height + 1)
+        .join(chain, User.id == chain.c.primary_user_id)
+        .where(chain.c.height < MAX_DEPTH)
+    )
+    return select(chain.c.id).order_by(chain.c.height.desc()).limit(1).scalar_subquery()
+
+
+def subtree_rows(user_id):
+    """``(id, primary_user_id, depth)`` rows for ``user_id`` and all their dependents."""
+    tree = _subtree(user_id)
+    return db.session.execute(select(tree.c.id, tree.c.primary_user_id, tree.c.depth)).all()
+
+
+def family_of(user_id):
+    """``(User, depth)`` for every member of the account ``user_id`` belongs to.
+
+    Ordered root first, then by depth and id; empty if there is no such user.
+    """
+    tree = _subtree(_root_of(user_id))
+    return db.session.execute(
+        select(User, tree.c.depth)
+        .join(tree, User.id == tree.c.id)
+        .order_by(tree.c.depth, User.id)
+    ).all()
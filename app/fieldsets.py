@@ -0,0 +1,129 @@
+# app/fieldsets.py
+"""Sparse fieldsets: ``?fields=`` and ``?include=`` on list endpoints.
+
+``fields`` lists the plain fields to return, dotted for nested objects
+(``fields=id,name,chambers.location``). ``include`` lists the nested
+objects to embed (``include=chambers,chambers.schedule``); naming a
+nested field in ``fields`` includes it too. A level with no plain fields
+listed keeps all of them, and once either parameter is given, nested
+objects not asked for are left out. Without either parameter the
+endpoint's full schema and loader plan are used unchanged.
+
+The same selection drives the SQL: each entity loads only the selected
+columns (``load_only``) and only the selected relationships are eagerly
+loaded, so unrequested joins and ``selectinload`` queries are skipped.
+"""
+from functools import lru_cache
+
+from flask import request
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from marshmallow import fields
+
+from app.serializers import FastSerializer
+
+MAX_PATHS = 64
+
+
+class FieldsetError(ValueError):
+    """A ``fields`` or ``include`` path the schema does not have."""
+
+
+class Fieldset:
+    def __init__(self, serializer, plan):
+        self.serializer = serializer
+        self.plan = plan
+
+
+def requested_fieldset(schema_class, serializer, plan, required=()):
+    """Return the request's fieldset, or ``serializer`` and ``plan`` if it asked for none.
+
+    ``required`` names top-level columns the view reads itself (e.g. for a
+    pagination cursor); they are loaded whether selected or not. Raises
+    ``FieldsetError`` for unknown paths.
+    """
+    fields_arg = request.args.get('fields')
+    include_arg = request.args.get('include')
+    if fields_arg is None and include_arg is None:
+        return Fieldset(serializer, plan)
+    return _fieldset(schema_class, _paths(fields_arg), _paths(include_arg), tuple(required))
+
+
+def _paths(value):
+    paths = tuple(sorted({path.strip() for path in (value or '').split(',') if path.strip()}))
+    if len(paths) > MAX_PATHS:
+        raise FieldsetError(f'At most {MAX_PATHS} paths per parameter')
+    return paths
+
+
+@lru_cache(maxsize=256)
+def _fieldset(schema_class, field_paths, include_paths, required):
+    requested = {}  # level prefix ('' or 'chambers.') -> field names listed there
+    for path in field_paths:
+        prefix, dot, name = path.rpartition('.')
+        requested.setdefault(prefix + dot, set()).add(name)
+    included = set()
+    for path in field_paths + include_paths:
+        parts = path.split('.')
+        end = len(parts) if path in include_paths else len(parts) - 1
+        included.update('.'.join(parts[:i]) for i in range(1, end + 1))
+
+    schema = schema_class()
+    selection = _select(schema, '', requested, included)
+    only = tuple(_leaves(selection))
+    serializer = FastSerializer(schema_class(many=True, only=only))
+    return Fieldset(serializer, tuple(_plan(schema.opts.model, selection, required)))
+
+
+def _select(schema, prefix, requested, included):
+    """Resolve one level to ``{field name: (attribute, nested selection or None)}``."""
+    available = schema.dump_fields
+    names = requested.get(prefix, set())
+    nested_names = {path[len(prefix):] for path in included
+                    if path.startswith(prefix) and '.' not in path[len(prefix):]}
+    for name in names | nested_names:
+        if name not in available:
+            raise FieldsetError(f'Unknown field {prefix + name!r}; expected one of {", ".join(available)}')
+        if name in nested_names and not isinstance(available[name], fields.Nested):
+            raise FieldsetError(f'{prefix + name!r} is not a nested object')
+
+    plain = [name for name, field in available.items() if not isinstance(field, fields.Nested)]
+    listed = [name for name in plain if name in names]
+    selection = {name: (available[name].attribute or name, None) for name in listed or plain}
+    for name in available:
+        if name in nested_names or (name in names and name not in plain):
+            field = available[name]
+            selection[name] = (field.attribute or name,
+                               _select(field.schema, f'{prefix}{name}.', requested, included))
+    return selection
+
+
+def _leaves(selection, prefix=''):
+    for name, (_, nested) in selection.items():
+        if nested is None:
+            yield prefix + name
+        else:
+            yield from _leaves(nested, f'{prefix}{name}.')
+
+
+def _plan(model, selection, required=()):
+    """Loader options for ``model`` mirroring ``selection``, like the plans in app/loaders.py."""
+    mapper = inspect(model)
+    columns = [getattr(model, name) for name in required]
+    options = []
+    columns_only = True
+    for attribute, nested in selection.values():
+        if nested is None:
+            if attribute in mapper.column_attrs:
+                columns.append(getattr(model, attribute))
+            else:
+                # A property or hybrid may read any column
+                columns_only = False
+            continue
+        relationship = mapper.relationships[attribute]
+        strategy = selectinload if relationship.uselist else joinedload
+        options.append(strategy(getattr(model, attribute)).options(
+            *_plan(relationship.mapper.class_, nested)))
+    if columns_only and columns:
+        options.insert(0, load_only(*columns))
+    return options
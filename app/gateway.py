@@ -0,0 +1,141 @@
+# app/gateway.py
+"""Pooled, timeout-bounded HTTP client for the bKash payment gateway.
+
+Connections are kept alive in a fixed-size pool so concurrent payment
+workers reuse sockets instead of paying a TCP/TLS handshake per call.
+Every request carries the payment's idempotency key as its reference,
+so a retried call after a timeout cannot charge twice.
+"""
+import http.client
+import json
+import queue
+import socket
+from urllib.parse import urlsplit
+
+
+class GatewayError(Exception):
+    """The gateway rejected a request or returned an unusable response."""
+
+
+class GatewayUnavailable(GatewayError):
+    """The gateway could not be reached in time; the call may be retried."""
+
+
+class ConnectionPool:
+    def __init__(self, base_url, size=8, timeout=10.0):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=size)
+        for _ in range(size):
+            self._pool.put(None)
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body=None, headers=None):
+        """Send one request and return ``(status, body_bytes)``.
+
+        Waits at most ``timeout`` for a free connection.
+        """
+        try:
+            connection = self._pool.get(timeout=self.timeout)
+        except queue.Empty:
+            raise GatewayUnavailable('No free gateway connection')
+
+        try:
+            for attempt in range(2):
+                fresh = connection is None
+                if fresh:
+                    connection = self._connect()
+                try:
+                    connection.request(method, self.prefix + path, body=body, headers=headers or {})
+                    response = connection.getresponse()
+                    data = response.read()
+                except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                    # A kept-alive socket the server already closed; retry once on a new one
+                    connection.close()
+                    connection = None
+                    if fresh or attempt:
+                        raise GatewayUnavailable('Gateway closed the connection')
+                    continue
+                if response.will_close:
+                    connection.close()
+                    connection = None
+                return response.status, data
+        except (socket.timeout, OSError, http.client.HTTPException) as exc:
+            if connection is not None:
+                connection.close()
+                connection = None
+            raise GatewayUnavailable(str(exc)) from exc
+        finally:
+            self._pool.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                connection = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            if connection is not None:
+                connection.close()
+
+
+class BkashClient:
+    def __init__(self, base_url, app_key=None, app_secret=None, pool_size=8, timeout=10.0):
+        self.pool = ConnectionPool(base_url, size=pool_size, timeout=timeout)
+        self.app_key = app_key
+        self.app_secret = app_secret
+
+    def _post(self, path, payload, reference):
+        headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'X-Idempotency-Key': reference,
+        }
+        if self.app_key:
+            headers['X-App-Key'] = self.app_key
+        if self.app_secret:
+            headers['X-App-Secret'] = self.app_secret
+
+        status, body = self.pool.request('POST', path, json.dumps(payload), headers)
+        if status >= 500 or status == 429:
+            raise GatewayUnavailable(f'Gateway returned HTTP {status}')
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            raise GatewayError(f'Gateway returned invalid JSON (HTTP {status})')
+        if status >= 400:
+            raise GatewayError(data.get('errorMessage') or f'Gateway returned HTTP {status}')
+        return data
+
+    def deposit(self, reference, amount, bkash_number, transaction_id=None):
+        return self._post('/payment/execute', {
+            'merchantInvoiceNumber': reference,
+            'amount': f'{amount:.2f}',
+            'payerReference': bkash_number,
+            'trxID': transaction_id,
+        }, reference)
+
+    def refund(self, reference, amount, transaction_id):
+        return self._post('/payment/refund', {
+            'merchantInvoiceNumber': reference,
+            'amount': f'{amount:.2f}',
+            'trxID': transaction_id,
+        }, reference)
+
+    def query(self, reference):
+        """Look up what the gateway recorded for ``reference``; None if nothing."""
+        try:
+            return self._post('/payment/query', {'merchantInvoiceNumber': reference}, reference)
+        except GatewayUnavailable:
+            raise
+        except GatewayError:
+            return None
+
+    def close(self):
+        self.pool.close()
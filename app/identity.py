@@ -0,0 +1,158 @@
+# app/identity.py
+"""The authenticated user behind a request's JWT, cached per process.
+
+Registered as the JWT ``user_lookup_loader``, so every ``@jwt_required``
+route gets ``current_user`` as an ``Identity``: the user id, its primary
+user and the set of users the account may act for (itself and every
+dependent below it). Committing a change to a user drops each identity
+whose set involves that user, found through an index by member, and an
+identity loaded while one of its users changed is not stored. Other
+processes' writes show up after ``IDENTITY_TTL`` seconds at most.
+"""
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from flask import current_app, jsonify
+from flask_jwt_extended import current_user, jwt_required
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.caching import LRUCache
+from app.family import subtree_rows
+from app.models import User
+
+IDENTITY_TTL = 60
+
+
+class Identity:
+    __slots__ = ('id', 'primary_user_id', 'acts_for')
+
+    def __init__(self, id, primary_user_id, acts_for):
+        self.id = id
+        self.primary_user_id = primary_user_id
+        self.acts_for = acts_for
+
+    def may_act_for(self, user_id):
+        return user_id in self.acts_for
+
+
+class IdentityCache(LRUCache):
+    """Identities keyed by user id, indexed by the users each one acts for.
+
+    ``version`` counts invalidations and each changed user records the
+    version it changed at, so a load is only discarded if a user it covers
+    changed after it started; unrelated signups do not stop it being stored.
+    """
+
+    def __init__(self, maxsize=10000, ttl=IDENTITY_TTL):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self.version = 0
+        self._version_lock = Lock()
+        self._holders = {}  # member id -> user ids whose cached identity acts for it
+        self._reindex_at = 2 * maxsize
+        self._changed = OrderedDict()  # user id -> version of its last change, oldest first
+        self._floor = 0  # loads started before this version may miss a forgotten change
+
+    def store(self, user_id, version, identity):
+        with self._version_lock:
+            if version < self._floor or any(self._changed.get(member, 0) > version
+                                            for member in identity.acts_for):
+                return
+            self.set(user_id, identity)
+            for member in identity.acts_for:
+                self._holders.setdefault(member, set()).add(user_id)
+            if len(self._holders) > self._reindex_at:
+                self._reindex()
+
+    def invalidate(self, user_ids):
+        with self._version_lock:
+            self.version += 1
+            for user_id in user_ids:
+                self._changed[user_id] = self.version
+                self._changed.move_to_end(user_id)
+                for holder in self._holders.pop(user_id, ()):
+                    self.pop(holder)
+            while len(self._changed) > self.maxsize:
+                _, self._floor = self._changed.popitem(last=False)
+
+    def clear(self):
+        with self._version_lock:
+            super().clear()
+            self._holders.clear()
+
+    def _reindex(self):
+        # Drop index entries left behind by evicted, expired or replaced identities
+        with self._lock:
+            identities = list(self._data.items())
+        self._holders = {}
+        for user_id, identity in identities:
+            for member in identity.acts_for:
+                self._holders.setdefault(member, set()).add(user_id)
+        self._reindex_at = max(2 * self.maxsize, 2 * len(self._holders))
+
+
+identity_cache = IdentityCache()
+
+
+def get_identity(user_id):
+    """The ``Identity`` of ``user_id``, or None if there is no such user."""
+    identity = identity_cache.get(user_id)
+    if identity is None:
+        version = identity_cache.version
+        rows = subtree_rows(user_id)
+        if not rows:
+            return None
+        # Recursive CTE rows come in no guaranteed order; depth 0 is the user itself
+        primary_user_id = next(row.primary_user_id for row in rows if row.depth == 0)
+        identity = Identity(user_id, primary_user_id, frozenset(row.id for row in rows))
+        identity_cache.store(user_id, version, identity)
+    return identity
+
+
+def is_admin(identity):
+    """True if ``identity`` is one of ``ADMIN_USER_IDS``."""
+    return identity.id in current_app.config['ADMIN_USER_IDS']
+
+
+def admin_required(view):
+    """Like ``jwt_required()``, but answers 403 unless the user is an admin."""
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        if not is_admin(current_user):
+            return jsonify({'error': 'Unauthorized'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def load_identity(jwt_header, jwt_data):
+    try:
+        user_id = int(jwt_data['sub'])
+    except (TypeError, ValueError):
+        return None
+    return get_identity(user_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_user_changes(session, flush_context):
+    changed = session.info.setdefault('users_changed', set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            # The user and the primaries it belongs or belonged to
+            history = inspect(obj).attrs.primary_user_id.history
+            changed.add(obj.id)
+            changed.update(user_id for user_id in (*history.added, *history.unchanged, *history.deleted)
+                           if user_id is not None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_identities(session):
+    changed = session.info.pop('users_changed', None)
+    if changed:
+        identity_cache.invalidate(changed)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_user_changes(session):
+    session.info.pop('users_changed', None)
@@ -0,0 +1,304 @@
+# app/jobs.py
+"""Durable background jobs stored in the ``job`` table.
+
+``enqueue`` adds a job to the caller's transaction, so a job exists
+exactly when the work that asked for it was committed. Worker threads
+claim ready jobs with an atomic UPDATE, retry failures with exponential
+backoff and move jobs that exhaust ``max_attempts`` to ``dead``. Jobs
+left ``running`` by a crashed worker are reclaimed after
+``JOB_VISIBILITY_TIMEOUT`` seconds, so handlers must be idempotent.
+
+Handlers are registered with ``@job('name')`` and called as
+``handler(payload, job)``.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, or_, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.config import _is_memory_sqlite
+from app.models import Job, db
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+
+JOB_HANDLERS = {}
+CLAIM_CANDIDATES = 8
+
+
+def job(name, max_attempts=None):
+    """Register the decorated function as the handler for jobs called ``name``."""
+    def decorator(handler):
+        JOB_HANDLERS[name] = (handler, max_attempts)
+        return handler
+    return decorator
+
+
+def enqueue(name, payload=None, delay=0, key=None, max_attempts=None):
+    """Add a job to the current transaction; workers see it once it commits.
+
+    With ``key`` set, nothing is added while a queued or running job with
+    the same key exists. Returns the new ``Job`` or None.
+    """
+    if key is not None and db.session.execute(
+        select(Job.id).where(Job.key == key, Job.status.in_([QUEUED, RUNNING])).limit(1)
+    ).first():
+        return None
+    _, handler_max_attempts = JOB_HANDLERS.get(name, (None, None))
+    new_job = Job(
+        name=name,
+        payload=payload or {},
+        key=key,
+        status=QUEUED,
+        max_attempts=max_attempts or handler_max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        run_at=datetime.utcnow() + timedelta(seconds=delay)
+    )
+    db.session.add(new_job)
+    db.session.info['jobs_enqueued'] = db.session.info.get('jobs_enqueued', 0) + 1
+    return new_job
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers(session):
+    enqueued = session.info.pop('jobs_enqueued', 0)
+    if enqueued and has_app_context():
+        pool = current_app.extensions.get('jobs')
+        if pool is not None:
+            pool.metrics.record_enqueued(enqueued)
+            pool.wake(enqueued)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_enqueued(session):
+    session.info.pop('jobs_enqueued', None)
+
+
+def _percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None, 'max': None}
+    ordered = sorted(values)
+    return {
+        'p50': round(ordered[len(ordered) // 2], 2),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+        'max': round(ordered[-1], 2)
+    }
+
+
+class JobMetrics:
+    """Counters and recent latency samples for this process's workers."""
+
+    def __init__(self, window=60, samples=1000):
+        self.window = window
+        self.enqueued = 0
+        self.completed = 0
+        self.retried = 0
+        self.dead = 0
+        self._wait_ms = deque(maxlen=samples)
+        self._run_ms = deque(maxlen=samples)
+        self._finished = deque()
+        self._lock = threading.Lock()
+
+    def record_enqueued(self, count=1):
+        with self._lock:
+            self.enqueued += count
+
+    def record_finished(self, outcome, wait_ms, run_ms):
+        now = time.monotonic()
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+            self._wait_ms.append(wait_ms)
+            self._run_ms.append(run_ms)
+            self._finished.append(now)
+            while self._finished and self._finished[0] < now - self.window:
+                self._finished.popleft()
+
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            recent = sum(1 for finished in self._finished if finished >= now - self.window)
+            return {
+                'enqueued': self.enqueued,
+                'completed': self.completed,
+                'retried': self.retried,
+                'dead': self.dead,
+                'wait_ms': _percentiles(self._wait_ms),
+                'run_ms': _percentiles(self._run_ms),
+                'throughput_per_sec': round(recent / self.window, 3)
+            }
+
+
+def queue_depth():
+    """Job counts by status, plus ready jobs and the age of the oldest one."""
+    now = datetime.utcnow()
+    depth = {status: 0 for status in (QUEUED, RUNNING, DEAD)}
+    depth.update(db.session.execute(
+        select(Job.status, func.count()).where(Job.status != DONE).group_by(Job.status)
+    ).all())
+    ready, oldest = db.session.execute(
+        select(func.count(), func.min(Job.run_at)).where(Job.status == QUEUED, Job.run_at <= now)
+    ).one()
+    depth['ready'] = ready
+    depth['oldest_ready_age_seconds'] = round((now - oldest).total_seconds(), 3) if oldest else 0
+    return depth
+
+
+class WorkerPool:
+    """Threads that claim and run jobs for one app."""
+
+    def __init__(self, app, concurrency=None):
+        self.app = app
+        self._concurrency = concurrency
+        self.metrics = JobMetrics()
+        self._threads = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Condition()
+        self._lock = threading.Lock()
+
+    @property
+    def concurrency(self):
+        return self.app.config['JOB_WORKERS'] if self._concurrency is None else self._concurrency
+
+    def start(self):
+        with self._lock:
+            if self._threads or not self.concurrency:
+                return
+            if _is_memory_sqlite(make_url(self.app.config['SQLALCHEMY_DATABASE_URI'])):
+                # One connection shared by every thread; jobs run only via run_once
+                return
+            self._stopping.clear()
+            for index in range(self.concurrency):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self, count=1):
+        """Wake up to ``count`` idle workers, one per newly queued job."""
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify(count)
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self):
+        poll_interval = self.app.config['JOB_POLL_INTERVAL']
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_once()
+            except Exception:
+                logger.exception('Job worker failed to claim a job')
+                ran = False
+            if not ran:
+                with self._wakeup:
+                    self._wakeup.wait(poll_interval)
+
+    def run_once(self):
+        """Claim and run one ready job; False if there was none."""
+        with self.app.app_context():
+            claimed = self._claim()
+            if claimed is None:
+                return False
+            self._execute(claimed)
+            return True
+
+    def _claim(self):
+        now = datetime.utcnow()
+        claimable = or_(
+            (Job.status == QUEUED) & (Job.run_at <= now),
+            (Job.status == RUNNING) &
+            (Job.started_time < now - timedelta(seconds=self.app.config['JOB_VISIBILITY_TIMEOUT']))
+        )
+        candidates = db.session.execute(
+            select(Job.id).where(claimable).order_by(Job.run_at, Job.id).limit(CLAIM_CANDIDATES)
+        ).scalars().all()
+        for job_id in candidates:
+            claimed = db.session.execute(
+                update(Job).where(Job.id == job_id, claimable)
+                .values(status=RUNNING, started_time=now, attempts=Job.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+        return None
+
+    def _execute(self, claimed):
+        started = datetime.utcnow()
+        wait_ms = (started - claimed.run_at).total_seconds() * 1000
+        handler, _ = JOB_HANDLERS.get(claimed.name, (None, None))
+
+        error = None
+        clock = time.perf_counter()
+        if handler is None:
+            error = f'No handler registered for {claimed.name!r}'
+        else:
+            try:
+                handler(claimed.payload or {}, claimed)
+            except Exception as exc:
+                final = claimed.attempts >= claimed.max_attempts
+                logger.log(logging.ERROR if final else logging.WARNING, 'Job %s (%s) attempt %s failed: %s',
+                           claimed.id, claimed.name, claimed.attempts, exc, exc_info=final)
+                error = f'{type(exc).__name__}: {exc}'
+                db.session.rollback()
+        run_ms = (time.perf_counter() - clock) * 1000
+
+        now = datetime.utcnow()
+        if error is None:
+            values, outcome = {'status': DONE, 'finished_time': now, 'last_error': None}, 'completed'
+        elif handler is None or claimed.attempts >= claimed.max_attempts:
+            values, outcome = {'status': DEAD, 'finished_time': now, 'last_error': error}, 'dead'
+        else:
+            values, outcome = {'status': QUEUED, 'run_at': now + self.backoff(claimed.attempts),
+                               'last_error': error}, 'retried'
+        db.session.execute(update(Job).where(Job.id == claimed.id).values(**values))
+        db.session.commit()
+        self.metrics.record_finished(outcome, wait_ms, run_ms)
+
+    def backoff(self, attempts):
+        config = self.app.config
+        delay = min(config['JOB_RETRY_MAX_SECONDS'], config['JOB_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1))
+        # Full jitter spreads retries of jobs that failed together
+        return timedelta(seconds=random.uniform(delay / 2, delay))
+
+
+def retry_dead(job_id):
+    """Requeue a dead job with a fresh attempt budget; False if it is not dead."""
+    requeued = db.session.execute(
+        update(Job).where(Job.id == job_id, Job.status == DEAD)
+        .values(status=QUEUED, attempts=0, run_at=datetime.utcnow(), finished_time=None)
+    ).rowcount
+    if requeued:
+        db.session.info['jobs_enqueued'] = db.session.info.get('jobs_enqueued', 0) + 1
+    return bool(requeued)
+
+
+def prune(older_than):
+    """Delete finished jobs that completed before ``older_than``; returns how many."""
+    return db.session.execute(
+        Job.__table__.delete().where(Job.status == DONE, Job.finished_time < older_than)
+    ).rowcount
+
+
+def init_jobs(app):
+    pool = app.extensions['jobs'] = WorkerPool(app)
+
+    # Jobs may be waiting from an earlier process; start on the first request
+    @app.before_request
+    def start_job_workers():
+        if not pool._threads:
+            pool.start()
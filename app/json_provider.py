@@ -0,0 +1,36 @@
+# app/json_provider.py
+"""orjson-backed Flask JSON provider, used when orjson is installed."""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Encodes with orjson, deferring unsupported types to Flask's defaults.
+
+    Datetimes and dataclasses are passed through to ``default`` so they
+    serialize exactly as they do with the stdlib provider.
+    """
+
+    def _options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._options(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
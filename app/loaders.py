@@ -0,0 +1,33 @@
+# app/loaders.py
+"""Eager-loading plans that mirror what each schema serializes.
+
+Every list endpoint applies the plan for the schema it dumps, so nested
+relationships are fetched in a fixed number of statements instead of one
+lazy load per row. Keep these in step with app/schemas.py. Requests
+with ``fields`` or ``include`` use a plan derived from their selection
+instead (app/fieldsets.py).
+"""
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import Chamber, Doctor, User, Visit
+
+# DoctorSchema -> chambers (without doctors) -> schedule
+DOCTOR_PLAN = (
+    selectinload(Doctor.chambers).joinedload(Chamber.schedule),
+)
+
+# ChamberSchema -> schedule, doctors (without chambers)
+CHAMBER_PLAN = (
+    joinedload(Chamber.schedule),
+    selectinload(Chamber.doctors),
+)
+
+# VisitSchema -> doctor (without chambers), chamber (without doctors) -> schedule
+VISIT_PLAN = (
+    joinedload(Visit.doctor),
+    joinedload(Visit.chamber).joinedload(Chamber.schedule),
+)
+
+# UserSchema -> dependents (without dependents)
+USER_PLAN = (
+    selectinload(User.dependents),
+)
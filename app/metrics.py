@@ -0,0 +1,246 @@
+# app/metrics.py
+"""Per-request instrumentation, exposed in Prometheus text format at /metrics.
+
+For every request this records, by endpoint: latency, the number of SQL
+statements and the time spent in them (from the engine's cursor events),
+the time spent in schema ``dump`` calls and the response size. Requests
+slower than ``SLOW_REQUEST_MS`` and statements slower than
+``SLOW_QUERY_MS`` are logged; statements with the shape of their
+parameters (types, not values). Histograms live in this process only, so
+scrape each worker process separately.
+"""
+import logging
+import re
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SERIALIZATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+SLOW_STATEMENT_CHARS = 2000
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered in Prometheus text format."""
+
+    def __init__(self, name, help, labelnames, buckets):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total:.6g}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            lines.append(f'{self.name}{{{label_text}}} {value}' if label_text else f'{self.name} {value}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestStats:
+    __slots__ = ('started', 'statements', 'db_seconds', 'serialize_seconds', 'dumping')
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.dumping = False
+
+
+class RequestMetrics:
+    """This process's request histograms and the slow-request and slow-query thresholds."""
+
+    def __init__(self, slow_request_ms=None, slow_query_ms=None):
+        self.slow_request_ms = slow_request_ms
+        self.slow_query_ms = slow_query_ms
+        self.requests = Counter('medigo_requests_total', 'Requests by endpoint, method and status.',
+                                ('endpoint', 'method', 'status'))
+        self.latency = Histogram('medigo_request_duration_seconds', 'Time to build the response.',
+                                 ('endpoint', 'method'), LATENCY_BUCKETS)
+        self.statements = Histogram('medigo_request_db_statements', 'SQL statements executed per request.',
+                                    ('endpoint', 'method'), STATEMENT_BUCKETS)
+        self.db_time = Histogram('medigo_request_db_seconds', 'Time spent executing SQL per request.',
+                                 ('endpoint', 'method'), LATENCY_BUCKETS)
+        self.serialization = Histogram('medigo_request_serialization_seconds',
+                                       'Time spent in schema dump per request.',
+                                       ('endpoint', 'method'), SERIALIZATION_BUCKETS)
+        self.response_size = Histogram('medigo_response_size_bytes', 'Response body size, when known up front.',
+                                       ('endpoint', 'method'), SIZE_BUCKETS)
+        self.slow_queries = Counter('medigo_slow_queries_total', 'Statements slower than SLOW_QUERY_MS.', ())
+
+    def render(self):
+        lines = []
+        for metric in (self.requests, self.latency, self.statements, self.db_time, self.serialization,
+                       self.response_size, self.slow_queries):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def record(self, stats, response):
+        seconds = perf_counter() - stats.started
+        labels = (request.endpoint or 'unmatched', request.method)
+        size = response.content_length
+        self.requests.inc(labels + (response.status_code,))
+        self.latency.observe(labels, seconds)
+        self.statements.observe(labels, stats.statements)
+        self.db_time.observe(labels, stats.db_seconds)
+        self.serialization.observe(labels, stats.serialize_seconds)
+        if size is not None:
+            self.response_size.observe(labels, size)
+
+        if self.slow_request_ms is not None and seconds * 1000 >= self.slow_request_ms:
+            logger.warning('Slow request %s %s -> %s in %.1f ms: %d statements in %.1f ms, '
+                           '%.1f ms serializing, %s bytes', request.method, request.full_path.rstrip('?'),
+                           response.status_code, seconds * 1000, stats.statements, stats.db_seconds * 1000,
+                           stats.serialize_seconds * 1000, size if size is not None else 'streamed')
+
+    def record_statement(self, statement, parameters, executemany, seconds):
+        stats = current_stats()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += seconds
+        if self.slow_query_ms is not None and seconds * 1000 >= self.slow_query_ms:
+            self.slow_queries.inc(())
+            logger.warning('Slow query in %.1f ms: %s -- parameters %s', seconds * 1000,
+                           _WHITESPACE.sub(' ', statement)[:SLOW_STATEMENT_CHARS],
+                           parameter_shape(parameters, executemany))
+
+
+def current_stats():
+    return g.get('_request_stats') if has_request_context() else None
+
+
+def parameter_shape(parameters, executemany=False):
+    """Describe bound parameters by type only, e.g. ``(int, str*3)`` or ``500 x {id: int}``."""
+    # insertmanyvalues batches arrive flattened even with executemany set
+    if executemany and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        return f'{len(parameters)} x {parameter_shape(parameters[0])}'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in parameters.items()) + '}'
+    if isinstance(parameters, (list, tuple)):
+        # Runs of one type collapse, so a long IN list stays one short entry
+        runs = []
+        for value in parameters:
+            name = type(value).__name__
+            if runs and runs[-1][0] == name:
+                runs[-1][1] += 1
+            else:
+                runs.append([name, 1])
+        return '(' + ', '.join(name if count == 1 else f'{name}*{count}' for name, count in runs) + ')'
+    return type(parameters).__name__
+
+
+def timed_dump(dump):
+    """Count a ``dump`` method's time towards the current request's serialization time.
+
+    Nested dumps inside an outer one are not counted twice.
+    """
+    @wraps(dump)
+    def wrapper(*args, **kwargs):
+        stats = current_stats()
+        if stats is None or stats.dumping:
+            return dump(*args, **kwargs)
+        stats.dumping = True
+        started = perf_counter()
+        try:
+            return dump(*args, **kwargs)
+        finally:
+            stats.serialize_seconds += perf_counter() - started
+            stats.dumping = False
+    return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(perf_counter())
+
+
+def _discard_query_start(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if exception_context.execution_context is not None and connection is not None \
+            and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+
+def init_metrics(app, engines):
+    """Hook the request and engine instrumentation into ``app`` unless METRICS_ENABLED is off."""
+    if not app.config['METRICS_ENABLED']:
+        return None
+    metrics = app.extensions['metrics'] = RequestMetrics(app.config.get('SLOW_REQUEST_MS'),
+                                                         app.config.get('SLOW_QUERY_MS'))
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        seconds = perf_counter() - conn.info['query_started'].pop()
+        metrics.record_statement(statement, parameters, executemany, seconds)
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(engine, 'handle_error', _discard_query_start)
+
+    @app.before_request
+    def start_request_stats():
+        g._request_stats = RequestStats()
+
+    @app.after_request
+    def record_request_stats(response):
+        stats = g.pop('_request_stats', None)
+        if stats is not None:
+            metrics.record(stats, response)
+        return response
+
+    return metrics
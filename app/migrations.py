@@ -0,0 +1,162 @@
+# app/migrations.py
+"""Bring an existing database up to the current models.
+
+``db.create_all()`` creates missing tables but never touches existing
+ones, so columns and indexes added to a model later never reach a
+deployed database. ``upgrade()`` (``flask schema upgrade``) adds them.
+``ensure_schema`` applies the same steps on every start to a database
+that already has some of the tables, before any mapper selects a column
+or table the database lacks.
+"""
+import logging
+
+from sqlalchemy import func, inspect, select
+from sqlalchemy.exc import IntegrityError
+
+from app.config import begin_immediate
+from app.models import ACTIVE_VISIT_STATUSES, Visit, db
+
+logger = logging.getLogger(__name__)
+
+SLOT_INDEX = 'uq_visit_active_slot'
+# Lookup tables app.search fills from existing doctors
+SEARCH_TABLES = {'doctor_specialization', 'doctor_hospital'}
+
+# Columns added to tables that existed before them, in the order they were
+# introduced: (table, column, statement run after adding it or None).
+# Legacy payments are completed deposits or separate refunded rows.
+COLUMN_STEPS = (
+    ('schedule', 'version', None),
+    ('visit', 'payment_status',
+     "UPDATE visit SET payment_status = CASE"
+     " WHEN EXISTS (SELECT 1 FROM payment WHERE payment.visit_id = visit.id"
+     " AND payment.status = 'refunded') THEN 'refunded'"
+     " WHEN EXISTS (SELECT 1 FROM payment WHERE payment.visit_id = visit.id"
+     " AND payment.status = 'completed') THEN 'deposit_paid' END"),
+    ('payment', 'kind', "UPDATE payment SET kind = CASE WHEN status = 'refunded' THEN 'refund' ELSE 'deposit' END"),
+    # ADD COLUMN cannot carry UNIQUE; new databases get a constraint instead
+    ('payment', 'idempotency_key', 'CREATE UNIQUE INDEX uq_payment_idempotency_key ON payment (idempotency_key)'),
+    ('payment', 'attempts', None),
+    ('payment', 'last_error', None),
+    ('payment', 'updated_time', 'UPDATE payment SET updated_time = timestamp'),
+)
+
+
+class MigrationError(Exception):
+    pass
+
+
+def duplicate_active_slots(connection, limit=20):
+    """Slots held by more than one active visit: (chamber_id, doctor_id, appointment_time, count)."""
+    slot = (Visit.chamber_id, Visit.doctor_id, Visit.appointment_time)
+    return connection.execute(
+        select(*slot, func.count()).where(Visit.visit_status.in_(ACTIVE_VISIT_STATUSES))
+        .group_by(*slot).having(func.count() > 1).limit(limit)
+    ).all()
+
+
+def _create_index(connection, index):
+    try:
+        with connection.begin_nested():
+            index.create(connection, checkfirst=True)
+    except IntegrityError:
+        if index.name != SLOT_INDEX:
+            raise MigrationError(f'Cannot create {index.name}: existing rows violate it') from None
+        duplicates = duplicate_active_slots(connection)
+        raise MigrationError(
+            f'Cannot create {index.name}: some slots are held by several active visits, e.g. '
+            + '; '.join(f'chamber {c} doctor {d} at {t:%Y-%m-%d %H:%M} ({n} visits)' for c, d, t, n in duplicates[:5])
+            + '. Cancel or move the extra visits and run `flask schema upgrade` again.'
+        ) from None
+
+
+def _add_column(connection, table_name, column_name):
+    column = db.metadata.tables[table_name].c[column_name]
+    quote = connection.dialect.identifier_preparer.quote
+    ddl = (f'ALTER TABLE {quote(table_name)} ADD COLUMN {quote(column_name)} '
+           f'{column.type.compile(dialect=connection.dialect)}')
+    if not column.nullable:
+        # The NOT NULL columns added here all have a scalar integer default
+        ddl += f' NOT NULL DEFAULT {int(column.default.arg)}'
+    connection.exec_driver_sql(ddl)
+
+
+def _missing(connection):
+    """Model tables missing from the database, and columns and indexes missing from its existing tables."""
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+    tables, columns, indexes = [], [], []
+    for table in db.metadata.tables.values():
+        if table.name not in existing:
+            tables.append(table.name)
+            continue
+        present = {column['name'] for column in inspector.get_columns(table.name)}
+        columns.extend((table.name, column.name) for column in table.columns if column.name not in present)
+        present = {index['name'] for index in inspector.get_indexes(table.name)}
+        indexes.extend(index for index in table.indexes if index.name not in present)
+    return tables, columns, indexes
+
+
+def _upgrade(connection, strict=True):
+    tables, columns, indexes = _missing(connection)
+    unknown = set(columns) - {(table, column) for table, column, _ in COLUMN_STEPS}
+    if unknown:
+        raise MigrationError('No upgrade step adds ' + ', '.join(sorted(f'{t}.{c}' for t, c in unknown)))
+
+    applied = []
+    for table, column, then in COLUMN_STEPS:
+        if (table, column) in columns:
+            _add_column(connection, table, column)
+            if then:
+                connection.exec_driver_sql(then)
+            applied.append(f'column {table}.{column}')
+    if tables:
+        db.metadata.create_all(connection)
+        applied.extend(f'table {table}' for table in tables)
+        if SEARCH_TABLES & set(tables):
+            logger.warning('Doctor search tables were created empty; run `flask search rebuild` to fill them')
+    for index in indexes:
+        try:
+            _create_index(connection, index)
+        except MigrationError as exc:
+            if strict or index.name != SLOT_INDEX:
+                raise
+            logger.error('Double bookings are not prevented: %s', exc)
+            continue
+        applied.append(f'index {index.name}')
+    return applied
+
+
+def upgrade():
+    """Create missing tables, and add missing columns and indexes to existing ones.
+
+    Returns what was added, e.g. ``['column payment.kind', 'table job',
+    'index uq_visit_active_slot']``. Raises ``MigrationError`` if existing
+    rows violate a unique index or a missing column has no upgrade step.
+    """
+    with db.engine.begin() as connection:
+        begin_immediate(connection)
+        return _upgrade(connection)
+
+
+def ensure_schema(app):
+    """Upgrade a database created by an older version of the models.
+
+    Runs on every start and only takes the write lock if something is
+    missing; an empty database is left to ``db.create_all()``. Raises
+    ``MigrationError`` if the database cannot be upgraded, except that
+    duplicate bookings blocking the slot index are logged so the app
+    still starts.
+    """
+    with app.app_context():
+        engine = db.engine
+        with engine.connect() as connection:
+            tables, columns, indexes = _missing(connection)
+        if len(tables) == len(db.metadata.tables) or not (tables or columns or indexes):
+            return
+        with engine.begin() as connection:
+            # Another process may have upgraded while this one waited for the lock
+            begin_immediate(connection)
+            applied = _upgrade(connection, strict=False)
+        if applied:
+            logger.warning('Upgraded an existing database: %s', ', '.join(applied))
@@ -1,6 +1,27 @@
 # app/models.py
 from app import db
 from datetime import datetime
+import json
+import zlib
+
+# Visits in these states hold their (chamber, doctor, appointment_time) slot
+ACTIVE_VISIT_STATUSES = ('scheduled', 'confirmed', 'rescheduled')
+
+
+class CompressedJSON(db.TypeDecorator):
+    """JSON document stored as a zlib-compressed blob."""
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(json.dumps(value, separators=(',', ':')).encode())
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return json.loads(zlib.decompress(value))
 
 
 class User(db.Model):
@@ -14,7 +35,7 @@ class User(db.Model):
     precondition_keywords = db.Column(db.JSON)
     address = db.Column(db.Text)
     is_primary_user = db.Column(db.Boolean, default=True)
-    primary_user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    primary_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
     dependents = db.relationship('User', backref=db.backref('primary_user', remote_side=[id]))
 
 class Doctor(db.Model):
@@ -26,6 +47,20 @@ class Doctor(db.Model):
     degrees = db.Column(db.JSON)
     chambers = db.relationship('Chamber', secondary='doctor_chamber', backref='doctors')
 
+# Inverted indexes over Doctor.specializations and Doctor.hospital_affiliations,
+# maintained by app.search.index_doctors
+doctor_specialization = db.Table('doctor_specialization',
+    db.Column('doctor_id', db.Integer, db.ForeignKey('doctor.id'), nullable=False),
+    db.Column('value', db.String(100), nullable=False),
+    db.Index('ix_doctor_specialization_value', 'value', 'doctor_id')
+)
+
+doctor_hospital = db.Table('doctor_hospital',
+    db.Column('doctor_id', db.Integer, db.ForeignKey('doctor.id'), nullable=False),
+    db.Column('value', db.String(100), nullable=False),
+    db.Index('ix_doctor_hospital_value', 'value', 'doctor_id')
+)
+
 doctor_chamber = db.Table('doctor_chamber',
     db.Column('doctor_id', db.Integer, db.ForeignKey('doctor.id')),
     db.Column('chamber_id', db.Integer, db.ForeignKey('chamber.id'))
@@ -35,6 +70,7 @@ class Chamber(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     location = db.Column(db.Text, nullable=False)
     schedule_id = db.Column(db.Integer, db.ForeignKey('schedule.id'))
+    schedule = db.relationship('Schedule', foreign_keys=[schedule_id])
     operators = db.relationship('User', secondary='chamber_operator')
 
 chamber_operator = db.Table('chamber_operator',
@@ -56,11 +92,65 @@ class Visit(db.Model):
     visit_cost = db.Column(db.Float)
     visit_status = db.Column(db.String(20))
     cancel_reason = db.Column(db.Text)
+    payment_status = db.Column(db.String(20))
+    doctor = db.relationship('Doctor')
+    chamber = db.relationship('Chamber')
+
+    __table_args__ = (
+        # A slot can be held by at most one active visit; the database
+        # rejects the second of two concurrent bookings
+        db.Index(
+            'uq_visit_active_slot', chamber_id, doctor_id, appointment_time,
+            unique=True,
+            sqlite_where=visit_status.in_(ACTIVE_VISIT_STATUSES),
+            postgresql_where=visit_status.in_(ACTIVE_VISIT_STATUSES)
+        ),
+        # Access paths of GET /visits (each ends in the keyset order) and
+        # of slot availability / conflict checks
+        db.Index('ix_visit_booking_user', booking_user_id, appointment_time, id),
+        db.Index('ix_visit_patient_user', patient_user_id, appointment_time, id),
+        db.Index('ix_visit_doctor_time', doctor_id, appointment_time, id),
+        db.Index('ix_visit_status_time', visit_status, appointment_time, id),
+        db.Index('ix_visit_time', appointment_time, id),
+        db.Index('ix_visit_chamber_doctor_time', chamber_id, doctor_id, appointment_time),
+    )
+
+class VisitDocument(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), nullable=False)
+    document_type = db.Column(db.String(50))
+    filename = db.Column(db.String(255))
+    content_type = db.Column(db.String(100))
+    size = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)  # Blob key in the document store
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    upload_time = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_visit_document_visit', visit_id, id),
+    )
+
+class Prescription(db.Model):
+    # Kept off the Visit row so visit scans never read prescription bodies
+    id = db.Column(db.Integer, primary_key=True)
+    visit_id = db.Column(db.Integer, db.ForeignKey('visit.id'), nullable=False, unique=True)
+    patient_user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    doctor_id = db.Column(db.Integer, db.ForeignKey('doctor.id'))
+    content = db.deferred(db.Column(CompressedJSON, nullable=False))
+    created_time = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_time = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_prescription_patient', patient_user_id, created_time, id),
+    )
 
 class Schedule(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     chamber_id = db.Column(db.Integer, db.ForeignKey('chamber.id'))
     time_slots = db.Column(db.JSON)  # Store available time slots as JSON
+    version = db.Column(db.Integer, nullable=False, default=1)
+
+    __mapper_args__ = {'version_id_col': version}
 
 # Add to app/models.py
 class Payment(db.Model):
@@ -71,4 +161,54 @@ class Payment(db.Model):
     bkash_number = db.Column(db.String(20))
     transaction_id = db.Column(db.String(50))
     status = db.Column(db.String(20))
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    kind = db.Column(db.String(10))  # deposit or refund
+    # Client Idempotency-Key scoped by user; retries map back to this row
+    idempotency_key = db.Column(db.String(120), unique=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    updated_time = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_payment_status_updated', status, updated_time),
+        db.Index('ix_payment_visit', visit_id, timestamp),
+    )
+
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON)
+    # Jobs with the same key are not queued twice while one is pending
+    key = db.Column(db.String(120))
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_time = db.Column(db.DateTime, default=datetime.utcnow)
+    started_time = db.Column(db.DateTime)
+    finished_time = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    __table_args__ = (
+        # Claim order of the workers
+        db.Index('ix_job_status_run_at', status, run_at, id),
+        db.Index('ix_job_key', key),
+    )
+
+class DailyRollup(db.Model):
+    # Visit and payment totals per day, doctor and chamber, kept current by
+    # app.analytics: visits count on their appointment day, settled
+    # payments (refunds are negative) on the day they were made
+    day = db.Column(db.Date, primary_key=True)
+    doctor_id = db.Column(db.Integer, primary_key=True)
+    chamber_id = db.Column(db.Integer, primary_key=True)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    cancellations = db.Column(db.Integer, nullable=False, default=0)
+    cost_total = db.Column(db.Float, nullable=False, default=0)
+    costed_visits = db.Column(db.Integer, nullable=False, default=0)
+    payment_net = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_daily_rollup_doctor', doctor_id, day),
+        db.Index('ix_daily_rollup_chamber', chamber_id, day),
+    )
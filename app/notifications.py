@@ -0,0 +1,65 @@
+# app/notifications.py
+"""Patient notifications, sent from background jobs through a pluggable sender.
+
+``NOTIFICATION_SENDER`` names the sender class as ``module:Class`` (or
+``module.Class``); it is built once per app and called as
+``sender.send(user_id, message, **context)``.
+"""
+import logging
+
+from flask import current_app
+from werkzeug.utils import import_string
+
+from app.jobs import enqueue, job
+from app.models import Visit, db
+
+logger = logging.getLogger(__name__)
+
+VISIT_MESSAGES = {
+    'booked': 'Your visit on {time:%d %b %Y at %H:%M} is booked.',
+    'rescheduled': 'Your visit has been moved to {time:%d %b %Y at %H:%M}.',
+    'cancelled': 'Your visit on {time:%d %b %Y at %H:%M} was cancelled.',
+}
+
+
+class LogSender:
+    """Default sender: writes notifications to the application log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def send(self, user_id, message, **context):
+        logger.info('Notify user %s: %s', user_id, message)
+
+
+class MemorySender:
+    """Collects notifications in a list; for tests and benchmarks."""
+
+    def __init__(self, app):
+        self.app = app
+        self.sent = []
+
+    def send(self, user_id, message, **context):
+        self.sent.append({'user_id': user_id, 'message': message, **context})
+
+
+def get_sender():
+    sender = current_app.extensions.get('notification_sender')
+    if sender is None:
+        sender_class = import_string(current_app.config['NOTIFICATION_SENDER'])
+        sender = current_app.extensions['notification_sender'] = sender_class(current_app._get_current_object())
+    return sender
+
+
+def notify_visit(visit, event):
+    """Queue a notification about ``visit`` in the current transaction."""
+    enqueue('visits.notify', {'visit_id': visit.id, 'event': event})
+
+
+@job('visits.notify')
+def send_visit_notification(payload, job):
+    visit = db.session.get(Visit, payload['visit_id'])
+    if visit is None:
+        return
+    message = VISIT_MESSAGES[payload['event']].format(time=visit.appointment_time)
+    get_sender().send(visit.patient_user_id, message, visit_id=visit.id, event=payload['event'])
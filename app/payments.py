@@ -0,0 +1,200 @@
+# app/payments.py
+"""Background processing of deposits and refunds against the bKash gateway.
+
+Request threads only record a ``pending`` payment together with a
+``payments.process`` job; gateway round-trips happen on the job workers,
+which retry unreachable-gateway failures with backoff. A reconciliation
+thread periodically re-queues payments left ``pending`` or
+``processing``. Gateway calls carry the payment's idempotency key, so
+retries never charge twice.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update
+from sqlalchemy.engine import make_url
+
+from app.analytics import record_payment
+from app.caching import LRUCache
+from app.config import _is_memory_sqlite
+from app.gateway import BkashClient, GatewayError, GatewayUnavailable
+from app.jobs import enqueue, job
+from app.models import Payment, Visit, db
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+COMPLETED = 'completed'
+REFUNDED = 'refunded'
+FAILED = 'failed'
+
+# Final payment status and the visit payment_status it sets, per kind
+OUTCOMES = {
+    'deposit': (COMPLETED, 'deposit_paid'),
+    'refund': (REFUNDED, 'refunded'),
+}
+
+# Scoped idempotency key -> payment id; spares the unique-index lookup on retries
+idempotency_cache = LRUCache(maxsize=10000, ttl=3600)
+
+
+def _claim(payment_id):
+    """Move a payment to ``processing``; False once it has settled.
+
+    The job key keeps a payment in at most one job at a time, so a
+    payment still ``processing`` was left behind by a crashed attempt.
+    """
+    result = db.session.execute(
+        update(Payment)
+        .where(Payment.id == payment_id, Payment.status.in_([PENDING, PROCESSING]))
+        .values(status=PROCESSING, attempts=Payment.attempts + 1, updated_time=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def _deposit_transaction(visit_id):
+    return db.session.query(Payment.transaction_id).filter(
+        Payment.visit_id == visit_id, Payment.kind == 'deposit', Payment.status == COMPLETED
+    ).order_by(Payment.timestamp.desc()).limit(1).scalar()
+
+
+def _finish(payment_id, **values):
+    db.session.execute(update(Payment).where(Payment.id == payment_id).values(**values))
+    db.session.commit()
+
+
+def process_payment(client, payment_id, final_attempt=True, reconcile=False):
+    """Run one payment through the gateway and record the outcome.
+
+    Raises ``GatewayUnavailable`` after putting the payment back to
+    ``pending`` unless this is the ``final_attempt``.
+    """
+    if not _claim(payment_id):
+        return
+    payment = db.session.get(Payment, payment_id)
+    kind, reference, visit_id = payment.kind, payment.idempotency_key, payment.visit_id
+    amount, bkash_number, transaction_id = abs(payment.amount), payment.bkash_number, payment.transaction_id
+    if kind == 'refund' and not transaction_id:
+        transaction_id = _deposit_transaction(visit_id)
+    # Hand the connection back to the pool for the duration of the gateway call
+    db.session.rollback()
+
+    try:
+        response = client.query(reference) if reconcile else None
+        if not response:
+            if kind == 'refund':
+                response = client.refund(reference, amount, transaction_id)
+            else:
+                response = client.deposit(reference, amount, bkash_number, transaction_id)
+    except GatewayUnavailable as exc:
+        _finish(payment_id, status=FAILED if final_attempt else PENDING, last_error=str(exc))
+        if not final_attempt:
+            raise
+        return
+    except GatewayError as exc:
+        _finish(payment_id, status=FAILED, last_error=str(exc))
+        return
+
+    status, visit_status = OUTCOMES[kind]
+    db.session.execute(update(Visit).where(Visit.id == visit_id).values(payment_status=visit_status))
+    record_payment(payment_id)
+    _finish(payment_id, status=status, transaction_id=response.get('trxID') or transaction_id, last_error=None)
+
+
+def queue_payment(payment_id, reconcile=False):
+    """Queue processing of a payment in the current transaction."""
+    return enqueue(
+        'payments.process',
+        {'payment_id': payment_id, 'reconcile': reconcile},
+        key=f'payment:{payment_id}',
+        max_attempts=current_app.config['PAYMENT_MAX_ATTEMPTS']
+    )
+
+
+@job('payments.process')
+def run_payment_job(payload, job):
+    client = current_app.extensions['payments'].get_client()
+    process_payment(client, payload['payment_id'], final_attempt=job.attempts >= job.max_attempts,
+                    reconcile=payload.get('reconcile', False))
+
+
+class PaymentProcessor:
+    """Gateway client and reconciliation thread for one app.
+
+    The client is created on first use, so CLI commands and scripts that
+    never take a payment do not open connections. The reconciler starts
+    with the first request (or ``flask jobs work``) once the gateway is
+    configured, so payments a previous process left pending are picked up.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.client = None
+        self._reconciler = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def configured(self):
+        return bool(self.app.config.get('BKASH_BASE_URL'))
+
+    def get_client(self):
+        with self._lock:
+            if self.client is None:
+                config = self.app.config
+                self.client = BkashClient(
+                    config['BKASH_BASE_URL'],
+                    app_key=config.get('BKASH_APP_KEY'),
+                    app_secret=config.get('BKASH_APP_SECRET'),
+                    pool_size=config['BKASH_POOL_SIZE'],
+                    timeout=config['BKASH_TIMEOUT']
+                )
+            return self.client
+
+    def start_reconciler(self):
+        if not self.configured or _is_memory_sqlite(make_url(self.app.config['SQLALCHEMY_DATABASE_URI'])):
+            # In-memory SQLite shares one connection across threads
+            return
+        with self._lock:
+            if self._reconciler is None and self.app.config.get('PAYMENT_RECONCILE_INTERVAL'):
+                self._reconciler = threading.Thread(target=self._reconcile_loop, name='payment-reconciler', daemon=True)
+                self._reconciler.start()
+
+    def reconcile(self):
+        """Queue payments that are pending or stuck in processing; returns how many."""
+        stale_before = datetime.utcnow() - timedelta(seconds=self.app.config['PAYMENT_STALE_SECONDS'])
+        with self.app.app_context():
+            payment_ids = db.session.execute(
+                select(Payment.id)
+                .where(Payment.status.in_([PENDING, PROCESSING]), Payment.updated_time < stale_before)
+                .order_by(Payment.updated_time)
+            ).scalars().all()
+            queued = sum(queue_payment(payment_id, reconcile=True) is not None for payment_id in payment_ids)
+            db.session.commit()
+        return queued
+
+    def _reconcile_loop(self):
+        while not self._stopping.wait(self.app.config['PAYMENT_RECONCILE_INTERVAL']):
+            try:
+                self.reconcile()
+            except Exception:
+                logger.exception('Payment reconciliation failed')
+
+    def shutdown(self):
+        self._stopping.set()
+        if self.client is not None:
+            self.client.close()
+
+
+def init_payments(app):
+    processor = app.extensions['payments'] = PaymentProcessor(app)
+
+    # Payments may be pending from an earlier process; start on the first request
+    @app.before_request
+    def start_payment_reconciler():
+        if processor._reconciler is None:
+            processor.start_reconciler()
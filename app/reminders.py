@@ -0,0 +1,250 @@
+# app/reminders.py
+"""Appointment reminders driven by an in-memory schedule of upcoming visits.
+
+``ReminderSchedule`` is a min-heap of ``(fire_at, visit_id, lead)``
+entries with lazy cancellation: rescheduling or cancelling a visit only
+updates a dict, and stale heap entries are skipped when they surface.
+Scheduling is O(log n) and cancelling O(1) (amortized, with occasional
+compaction).
+
+``ReminderService`` keeps the schedule filled with active visits whose
+appointment falls within ``REMINDER_WINDOW_HOURS``. Visits written
+through the ORM in this process are applied when their transaction
+commits; changes made by other processes are picked up by a periodic
+resync. Due reminders become ``visits.remind`` jobs, which re-check the
+visit before sending, so a stale schedule never sends a wrong reminder.
+
+Run the service in one process only (``REMINDERS_ENABLED`` there, or
+``flask reminders run``).
+"""
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.jobs import enqueue, job
+from app.models import ACTIVE_VISIT_STATUSES, Job, Visit, db
+from app.notifications import get_sender
+
+logger = logging.getLogger(__name__)
+
+REMINDER_MESSAGE = 'Reminder: your visit is on {time:%d %b %Y at %H:%M}.'
+LOAD_BATCH_SIZE = 5000
+
+
+class ReminderSchedule:
+    """Reminder times of upcoming visits, earliest first."""
+
+    def __init__(self, leads):
+        self.leads = sorted(leads, reverse=True)
+        self._heap = []
+        self._live = {}  # visit_id -> appointment_time currently scheduled
+
+    def __len__(self):
+        return len(self._live)
+
+    def schedule(self, visit_id, appointment_time, now=None):
+        """(Re)schedule every lead-time reminder of a visit that is still ahead."""
+        now = now or datetime.utcnow()
+        self._live[visit_id] = appointment_time
+        for lead in self.leads:
+            fire_at = appointment_time - lead
+            if fire_at >= now:
+                heapq.heappush(self._heap, (fire_at, visit_id, lead))
+        self._maybe_compact()
+
+    def cancel(self, visit_id):
+        self._live.pop(visit_id, None)
+
+    def _current(self, entry):
+        fire_at, visit_id, lead = entry
+        return self._live.get(visit_id) == fire_at + lead
+
+    def _maybe_compact(self):
+        # Rebuild once stale entries clearly outnumber live ones
+        if len(self._heap) > 64 and len(self._heap) > 4 * len(self._live) * len(self.leads):
+            self._heap = [entry for entry in self._heap if self._current(entry)]
+            heapq.heapify(self._heap)
+
+    def next_due(self):
+        while self._heap and not self._current(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now):
+        """Remove and return ``(visit_id, lead, appointment_time)`` for reminders due by ``now``."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if self._current(entry):
+                fire_at, visit_id, lead = entry
+                due.append((visit_id, lead, fire_at + lead))
+        # Visits whose last reminder has gone out leave the schedule
+        for visit_id, lead, _ in due:
+            if lead == self.leads[-1]:
+                self._live.pop(visit_id, None)
+        return due
+
+    def clear(self):
+        self._heap.clear()
+        self._live.clear()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_visit_changes(session, flush_context):
+    changes = session.info.setdefault('visit_changes', {})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Visit):
+            deleted = obj in session.deleted
+            changes[obj.id] = None if deleted else (obj.appointment_time, obj.visit_status)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_visit_changes(session):
+    changes = session.info.pop('visit_changes', None)
+    if changes and has_app_context():
+        service = current_app.extensions.get('reminders')
+        if service is not None and service.running:
+            service.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_visit_changes(session):
+    session.info.pop('visit_changes', None)
+
+
+def _reminder_key(visit_id, lead, appointment_time):
+    return f'reminder:{visit_id}:{int(lead.total_seconds())}:{appointment_time.isoformat()}'
+
+
+class ReminderService:
+    """Background thread feeding due reminders from a ``ReminderSchedule`` into jobs."""
+
+    def __init__(self, app):
+        self.app = app
+        config = app.config
+        self.schedule = ReminderSchedule([timedelta(minutes=minutes) for minutes in config['REMINDER_LEAD_MINUTES']])
+        self.window = max(timedelta(hours=config['REMINDER_WINDOW_HOURS']), self.schedule.leads[0])
+        self.resync_interval = config['REMINDER_RESYNC_SECONDS']
+        self.loaded_until = None
+        self.running = False
+        self._thread = None
+        self._stopping = threading.Event()
+        self._changed = threading.Condition()
+
+    def apply(self, changes):
+        """Apply committed ``{visit_id: (appointment_time, status) | None}`` changes."""
+        with self._changed:
+            for visit_id, change in changes.items():
+                if change is None or change[1] not in ACTIVE_VISIT_STATUSES:
+                    self.schedule.cancel(visit_id)
+                elif self.loaded_until is not None and change[0] <= self.loaded_until:
+                    self.schedule.schedule(visit_id, change[0])
+                else:
+                    # Beyond the window; the resync that reaches it will load it
+                    self.schedule.cancel(visit_id)
+            self._changed.notify()
+
+    def resync(self, now=None):
+        """Rebuild the schedule from every active visit in the window."""
+        now = now or datetime.utcnow()
+        until = now + self.window
+        rows = []
+        last = (now, 0)
+        with self.app.app_context():
+            while True:
+                batch = db.session.execute(
+                    select(Visit.appointment_time, Visit.id)
+                    .where(Visit.visit_status.in_(ACTIVE_VISIT_STATUSES),
+                           Visit.appointment_time <= until,
+                           (Visit.appointment_time > last[0]) |
+                           ((Visit.appointment_time == last[0]) & (Visit.id > last[1])))
+                    .order_by(Visit.appointment_time, Visit.id)
+                    .limit(LOAD_BATCH_SIZE)
+                ).all()
+                rows.extend(batch)
+                if len(batch) < LOAD_BATCH_SIZE:
+                    break
+                last = tuple(batch[-1])
+        with self._changed:
+            self.schedule.clear()
+            for appointment_time, visit_id in rows:
+                self.schedule.schedule(visit_id, appointment_time, now)
+            self.loaded_until = until
+            self._changed.notify()
+        return len(rows)
+
+    def dispatch_due(self, now=None):
+        """Queue ``visits.remind`` jobs for everything due; returns how many were queued."""
+        now = now or datetime.utcnow()
+        with self._changed:
+            due = self.schedule.pop_due(now)
+        if not due:
+            return 0
+        with self.app.app_context():
+            keys = {_reminder_key(*item): item for item in due}
+            # Never send the same reminder twice, even across restarts
+            sent = set(db.session.execute(select(Job.key).where(Job.key.in_(list(keys)))).scalars())
+            for key, (visit_id, lead, appointment_time) in keys.items():
+                if key not in sent:
+                    enqueue('visits.remind', {
+                        'visit_id': visit_id,
+                        'appointment_time': appointment_time.isoformat(),
+                    }, key=key)
+            db.session.commit()
+        return len(keys) - len(sent)
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        with self._changed:
+            self._changed.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.running = False
+
+    def _run(self):
+        next_resync = datetime.min
+        while not self._stopping.is_set():
+            try:
+                now = datetime.utcnow()
+                if now >= next_resync:
+                    self.resync(now)
+                    next_resync = now + timedelta(seconds=self.resync_interval)
+                self.dispatch_due(now)
+            except Exception:
+                logger.exception('Reminder scheduler iteration failed')
+            with self._changed:
+                next_due = self.schedule.next_due()
+                wake_at = min(next_due, next_resync) if next_due else next_resync
+                timeout = max(0.0, (wake_at - datetime.utcnow()).total_seconds())
+                if not self._stopping.is_set():
+                    self._changed.wait(min(timeout, self.resync_interval))
+
+
+@job('visits.remind')
+def send_visit_reminder(payload, job):
+    visit = db.session.get(Visit, payload['visit_id'])
+    # The visit may have been cancelled or moved since the reminder was queued
+    if (visit is None or visit.visit_status not in ACTIVE_VISIT_STATUSES or
+            visit.appointment_time.isoformat() != payload['appointment_time']):
+        return
+    message = REMINDER_MESSAGE.format(time=visit.appointment_time)
+    get_sender().send(visit.patient_user_id, message, visit_id=visit.id, event='reminder')
+
+
+def init_reminders(app):
+    service = app.extensions['reminders'] = ReminderService(app)
+    if app.config.get('REMINDERS_ENABLED'):
+        service.start()
@@ -0,0 +1,59 @@
+# app/response_cache.py
+from functools import wraps
+from hashlib import sha256
+from threading import Lock
+from urllib.parse import urlencode
+
+from flask import make_response, request
+
+from app.caching import LRUCache
+
+
+class ResponseCache:
+    """Read-through cache of whole GET responses with strong ETags.
+
+    Entries are keyed by path plus sorted query arguments. Writers call
+    ``invalidate()`` after committing; a response computed while an
+    invalidation happened is served but not stored.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.generation = 0
+        self._lock = Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def cached(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            query = urlencode(sorted(request.args.items(multi=True)))
+            key = f'{request.path}?{query}'
+
+            entry = self.entries.get(key)
+            if entry is None:
+                generation = self.generation
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+                body = response.get_data()
+                entry = (body, response.mimetype, sha256(body).hexdigest())
+                with self._lock:
+                    if generation == self.generation:
+                        self.entries.set(key, entry)
+
+            body, mimetype, etag = entry
+            response = make_response(body)
+            response.mimetype = mimetype
+            response.set_etag(etag)
+            return response.make_conditional(request)
+
+        return wrapper
+
+
+# Public doctor/chamber directory: GET /doctors, /chambers and chamber schedules
+directory_cache = ResponseCache(maxsize=2048, ttl=300)
@@ -0,0 +1,57 @@
+# app/routes/__init__.py
+"""Blueprint registration, at startup or deferred to the first request.
+
+With ``LAZY_BLUEPRINTS`` the route modules, and the schemas, marshmallow
+and mapper configuration they pull in, are imported when the app is
+first called as a WSGI app (or ``register_blueprints`` is called)
+instead of in ``create_app``. CLI commands, job worker processes and
+tests that never serve a request then start without them; keep it off
+when forking workers from a preloaded app so they share the work.
+"""
+import importlib
+from threading import Lock
+
+BLUEPRINTS = ('auth', 'users', 'doctors', 'chambers', 'visits', 'schedules', 'imports', 'payments', 'jobs',
+              'analytics')
+
+
+class BlueprintLoader:
+    """Registers the blueprints once; in lazy mode also the WSGI middleware that triggers it."""
+
+    def __init__(self, app):
+        self.app = app
+        self.loaded = False
+        self.wsgi_app = None
+        self._lock = Lock()
+
+    def load(self):
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            from app.schemas import ma
+            ma.init_app(self.app)
+            names = BLUEPRINTS + (('metrics',) if self.app.config['METRICS_ENABLED'] else ())
+            for name in names:
+                self.app.register_blueprint(importlib.import_module(f'app.routes.{name}').bp)
+            self.loaded = True
+
+    def __call__(self, environ, start_response):
+        self.load()
+        return self.wsgi_app(environ, start_response)
+
+
+def init_blueprints(app):
+    loader = app.extensions['blueprints'] = BlueprintLoader(app)
+    if app.config['LAZY_BLUEPRINTS']:
+        loader.wsgi_app = app.wsgi_app
+        app.wsgi_app = loader
+    else:
+        loader.load()
+    return loader
+
+
+def register_blueprints(app):
+    """Register every blueprint now, e.g. before ``url_for`` or listing routes in lazy mode."""
+    app.extensions['blueprints'].load()
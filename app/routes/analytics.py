@@ -0,0 +1,74 @@
+# app/routes/analytics.py
+from datetime import date, datetime, timedelta
+
+from flask import Blueprint, request, jsonify
+from sqlalchemy import func, select
+
+from app.identity import admin_required
+from app.models import DailyRollup, db
+
+bp = Blueprint('analytics', __name__, url_prefix='/analytics')
+
+DEFAULT_REPORT_DAYS = 30
+MAX_REPORT_DAYS = 366
+
+
+def _date_range():
+    """The report's (start, end) dates; raises ValueError for a malformed one."""
+    end = request.args.get('end')
+    end = date.fromisoformat(end) if end else datetime.utcnow().date()
+    start = request.args.get('start')
+    start = date.fromisoformat(start) if start else end - timedelta(days=DEFAULT_REPORT_DAYS - 1)
+    return start, end
+
+
+def _daily_report(group_column, entity_id):
+    """Daily totals per ``group_column`` entity, read from the rollup table only."""
+    try:
+        start, end = _date_range()
+    except ValueError:
+        return jsonify({'error': 'start and end must be dates as YYYY-MM-DD'}), 400
+    if start > end or (end - start).days >= MAX_REPORT_DAYS:
+        return jsonify({'error': f'start must not be after end, and at most {MAX_REPORT_DAYS} days apart'}), 400
+
+    query = (
+        select(group_column, DailyRollup.day,
+               func.sum(DailyRollup.bookings), func.sum(DailyRollup.cancellations),
+               func.sum(DailyRollup.cost_total), func.sum(DailyRollup.costed_visits),
+               func.sum(DailyRollup.payment_net))
+        .where(DailyRollup.day.between(start, end))
+        .group_by(group_column, DailyRollup.day)
+        .order_by(group_column, DailyRollup.day)
+    )
+    if entity_id is not None:
+        query = query.where(group_column == entity_id)
+
+    return jsonify({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'rows': [{
+            group_column.key: group_id,
+            'day': day.isoformat(),
+            'bookings': bookings,
+            'cancellations': cancellations,
+            'cancellation_rate': round(cancellations / bookings, 4) if bookings else None,
+            'average_visit_cost': round(cost_total / costed_visits, 2) if costed_visits else None,
+            'net_payments': round(payment_net, 2)
+        } for group_id, day, bookings, cancellations, cost_total, costed_visits, payment_net
+            in db.session.execute(query)]
+    })
+
+
+# Revenue and cancellations of every doctor and chamber; admins only
+@bp.route('/doctors', methods=['GET'])
+@admin_required
+def get_doctor_report():
+    """Per-doctor daily bookings, cancellations, average cost and net payments."""
+    return _daily_report(DailyRollup.doctor_id, request.args.get('doctor_id', type=int))
+
+
+@bp.route('/chambers', methods=['GET'])
+@admin_required
+def get_chamber_report():
+    """Per-chamber daily bookings, cancellations, average cost and net payments."""
+    return _daily_report(DailyRollup.chamber_id, request.args.get('chamber_id', type=int))
@@ -1,6 +1,6 @@
 # app/routes/auth.py
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required
 from app.models import User, db
 from app.schemas import UserSchema
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -36,7 +36,7 @@ def signup():
     db.session.commit()
 
     # Create access token
-    access_token = create_access_token(identity=new_user.id)
+    access_token = create_access_token(identity=str(new_user.id))
 
     return jsonify({
         'message': 'User created successfully',
@@ -49,18 +49,23 @@ def signup():
 def login():
     data = request.get_json()
 
-    # Support both email and phone number login
-    user = User.query.filter(
-        (User.email == data.get('username')) |
-        (User.contact_number == data.get('username'))
-    ).first()
+    # Support both email and phone number login, as two point lookups on the
+    # unique indexes (an OR across both columns cannot use either)
+    username = data.get('username')
+    columns = (User.email, User.contact_number) if '@' in (username or '') else (User.contact_number, User.email)
+    user = None
+    if username:
+        for column in columns:
+            user = User.query.filter(column == username).first()
+            if user:
+                break
 
     if not user:
         return jsonify({'error': 'User not found'}), 404
 
     # In a real implementation, verify the auth_number or implement proper authentication
     # This is a simplified version
-    access_token = create_access_token(identity=user.id)
+    access_token = create_access_token(identity=str(user.id))
 
     return jsonify({
         'access_token': access_token,
@@ -1,35 +1,60 @@
 # app/routes/chambers.py
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import Chamber, Schedule, db
+from app.fieldsets import FieldsetError, requested_fieldset
+from app.loaders import CHAMBER_PLAN
+from app.models import Chamber, Doctor, Schedule, User, db
+from app.response_cache import directory_cache
 from app.schemas import ChamberSchema, ScheduleSchema
+from app.search import chamber_postings, fts_available, index_chambers, ranked_ids, reindex_chamber_doctors
+from app.serializers import FastSerializer
+from app.slots import ScheduleError, compile_schedule, schedule_cache
 
 bp = Blueprint('chambers', __name__, url_prefix='/chambers')
 chamber_schema = ChamberSchema()
-chambers_schema = ChamberSchema(many=True)
+chambers_schema = FastSerializer(ChamberSchema(many=True))
 schedule_schema = ScheduleSchema()
 
 
 @bp.route('', methods=['GET'])
+@directory_cache.cached
 def get_chambers():
     # Get query parameters
     location = request.args.get('location')
     doctor_id = request.args.get('doctor_id')
+    search = request.args.get('q')
+    try:
+        fieldset = requested_fieldset(ChamberSchema, chambers_schema, CHAMBER_PLAN)
+    except FieldsetError as exc:
+        return jsonify({'error': str(exc)}), 400
 
     query = Chamber.query
 
     if location:
-        query = query.filter(Chamber.location.ilike(f'%{location}%'))
+        query = query.filter(Chamber.id.in_(chamber_postings(location)))
     if doctor_id:
         query = query.join(Chamber.doctors).filter_by(id=doctor_id)
 
-    chambers = query.all()
-    return jsonify(chambers_schema.dump(chambers))
+    # Ranked, typo-tolerant search over locations
+    ranking = None
+    if search and fts_available():
+        ranking = ranked_ids('chamber_fts', search, within=query.with_entities(Chamber.id).statement)
+    if ranking is not None:
+        chambers = query.options(*fieldset.plan).filter(Chamber.id.in_(ranking)).all()
+        order = {chamber_id: rank for rank, chamber_id in enumerate(ranking)}
+        chambers.sort(key=lambda chamber: order[chamber.id])
+    else:
+        if search:
+            query = query.filter(Chamber.location.ilike(f'%{search}%'))
+        chambers = query.options(*fieldset.plan).all()
+
+    return jsonify(fieldset.serializer.dump(chambers))
 
 
 @bp.route('/<int:chamber_id>', methods=['GET'])
+@directory_cache.cached
 def get_chamber(chamber_id):
-    chamber = Chamber.query.get_or_404(chamber_id)
+    chamber = Chamber.query.options(*CHAMBER_PLAN).get_or_404(chamber_id)
     return jsonify(chamber_schema.dump(chamber))
 
 
@@ -37,6 +62,10 @@ def get_chamber(chamber_id):
 @jwt_required()
 def create_chamber():
     data = request.get_json()
+    try:
+        compile_schedule(data.get('schedule'))
+    except ScheduleError as exc:
+        return jsonify({'error': str(exc)}), 400
 
     # Create schedule first if provided
     schedule = None
@@ -61,7 +90,14 @@ def create_chamber():
         new_chamber.operators.extend(operators)
 
     db.session.add(new_chamber)
+    db.session.flush()
+    index_chambers([new_chamber])
+    reindex_chamber_doctors([doctor.id for doctor in new_chamber.doctors])
     db.session.commit()
+    directory_cache.invalidate()
+
+    if schedule:
+        schedule_cache.invalidate(schedule.id)
 
     return jsonify(chamber_schema.dump(new_chamber)), 201
 
@@ -71,13 +107,20 @@ def create_chamber():
 def update_chamber(chamber_id):
     chamber = Chamber.query.get_or_404(chamber_id)
     data = request.get_json()
+    try:
+        compile_schedule(data.get('schedule'))
+    except ScheduleError as exc:
+        return jsonify({'error': str(exc)}), 400
+    previous_doctor_ids = [doctor.id for doctor in chamber.doctors]
 
     if 'location' in data:
         chamber.location = data['location']
 
+    schedule_id = None
     if 'schedule' in data and chamber.schedule_id:
         schedule = Schedule.query.get(chamber.schedule_id)
         schedule.time_slots = data['schedule']
+        schedule_id = schedule.id
 
     if 'doctor_ids' in data:
         doctors = Doctor.query.filter(Doctor.id.in_(data['doctor_ids'])).all()
@@ -87,11 +130,21 @@ def update_chamber(chamber_id):
         operators = User.query.filter(User.id.in_(data['operator_ids'])).all()
         chamber.operators = operators
 
+    if 'location' in data or 'doctor_ids' in data:
+        index_chambers([chamber])
+        reindex_chamber_doctors(previous_doctor_ids + [doctor.id for doctor in chamber.doctors])
+
     db.session.commit()
+    directory_cache.invalidate()
+
+    if schedule_id:
+        schedule_cache.invalidate(schedule_id)
+
     return jsonify(chamber_schema.dump(chamber))
 
 
 @bp.route('/<int:chamber_id>/schedule', methods=['GET'])
+@directory_cache.cached
 def get_chamber_schedule(chamber_id):
     chamber = Chamber.query.get_or_404(chamber_id)
     if not chamber.schedule_id:
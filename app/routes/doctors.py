@@ -1,45 +1,61 @@
 # app/routes/doctors.py
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.fieldsets import FieldsetError, requested_fieldset
+from app.loaders import DOCTOR_PLAN
 from app.models import Doctor, db
+from app.response_cache import directory_cache
 from app.schemas import DoctorSchema
+from app.search import doctor_postings, fts_available, index_doctors, ranked_ids
+from app.serializers import FastSerializer
 from sqlalchemy import or_
 
 bp = Blueprint('doctors', __name__, url_prefix='/doctors')
 doctor_schema = DoctorSchema()
-doctors_schema = DoctorSchema(many=True)
+doctors_schema = FastSerializer(DoctorSchema(many=True))
 
 
 @bp.route('', methods=['GET'])
+@directory_cache.cached
 def get_doctors():
     # Get query parameters for filtering
     specialization = request.args.get('specialization')
     location = request.args.get('location')
     name = request.args.get('name')
     hospital = request.args.get('hospital')
+    search = request.args.get('q')
+    try:
+        fieldset = requested_fieldset(DoctorSchema, doctors_schema, DOCTOR_PLAN)
+    except FieldsetError as exc:
+        return jsonify({'error': str(exc)}), 400
 
     query = Doctor.query
 
-    # Apply filters
-    if specialization:
-        query = query.filter(Doctor.specializations.contains([specialization]))
-    if hospital:
-        query = query.filter(Doctor.hospital_affiliations.contains([hospital]))
-    if name:
-        query = query.filter(Doctor.name.ilike(f'%{name}%'))
-    if location:
-        # Join with chambers and filter by location
-        query = query.join(Doctor.chambers).filter(
-            Chamber.location.ilike(f'%{location}%')
-        )
-
-    doctors = query.all()
-    return jsonify(doctors_schema.dump(doctors))
+    # Apply filters as an intersection of indexed doctor-id postings
+    postings = doctor_postings(specialization=specialization, hospital=hospital,
+                               location=location, name=name)
+    if postings is not None:
+        query = query.filter(Doctor.id.in_(postings))
+
+    # Ranked, typo-tolerant search over names, specializations and locations
+    ranking = None
+    if search and fts_available():
+        ranking = ranked_ids('doctor_fts', search, within=query.with_entities(Doctor.id).statement)
+    if ranking is not None:
+        doctors = query.options(*fieldset.plan).filter(Doctor.id.in_(ranking)).all()
+        order = {doctor_id: rank for rank, doctor_id in enumerate(ranking)}
+        doctors.sort(key=lambda doctor: order[doctor.id])
+    else:
+        if search:
+            query = query.filter(Doctor.name.ilike(f'%{search}%'))
+        doctors = query.options(*fieldset.plan).all()
+    return jsonify(fieldset.serializer.dump(doctors))
 
 
 @bp.route('/<int:doctor_id>', methods=['GET'])
+@directory_cache.cached
 def get_doctor(doctor_id):
-    doctor = Doctor.query.get_or_404(doctor_id)
+    doctor = Doctor.query.options(*DOCTOR_PLAN).get_or_404(doctor_id)
     return jsonify(doctor_schema.dump(doctor))
 
 
@@ -57,7 +73,10 @@ def create_doctor():
     )
 
     db.session.add(new_doctor)
+    db.session.flush()
+    index_doctors([new_doctor])
     db.session.commit()
+    directory_cache.invalidate()
 
     return jsonify(doctor_schema.dump(new_doctor)), 201
 
@@ -73,5 +92,9 @@ def update_doctor(doctor_id):
         if field in data:
             setattr(doctor, field, data[field])
 
+    if any(field in data for field in ('name', 'specializations', 'hospital_affiliations')):
+        index_doctors([doctor])
+
     db.session.commit()
+    directory_cache.invalidate()
     return jsonify(doctor_schema.dump(doctor))
\ No newline at end of file
@@ -0,0 +1,34 @@
+# app/routes/imports.py
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app.bulk_import import DEFAULT_BATCH_SIZE, IMPORTERS, MAX_BATCH_SIZE, iter_records
+
+bp = Blueprint('imports', __name__, url_prefix='/import')
+
+CONTENT_TYPE_FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+}
+
+
+@bp.route('/<kind>', methods=['POST'])
+@jwt_required()
+def bulk_import(kind):
+    if kind not in IMPORTERS:
+        return jsonify({'error': f'Unknown import type: {kind}'}), 404
+
+    fmt = request.args.get('format') or CONTENT_TYPE_FORMATS.get(request.mimetype)
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Send text/csv or application/x-ndjson, or pass ?format='}), 400
+
+    try:
+        batch_size = int(request.args.get('batch_size', DEFAULT_BATCH_SIZE))
+    except ValueError:
+        batch_size = 0
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        return jsonify({'error': f'batch_size must be a whole number from 1 to {MAX_BATCH_SIZE}'}), 400
+
+    # Parse straight off the request body instead of buffering it
+    result = IMPORTERS[kind](iter_records(request.stream, fmt), batch_size=batch_size)
+    return jsonify(result)
@@ -0,0 +1,48 @@
+# app/routes/jobs.py
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required
+from app.identity import admin_required
+from app.jobs import DEAD, queue_depth, retry_dead
+from app.models import Job, db
+
+bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+MAX_DEAD_LISTED = 200
+
+
+@bp.route('/metrics', methods=['GET'])
+@jwt_required()
+def get_job_metrics():
+    """Queue depth from the database plus this process's worker metrics."""
+    pool = current_app.extensions['jobs']
+    return jsonify({
+        'depth': queue_depth(),
+        'workers': pool.concurrency,
+        **pool.metrics.snapshot()
+    })
+
+
+# Dead jobs hold payment and notification payloads; only ADMIN_USER_IDS see them
+@bp.route('/dead', methods=['GET'])
+@admin_required
+def get_dead_jobs():
+    limit = min(request.args.get('limit', 50, type=int), MAX_DEAD_LISTED)
+    jobs = Job.query.filter_by(status=DEAD).order_by(Job.finished_time.desc(), Job.id.desc()).limit(limit)
+    return jsonify([{
+        'id': job.id,
+        'name': job.name,
+        'payload': job.payload,
+        'attempts': job.attempts,
+        'last_error': job.last_error,
+        'created_time': job.created_time.isoformat(),
+        'finished_time': job.finished_time.isoformat() if job.finished_time else None
+    } for job in jobs])
+
+
+@bp.route('/<int:job_id>/retry', methods=['POST'])
+@admin_required
+def retry_job(job_id):
+    if not retry_dead(job_id):
+        return jsonify({'error': 'Job not found or not dead'}), 404
+    db.session.commit()
+    return jsonify({'message': 'Job requeued'})
\ No newline at end of file
@@ -0,0 +1,10 @@
+# app/routes/metrics.py
+from flask import Blueprint, Response, current_app
+
+bp = Blueprint('metrics', __name__)
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """This process's request metrics in Prometheus text format."""
+    return Response(current_app.extensions['metrics'].render(), mimetype='text/plain; version=0.0.4')
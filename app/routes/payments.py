@@ -1,57 +1,102 @@
 # app/routes/payments.py
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import current_user, jwt_required, get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+from app.identity import is_admin
 from app.models import Visit, Payment, db
+from app.payments import PENDING, idempotency_cache, queue_payment
+from app.routes.visits import may_manage_visit
+from app.schemas import PaymentSchema
 
 bp = Blueprint('payments', __name__, url_prefix='/payments')
+payment_schema = PaymentSchema()
 
+MAX_IDEMPOTENCY_KEY_LENGTH = 80
 
-@bp.route('/deposit', methods=['POST'])
-@jwt_required()
-def make_deposit():
-    data = request.get_json()
+
+def _replay(payment, kind, visit_id, amount):
+    if payment.kind != kind or payment.visit_id != visit_id or payment.amount != amount:
+        return jsonify({'error': 'Idempotency-Key was already used for a different payment'}), 422
+    return jsonify(payment_schema.dump(payment))
+
+
+def submit_payment(kind, data, amount, transaction_id):
+    """Record a pending payment and its processing job once per Idempotency-Key.
+
+    Retries with the same key return the existing payment instead of
+    creating another; the gateway call happens on a job worker. The caller
+    has checked that ``data['visit_id']`` exists and the user may submit it.
+    """
+    processor = current_app.extensions['payments']
+    if not processor.configured:
+        return jsonify({'error': 'Payment gateway is not configured'}), 503
+
+    key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+    if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return jsonify({'error': f'An Idempotency-Key of at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters is required'}), 400
+    scoped_key = f'{get_jwt_identity()}:{key}'
     visit_id = data['visit_id']
-    visit = Visit.query.get_or_404(visit_id)
 
-    # Implement Bkash integration here
-    # Handle payment processing
+    payment_id = idempotency_cache.get(scoped_key)
+    if payment_id is not None:
+        return _replay(db.session.get(Payment, payment_id), kind, visit_id, amount)
+
     payment = Payment(
         visit_id=visit_id,
-        amount=data['amount'],
+        kind=kind,
+        amount=amount,
         payment_method='bkash',
         bkash_number=data['bkash_number'],
-        transaction_id=data['transaction_id'],
-        status='completed'
+        transaction_id=transaction_id,
+        status=PENDING,
+        idempotency_key=scoped_key
     )
-
     db.session.add(payment)
-    visit.payment_status = 'deposit_paid'
-    db.session.commit()
+    try:
+        db.session.flush()
+        queue_payment(payment.id)
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent or earlier request already holds this key
+        db.session.rollback()
+        payment = Payment.query.filter_by(idempotency_key=scoped_key).first_or_404()
+        idempotency_cache.set(scoped_key, payment.id)
+        return _replay(payment, kind, visit_id, amount)
 
-    return jsonify({'message': 'Deposit payment successful'})
+    idempotency_cache.set(scoped_key, payment.id)
+    return jsonify(payment_schema.dump(payment)), 202
 
 
-@bp.route('/refund', methods=['POST'])
+@bp.route('/deposit', methods=['POST'])
 @jwt_required()
-def process_refund():
+def make_deposit():
     data = request.get_json()
-    visit_id = data['visit_id']
-    visit = Visit.query.get_or_404(visit_id)
+    visit = Visit.query.get_or_404(data['visit_id'])
+    if not current_user.may_act_for(visit.booking_user_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+    return submit_payment('deposit', data, data['amount'], data.get('transaction_id'))
 
-    # Implement refund logic here
-    # Handle Bkash refund processing
 
-    refund = Payment(
-        visit_id=visit_id,
-        amount=-data['amount'],  # Negative amount for refund
-        payment_method='bkash',
-        bkash_number=data['bkash_number'],
-        transaction_id=data['refund_transaction_id'],
-        status='refunded'
-    )
+@bp.route('/refund', methods=['POST'])
+@jwt_required()
+def process_refund():
+    data = request.get_json()
+    visit = Visit.query.get_or_404(data['visit_id'])
+    # Refunds are issued by the chamber, not the payer
+    if not (may_manage_visit(visit) or is_admin(current_user)):
+        return jsonify({'error': 'Unauthorized'}), 403
+    # Negative amount for refund; refund_transaction_id names the deposit to
+    # refund (transaction_id is accepted too, as for deposits)
+    transaction_id = data.get('refund_transaction_id') or data.get('transaction_id')
+    return submit_payment('refund', data, -data['amount'], transaction_id)
 
-    db.session.add(refund)
-    visit.payment_status = 'refunded'
-    db.session.commit()
 
-    return jsonify({'message': 'Refund processed successfully'})
\ No newline at end of file
+@bp.route('/<int:payment_id>', methods=['GET'])
+@jwt_required()
+def get_payment(payment_id):
+    payment = Payment.query.get_or_404(payment_id)
+    # Payments carry the payer's bKash number; only the visit's booker sees them
+    visit = db.session.get(Visit, payment.visit_id)
+    if visit is None or visit.booking_user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(payment_schema.dump(payment))
\ No newline at end of file
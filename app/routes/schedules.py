@@ -1,11 +1,16 @@
 # app/routes/schedules.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, abort
 from flask_jwt_extended import jwt_required
 from app.models import Schedule, Chamber, db
+from app.response_cache import directory_cache
+from app.slots import ScheduleError, calculate_available_slots, compile_schedule, get_compiled_schedule, schedule_cache
 from datetime import datetime, timedelta
 
 bp = Blueprint('schedules', __name__, url_prefix='/schedules')
 
+# Enough for the mobile calendar to render a month view in one call
+MAX_RANGE_DAYS = 62
+
 
 @bp.route('/chamber/<int:chamber_id>/slots', methods=['POST'])
 @jwt_required()
@@ -13,19 +18,28 @@ def create_time_slots(chamber_id):
     data = request.get_json()
     chamber = Chamber.query.get_or_404(chamber_id)
 
+    time_slots = {
+        'weekday': data['weekday_slots'],
+        'weekend': data['weekend_slots'],
+        'exceptions': data.get('exceptions', [])
+    }
+    try:
+        compile_schedule(time_slots)
+    except ScheduleError as exc:
+        return jsonify({'error': str(exc)}), 400
+
     # Create regular schedule
-    schedule = Schedule(
-        chamber_id=chamber_id,
-        time_slots={
-            'weekday': data['weekday_slots'],
-            'weekend': data['weekend_slots'],
-            'exceptions': data.get('exceptions', [])
-        }
-    )
+    schedule = Schedule(chamber_id=chamber_id, time_slots=time_slots)
 
     db.session.add(schedule)
+    db.session.flush()
+    previous_schedule_id = chamber.schedule_id
     chamber.schedule_id = schedule.id
     db.session.commit()
+    directory_cache.invalidate()
+
+    if previous_schedule_id:
+        schedule_cache.invalidate(previous_schedule_id)
 
     return jsonify({'message': 'Schedule created successfully'})
 
@@ -33,16 +47,53 @@ def create_time_slots(chamber_id):
 @bp.route('/chamber/<int:chamber_id>/available-slots', methods=['GET'])
 def get_available_slots(chamber_id):
     date = request.args.get('date')
-    doctor_id = request.args.get('doctor_id')
+    from_date = request.args.get('from')
+    to_date = request.args.get('to')
+    doctor_id = request.args.get('doctor_id', type=int)
 
-    # Get chamber schedule
-    chamber = Chamber.query.get_or_404(chamber_id)
-    schedule = Schedule.query.get(chamber.schedule_id)
+    # Get chamber schedule version without loading the time_slots document
+    row = db.session.query(Chamber.schedule_id, Schedule.version).outerjoin(
+        Schedule, Schedule.id == Chamber.schedule_id
+    ).filter(Chamber.id == chamber_id).first()
+    if row is None:
+        abort(404)
+    schedule_id, version = row
+    if not schedule_id or version is None:
+        return jsonify({'error': 'No schedule found'}), 404
+
+    try:
+        if from_date or to_date:
+            start_day = datetime.fromisoformat(from_date or to_date).date()
+            end_day = datetime.fromisoformat(to_date or from_date).date()
+        else:
+            start_day = end_day = datetime.fromisoformat(date).date() if date else datetime.utcnow().date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+
+    if end_day < start_day:
+        return jsonify({'error': 'to must not be before from'}), 400
+    if (end_day - start_day).days >= MAX_RANGE_DAYS:
+        return jsonify({'error': f'Date range is limited to {MAX_RANGE_DAYS} days'}), 400
+
+    try:
+        compiled = get_compiled_schedule(schedule_id, version)
+    except ScheduleError as exc:
+        return jsonify({'error': f'Chamber schedule is invalid: {exc}'}), 400
 
     # Calculate available slots based on schedule and existing appointments
-    # Return list of available time slots
+    available = calculate_available_slots(compiled, chamber_id, doctor_id, start_day, end_day)
+
+    if from_date or to_date:
+        return jsonify({
+            'from': start_day.isoformat(),
+            'to': end_day.isoformat(),
+            'available_slots': {
+                day.isoformat(): [slot.isoformat() for slot in slots]
+                for day, slots in available.items()
+            }
+        })
 
     return jsonify({
-        'date': date,
-        'available_slots': calculate_available_slots(schedule, date, doctor_id)
-    })
\ No newline at end of file
+        'date': start_day.isoformat(),
+        'available_slots': [slot.isoformat() for slot in available[start_day]]
+    })
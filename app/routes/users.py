@@ -1,26 +1,30 @@
 # app/routes/users.py
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import User, db
+from flask_jwt_extended import jwt_required, current_user
+from app.family import family_of
+from app.loaders import USER_PLAN
+from app.models import Prescription, User, Visit, db
 from app.schemas import UserSchema
+from app.serializers import FastSerializer
+from sqlalchemy import select
 
 bp = Blueprint('users', __name__, url_prefix='/users')
 user_schema = UserSchema()
-users_schema = UserSchema(many=True)
+users_schema = FastSerializer(UserSchema(many=True))
+family_member_schema = FastSerializer(UserSchema(exclude=('dependents',)))
 
 
 @bp.route('/<int:user_id>', methods=['GET'])
 @jwt_required()
 def get_user(user_id):
-    user = User.query.get_or_404(user_id)
+    user = User.query.options(*USER_PLAN).get_or_404(user_id)
     return jsonify(user_schema.dump(user))
 
 
 @bp.route('/<int:user_id>', methods=['PUT'])
 @jwt_required()
 def update_user(user_id):
-    current_user_id = get_jwt_identity()
-    if current_user_id != user_id:
+    if current_user.id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
 
     user = User.query.get_or_404(user_id)
@@ -39,15 +43,63 @@ def update_user(user_id):
 @bp.route('/<int:user_id>/dependents', methods=['GET'])
 @jwt_required()
 def get_dependents(user_id):
-    user = User.query.get_or_404(user_id)
-    return jsonify(users_schema.dump(user.dependents))
+    User.query.get_or_404(user_id)
+    dependents = User.query.options(*USER_PLAN).filter_by(primary_user_id=user_id).all()
+    return jsonify(users_schema.dump(dependents))
+
+
+@bp.route('/<int:user_id>/family', methods=['GET'])
+@jwt_required()
+def get_family(user_id):
+    """The whole account ``user_id`` belongs to, flat and linked by id, in one query.
+
+    Members come root first, then by depth; each carries its
+    ``primary_user_id``, ``depth`` and ``dependent_ids``.
+    """
+    rows = family_of(user_id)
+    if not rows:
+        return jsonify({'error': 'User not found'}), 404
+    if not any(user.id == current_user.id for user, _ in rows):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    members = {}
+    for user, depth in rows:
+        member = members[user.id] = family_member_schema.dump(user)
+        member.update(primary_user_id=user.primary_user_id, depth=depth, dependent_ids=[])
+        if user.primary_user_id in members:
+            members[user.primary_user_id]['dependent_ids'].append(user.id)
+    return jsonify({'root_id': rows[0][0].id, 'users': list(members.values())})
+
+
+@bp.route('/<int:user_id>/prescriptions', methods=['GET'])
+@jwt_required()
+def get_prescription_history(user_id):
+    """Every prescription written for ``user_id``, oldest first, in one query."""
+    # The patient, or the primary user booking for them
+    if not current_user.may_act_for(user_id):
+        return jsonify({'error': 'Unauthorized'}), 403
+    User.query.get_or_404(user_id)
+    rows = db.session.execute(
+        select(Prescription.visit_id, Prescription.doctor_id, Visit.appointment_time,
+               Prescription.created_time, Prescription.updated_time, Prescription.content)
+        .join(Visit, Visit.id == Prescription.visit_id)
+        .where(Prescription.patient_user_id == user_id)
+        .order_by(Prescription.created_time, Prescription.id)
+    ).mappings().all()
+    return jsonify([{
+        'visit_id': row['visit_id'],
+        'doctor_id': row['doctor_id'],
+        'appointment_time': row['appointment_time'].isoformat(),
+        'created_time': row['created_time'].isoformat(),
+        'updated_time': row['updated_time'].isoformat(),
+        'prescription': row['content']
+    } for row in rows])
 
 
 @bp.route('/<int:user_id>/dependents', methods=['POST'])
 @jwt_required()
 def add_dependent(user_id):
-    current_user_id = get_jwt_identity()
-    if current_user_id != user_id:
+    if current_user.id != user_id:
         return jsonify({'error': 'Unauthorized'}), 403
 
     data = request.get_json()
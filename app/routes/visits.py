@@ -1,29 +1,142 @@
 # app/routes/visits.py
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import Visit, Doctor, Chamber, User, db
+from flask import Blueprint, Response, abort, current_app, request, jsonify, send_file, stream_with_context
+from flask_jwt_extended import jwt_required, current_user
+from app.config import begin_write
+from app.documents import get_document_store
+from app.fieldsets import FieldsetError, requested_fieldset
+from app.loaders import VISIT_PLAN
+from app.notifications import notify_visit
+from app.models import ACTIVE_VISIT_STATUSES, Prescription, Visit, VisitDocument, Doctor, Chamber, chamber_operator, db
 from app.schemas import VisitSchema, VisitDocumentSchema
+from app.serializers import FastSerializer
 from datetime import datetime, timedelta
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select, tuple_, union
+from sqlalchemy.exc import IntegrityError
+from werkzeug.utils import secure_filename
+import base64
+import os
 
 bp = Blueprint('visits', __name__, url_prefix='/visits')
 visit_schema = VisitSchema()
-visits_schema = VisitSchema(many=True)
-visit_document_schema = VisitDocumentSchema()
-
-
-def check_time_slot_available(chamber_id, doctor_id, appointment_time):
-    # Check if the time slot is available
-    existing_visit = Visit.query.filter(
-        and_(
-            Visit.chamber_id == chamber_id,
-            Visit.doctor_id == doctor_id,
-            Visit.appointment_time == appointment_time,
-            Visit.visit_status.in_(['scheduled', 'confirmed'])
-        )
-    ).first()
-
-    return existing_visit is None
+visits_schema = FastSerializer(VisitSchema(many=True))
+visit_documents_schema = VisitDocumentSchema(many=True)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+STREAM_BATCH_SIZE = 500
+MAX_BATCH_OPERATIONS = 500
+DOCUMENT_MAX_AGE = 3600
+BATCH_UPDATE_FIELDS = ['booking_remarks', 'visit_status', 'visit_cost', 'cancel_reason']
+
+
+def encode_cursor(visit):
+    raw = f'{visit.appointment_time.isoformat()}|{visit.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+    appointment_time, visit_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(appointment_time), int(visit_id)
+
+
+def may_access_visit(visit):
+    """The booker, the patient or their primary user, and the chamber's operators."""
+    if visit.booking_user_id == current_user.id or current_user.may_act_for(visit.patient_user_id):
+        return True
+    return may_manage_visit(visit)
+
+
+def may_manage_visit(visit):
+    """The chamber's operators, who act for its doctors (doctors have no user account)."""
+    return db.session.execute(select(chamber_operator.c.chamber_id).where(
+        chamber_operator.c.chamber_id == visit.chamber_id,
+        chamber_operator.c.operator_id == current_user.id
+    )).first() is not None
+
+
+def legacy_documents(visit):
+    """Metadata-only entries of the pre-store ``visit_document_ids`` column."""
+    return [{
+        'external_document_id': entry.get('id'),
+        'document_type': entry.get('type'),
+        'upload_time': entry.get('upload_time'),
+        'legacy': True
+    } for entry in visit.visit_document_ids or [] if isinstance(entry, dict)]
+
+
+def parse_visit_cost(value):
+    """``visit_cost`` as a float (numeric strings accepted) or None; ValueError otherwise."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(value)
+    return float(value)
+
+
+def stream_visits(query, fmt, serialize_visit):
+    """Serialize ``query`` row by row as NDJSON or a chunked JSON array."""
+    dumps = current_app.json.dumps
+    rows = query.yield_per(STREAM_BATCH_SIZE)
+
+    if fmt == 'ndjson':
+        for visit in rows:
+            yield dumps(serialize_visit(visit)) + '\n'
+        return
+
+    yield '['
+    separator = ''
+    for visit in rows:
+        yield separator + dumps(serialize_visit(visit))
+        separator = ','
+    yield ']'
+
+
+def find_slot_holders(slots):
+    """Map each (chamber_id, doctor_id, appointment_time) in ``slots`` held
+    by active visits to those visits' ids, in one query.
+    """
+    if not slots:
+        return {}
+    rows = db.session.query(Visit.chamber_id, Visit.doctor_id, Visit.appointment_time, Visit.id).filter(
+        tuple_(Visit.chamber_id, Visit.doctor_id, Visit.appointment_time).in_(list(slots)),
+        Visit.visit_status.in_(ACTIVE_VISIT_STATUSES)
+    )
+    holders = {}
+    for chamber_id, doctor_id, appointment_time, visit_id in rows:
+        holders.setdefault((chamber_id, doctor_id, appointment_time), set()).add(visit_id)
+    return holders
+
+
+def waiting_cycles(waits):
+    """Ids on a cycle of ``{visit id: ids of visits whose slot it moves into}``."""
+    # Peel off visits that can move once the ones they wait for have
+    remaining = set(waits)
+    peeled = True
+    while peeled:
+        peeled = False
+        for visit_id in list(remaining):
+            if not waits[visit_id] & remaining:
+                remaining.discard(visit_id)
+                peeled = True
+    # What is left is on a cycle or waits for one
+    on_cycle = set()
+    for visit_id in remaining:
+        seen, frontier = set(), set(waits[visit_id] & remaining)
+        while frontier and visit_id not in seen:
+            seen |= frontier
+            frontier = {nxt for node in frontier for nxt in waits[node] & remaining} - seen
+        if visit_id in seen:
+            on_cycle.add(visit_id)
+    return on_cycle
+
+
+def active_slot(visit, changes=None):
+    """The slot ``visit`` holds once ``changes`` apply, or None if it will not be active."""
+    changes = changes or {}
+    if changes.get('visit_status', visit.visit_status) not in ACTIVE_VISIT_STATUSES:
+        return None
+    return visit.chamber_id, visit.doctor_id, changes.get('appointment_time', visit.appointment_time)
 
 
 @bp.route('', methods=['GET'])
@@ -34,15 +147,21 @@ def get_visits():
     status = request.args.get('status')
     from_date = request.args.get('from_date')
     to_date = request.args.get('to_date')
+    try:
+        # The pagination cursor reads appointment_time whatever is selected
+        fieldset = requested_fieldset(VisitSchema, visits_schema, VISIT_PLAN, required=('appointment_time',))
+    except FieldsetError as exc:
+        return jsonify({'error': str(exc)}), 400
 
     query = Visit.query
 
     if user_id:
+        # UNION of two index searches instead of an OR the planner may scan for
         query = query.filter(
-            or_(
-                Visit.booking_user_id == user_id,
-                Visit.patient_user_id == user_id
-            )
+            Visit.id.in_(union(
+                select(Visit.id).where(Visit.booking_user_id == user_id),
+                select(Visit.id).where(Visit.patient_user_id == user_id)
+            ))
         )
 
     if doctor_id:
@@ -57,21 +176,51 @@ def get_visits():
     if to_date:
         query = query.filter(Visit.appointment_time <= datetime.fromisoformat(to_date))
 
-    visits = query.order_by(Visit.appointment_time.desc()).all()
-    return jsonify(visits_schema.dump(visits))
+    # Keyset pagination on (appointment_time, id), newest first
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_time, cursor_id = decode_cursor(cursor)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(
+            or_(
+                Visit.appointment_time < cursor_time,
+                and_(Visit.appointment_time == cursor_time, Visit.id < cursor_id)
+            )
+        )
+
+    query = query.options(*fieldset.plan).order_by(Visit.appointment_time.desc(), Visit.id.desc())
+
+    stream = request.args.get('stream')
+    if stream:
+        if stream not in ('ndjson', 'json'):
+            return jsonify({'error': 'stream must be ndjson or json'}), 400
+        mimetype = 'application/x-ndjson' if stream == 'ndjson' else 'application/json'
+        rows = stream_visits(query, stream, fieldset.serializer.serialize)
+        return Response(stream_with_context(rows), mimetype=mimetype)
+
+    limit = max(1, min(request.args.get('limit', DEFAULT_PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    visits = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(visits[limit - 1]) if len(visits) > limit else None
+
+    return jsonify({
+        'visits': fieldset.serializer.dump(visits[:limit]),
+        'next_cursor': next_cursor
+    })
 
 
 @bp.route('/<int:visit_id>', methods=['GET'])
 @jwt_required()
 def get_visit(visit_id):
-    visit = Visit.query.get_or_404(visit_id)
+    visit = Visit.query.options(*VISIT_PLAN).get_or_404(visit_id)
     return jsonify(visit_schema.dump(visit))
 
 
 @bp.route('', methods=['POST'])
 @jwt_required()
 def create_visit():
-    current_user_id = get_jwt_identity()
+    current_user_id = current_user.id
     data = request.get_json()
 
     # Validate doctor and chamber
@@ -80,17 +229,15 @@ def create_visit():
 
     # Validate patient
     patient_user_id = data.get('patient_user_id', current_user_id)
-    if patient_user_id != current_user_id:
-        # Check if patient is a dependent of current user
-        patient = User.query.get_or_404(patient_user_id)
-        if patient.primary_user_id != current_user_id:
-            return jsonify({'error': 'Unauthorized to book for this patient'}), 403
+    # The patient must be the current user or one of their dependents
+    if not current_user.may_act_for(patient_user_id):
+        return jsonify({'error': 'Unauthorized to book for this patient'}), 403
 
-    # Check time slot availability
     appointment_time = datetime.fromisoformat(data['appointment_time'])
-    if not check_time_slot_available(data['chamber_id'], data['doctor_id'], appointment_time):
-        return jsonify({'error': 'Time slot not available'}), 400
-
+    try:
+        visit_cost = parse_visit_cost(data.get('visit_cost'))
+    except ValueError:
+        return jsonify({'error': 'visit_cost must be a number'}), 400
     new_visit = Visit(
         chamber_id=data['chamber_id'],
         doctor_id=data['doctor_id'],
@@ -98,12 +245,19 @@ def create_visit():
         patient_user_id=patient_user_id,
         booking_remarks=data.get('booking_remarks'),
         appointment_time=appointment_time,
-        visit_cost=data.get('visit_cost'),
+        visit_cost=visit_cost,
         visit_status='scheduled'
     )
 
+    # The slot is reserved atomically by the uq_visit_active_slot index
     db.session.add(new_visit)
-    db.session.commit()
+    try:
+        db.session.flush()
+        notify_visit(new_visit, 'booked')
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'Time slot not available'}), 400
 
     return jsonify(visit_schema.dump(new_visit)), 201
 
@@ -111,7 +265,7 @@ def create_visit():
 @bp.route('/<int:visit_id>', methods=['PUT'])
 @jwt_required()
 def update_visit(visit_id):
-    current_user_id = get_jwt_identity()
+    current_user_id = current_user.id
     visit = Visit.query.get_or_404(visit_id)
     data = request.get_json()
 
@@ -119,13 +273,17 @@ def update_visit(visit_id):
     if visit.booking_user_id != current_user_id:
         return jsonify({'error': 'Unauthorized'}), 403
 
+    if 'visit_cost' in data:
+        try:
+            data['visit_cost'] = parse_visit_cost(data['visit_cost'])
+        except ValueError:
+            return jsonify({'error': 'visit_cost must be a number'}), 400
+
     # Handle rescheduling
     if 'appointment_time' in data:
-        new_time = datetime.fromisoformat(data['appointment_time'])
-        if not check_time_slot_available(visit.chamber_id, visit.doctor_id, new_time):
-            return jsonify({'error': 'New time slot not available'}), 400
-        visit.appointment_time = new_time
+        visit.appointment_time = datetime.fromisoformat(data['appointment_time'])
         visit.visit_status = 'rescheduled'
+        notify_visit(visit, 'rescheduled')
 
     # Update other fields
     allowed_fields = ['booking_remarks', 'visit_status', 'visit_cost', 'cancel_reason']
@@ -133,14 +291,18 @@ def update_visit(visit_id):
         if field in data:
             setattr(visit, field, data[field])
 
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({'error': 'New time slot not available'}), 400
     return jsonify(visit_schema.dump(visit))
 
 
 @bp.route('/<int:visit_id>', methods=['DELETE'])
 @jwt_required()
 def cancel_visit(visit_id):
-    current_user_id = get_jwt_identity()
+    current_user_id = current_user.id
     visit = Visit.query.get_or_404(visit_id)
 
     if visit.booking_user_id != current_user_id:
@@ -148,47 +310,227 @@ def cancel_visit(visit_id):
 
     visit.visit_status = 'cancelled'
     visit.cancel_reason = request.json.get('cancel_reason')
+    notify_visit(visit, 'cancelled')
 
     db.session.commit()
     return jsonify({'message': 'Visit cancelled successfully'})
 
 
-@bp.route('/<int:visit_id>/documents', methods=['POST'])
+@bp.route('/batch', methods=['POST'])
 @jwt_required()
-def upload_documents(visit_id):
-    visit = Visit.query.get_or_404(visit_id)
-    data = request.get_json()
+def batch_update_visits():
+    """Apply status, cost, reschedule and cancel operations to many visits.
+
+    Body: ``{"operations": [{"id": 1, "visit_status": "completed"},
+    {"id": 2, "cancel": true, "cancel_reason": "..."},
+    {"id": 3, "appointment_time": "..."}]}``. Valid operations are
+    committed together; each gets its own result entry. Visits can move
+    into slots other operations vacate, but not swap slots with each other.
+    """
+    current_user_id = current_user.id
+    operations = (request.get_json() or {}).get('operations') or []
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'}), 400
+
+    # Slot checks and writes see the same database state
+    begin_write(db.session)
+    visit_ids = {op['id'] for op in operations if isinstance(op, dict) and type(op.get('id')) is int}
+    visits = {visit.id: visit for visit in Visit.query.filter(Visit.id.in_(visit_ids))}
+    operated_chambers = set(db.session.execute(
+        select(chamber_operator.c.chamber_id).where(chamber_operator.c.operator_id == current_user_id)
+    ).scalars())
+
+    results = []
+    planned = []
+    for op in operations:
+        if not isinstance(op, dict) or type(op.get('id')) is not int:
+            results.append({'id': op.get('id') if isinstance(op, dict) else None,
+                            'status': 400, 'error': 'id must be an integer'})
+            continue
+        visit = visits.get(op['id'])
+        if visit is None:
+            results.append({'id': op['id'], 'status': 404, 'error': 'Visit not found'})
+            continue
+        if visit.booking_user_id != current_user_id and visit.chamber_id not in operated_chambers:
+            results.append({'id': visit.id, 'status': 403, 'error': 'Unauthorized'})
+            continue
+
+        changes = {field: op[field] for field in BATCH_UPDATE_FIELDS if field in op}
+        if 'visit_cost' in changes:
+            try:
+                changes['visit_cost'] = parse_visit_cost(changes['visit_cost'])
+            except ValueError:
+                results.append({'id': visit.id, 'status': 400, 'error': 'visit_cost must be a number'})
+                continue
+        if op.get('cancel'):
+            changes['visit_status'] = 'cancelled'
+        elif 'appointment_time' in op:
+            try:
+                changes['appointment_time'] = datetime.fromisoformat(op['appointment_time'])
+            except (TypeError, ValueError):
+                results.append({'id': visit.id, 'status': 400, 'error': 'Invalid appointment_time'})
+                continue
+            changes.setdefault('visit_status', 'rescheduled')
+
+        result = {'id': visit.id, 'status': 200}
+        results.append(result)
+        planned.append((visit, changes, result))
+
+    # Operations that move a visit onto a slot (reschedule or reactivate)
+    before = {visit.id: active_slot(visit) for visit, _, _ in planned}
+    after = {visit.id: active_slot(visit, changes) for visit, changes, _ in planned}
+    claims = {}
+    for visit, _, result in planned:
+        if after[visit.id] is not None and after[visit.id] != before[visit.id]:
+            claims.setdefault(after[visit.id], []).append((visit, result))
+    holders = find_slot_holders(claims)
+
+    # A visit staying on a slot keeps it; among the batch's claimants the
+    # first keeps it if its holders are all moving away. A refused move
+    # leaves its visit in place, which can block another claim, so repeat
+    # until nothing changes.
+    changed = True
+    while changed:
+        changed = False
+        moving_away = {visit.id for visit, _, result in planned
+                       if result['status'] == 200 and before[visit.id] not in (None, after[visit.id])}
+        waits = {}
+        for slot, claimants in claims.items():
+            free = not holders.get(slot, set()) - moving_away
+            for visit, result in claimants:
+                if result['status'] != 200:
+                    continue
+                if free:
+                    free = False
+                    waits[visit.id] = holders.get(slot, set()) & moving_away
+                    continue
+                result.update(status=400, error='Time slot not available')
+                changed = True
+        # Visits swapping slots would each have to move first; the slot
+        # index rejects either order, so refuse them up front
+        swapped = waiting_cycles(waits)
+        for visit, _, result in planned:
+            if visit.id in swapped:
+                result.update(status=400, error='Visits cannot swap slots in one batch; '
+                                                'move one of them to a free slot first')
+                changed = True
+
+    # One savepoint per operation so a conflict the checks above could not
+    # see (a concurrent booking) fails only its own operation; a move into
+    # a slot another operation vacates is retried after that one applied
+    pending = [item for item in planned if item[2]['status'] == 200]
+    while pending:
+        failed = []
+        for visit, changes, result in pending:
+            try:
+                with db.session.begin_nested():
+                    for field, value in changes.items():
+                        setattr(visit, field, value)
+                    if changes.get('visit_status') == 'cancelled':
+                        notify_visit(visit, 'cancelled')
+                    elif 'appointment_time' in changes:
+                        notify_visit(visit, 'rescheduled')
+            except IntegrityError:
+                failed.append((visit, changes, result))
+        if len(failed) == len(pending):
+            for _, _, result in failed:
+                result.update(status=400, error='Time slot not available')
+            break
+        pending = failed
+
+    db.session.commit()
+    return jsonify({'results': results})
 
-    # In a real implementation, handle file uploads to a document storage service
-    # For now, we'll just store document metadata
-    if not visit.visit_document_ids:
-        visit.visit_document_ids = []
 
-    visit.visit_document_ids.append({
-        'id': data['document_id'],
-        'type': data['document_type'],
-        'upload_time': datetime.utcnow().isoformat()
-    })
+@bp.route('/<int:visit_id>/documents', methods=['POST'])
+@jwt_required()
+def upload_documents(visit_id):
+    """Store the ``file`` parts of a multipart upload against a visit.
 
+    Optional form field ``document_type`` applies to every file.
+    """
+    visit = Visit.query.get_or_404(visit_id)
+    if not may_access_visit(visit):
+        return jsonify({'error': 'Unauthorized'}), 403
+    if request.mimetype != 'multipart/form-data':
+        return jsonify({'error': 'Send documents as multipart/form-data'}), 415
+
+    store = get_document_store()
+    form, files = store.parse_upload(request.environ, current_app.config.get('DOCUMENT_MAX_BYTES'))
+    uploads = files.getlist('file')
+    try:
+        if not uploads:
+            return jsonify({'error': 'No file parts named "file"'}), 400
+        documents = []
+        for upload in uploads:
+            sha256, size = store.commit(upload.stream)
+            documents.append(VisitDocument(
+                visit_id=visit.id,
+                document_type=form.get('document_type'),
+                filename=secure_filename(upload.filename or '') or None,
+                content_type=upload.mimetype or 'application/octet-stream',
+                size=size,
+                sha256=sha256,
+                uploaded_by=current_user.id
+            ))
+    finally:
+        for _, upload in files.items(multi=True):
+            if not upload.stream.closed:
+                store.discard(upload.stream)
+
+    db.session.add_all(documents)
     db.session.commit()
-    return jsonify({'message': 'Document uploaded successfully'})
+    return jsonify(visit_documents_schema.dump(documents)), 201
 
 
 @bp.route('/<int:visit_id>/documents', methods=['GET'])
 @jwt_required()
 def get_documents(visit_id):
+    """Stored documents, then any entries recorded before the document store."""
     visit = Visit.query.get_or_404(visit_id)
-    return jsonify(visit.visit_document_ids or [])
+    if not may_access_visit(visit):
+        return jsonify({'error': 'Unauthorized'}), 403
+    documents = VisitDocument.query.filter_by(visit_id=visit_id).order_by(VisitDocument.id).all()
+    return jsonify(visit_documents_schema.dump(documents) + legacy_documents(visit))
+
+
+@bp.route('/<int:visit_id>/documents/<int:document_id>', methods=['GET'])
+@jwt_required()
+def download_document(visit_id, document_id):
+    document = VisitDocument.query.filter_by(id=document_id, visit_id=visit_id).first_or_404()
+    if not may_access_visit(db.session.get(Visit, visit_id)):
+        return jsonify({'error': 'Unauthorized'}), 403
+    path = get_document_store().path(document.sha256)
+    if not os.path.exists(path):
+        current_app.logger.error('Blob %s of document %s is missing', document.sha256, document.id)
+        abort(404)
+    # conditional=True answers Range and If-None-Match; the file body goes
+    # out through the server's file wrapper (sendfile where available)
+    return send_file(
+        path,
+        mimetype=document.content_type,
+        download_name=document.filename or f'document-{document.id}',
+        conditional=True,
+        etag=document.sha256,
+        max_age=DOCUMENT_MAX_AGE
+    )
 
 
 @bp.route('/<int:visit_id>/prescription', methods=['POST'])
 @jwt_required()
 def create_prescription(visit_id):
     visit = Visit.query.get_or_404(visit_id)
+    if not may_manage_visit(visit):
+        return jsonify({'error': 'Unauthorized'}), 403
     data = request.get_json()
 
-    # In a real implementation, validate that the current user is the doctor
-    visit.visit_prescription = data
+    prescription = Prescription.query.filter_by(visit_id=visit.id).first()
+    if prescription is None:
+        prescription = Prescription(visit_id=visit.id)
+        db.session.add(prescription)
+    prescription.patient_user_id = visit.patient_user_id
+    prescription.doctor_id = visit.doctor_id
+    prescription.content = data
     visit.visit_status = 'completed'
 
     db.session.commit()
@@ -199,6 +541,11 @@ def create_prescription(visit_id):
 @jwt_required()
 def get_prescription(visit_id):
     visit = Visit.query.get_or_404(visit_id)
-    if not visit.visit_prescription:
+    if not may_access_visit(visit):
+        return jsonify({'error': 'Unauthorized'}), 403
+    content = db.session.execute(
+        select(Prescription.content).where(Prescription.visit_id == visit_id)
+    ).scalar()
+    if not content:
         return jsonify({'error': 'No prescription found'}), 404
-    return jsonify(visit.visit_prescription)
\ No newline at end of file
+    return jsonify(content)
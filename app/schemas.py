@@ -1,9 +1,20 @@
 # app/schemas.py
-from app import ma
-from app.models import Doctor, Chamber, Schedule, User, Visit
+from flask_marshmallow import Marshmallow
+from app.metrics import timed_dump
+from app.models import Doctor, Chamber, Payment, Schedule, User, Visit, VisitDocument
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
-class DoctorSchema(SQLAlchemyAutoSchema):
+# Lives here rather than in the app package so processes that never load
+# the schemas (see LAZY_BLUEPRINTS) skip importing marshmallow
+ma = Marshmallow()
+
+
+class BaseSchema(SQLAlchemyAutoSchema):
+    # Dumps count towards the request's serialization time in /metrics
+    dump = timed_dump(SQLAlchemyAutoSchema.dump)
+
+
+class DoctorSchema(BaseSchema):
     class Meta:
         model = Doctor
 
@@ -16,7 +27,7 @@ class DoctorSchema(SQLAlchemyAutoSchema):
     chambers = ma.Nested('ChamberSchema', many=True, exclude=('doctors',))
 
 
-class ScheduleSchema(SQLAlchemyAutoSchema):
+class ScheduleSchema(BaseSchema):
     class Meta:
         model = Schedule
 
@@ -24,7 +35,7 @@ class ScheduleSchema(SQLAlchemyAutoSchema):
     time_slots = ma.auto_field()
 
 
-class ChamberSchema(SQLAlchemyAutoSchema):
+class ChamberSchema(BaseSchema):
     class Meta:
         model = Chamber
 
@@ -33,7 +44,7 @@ class ChamberSchema(SQLAlchemyAutoSchema):
     schedule = ma.Nested(ScheduleSchema)
     doctors = ma.Nested(DoctorSchema, many=True, exclude=('chambers',))
 
-class UserSchema(SQLAlchemyAutoSchema):
+class UserSchema(BaseSchema):
     class Meta:
         model = User
 
@@ -51,7 +62,7 @@ class UserSchema(SQLAlchemyAutoSchema):
     dependents = ma.Nested('UserSchema', many=True, exclude=('dependents',))
 
 
-class VisitSchema(SQLAlchemyAutoSchema):
+class VisitSchema(BaseSchema):
     class Meta:
         model = Visit
 
@@ -73,9 +84,34 @@ class VisitSchema(SQLAlchemyAutoSchema):
     chamber = ma.Nested(ChamberSchema, exclude=('doctors',))
 
 
-class VisitDocumentSchema(ma.Schema):
-    id = ma.String()
-    type = ma.String()
-    upload_time = ma.DateTime()
+class VisitDocumentSchema(BaseSchema):
+    class Meta:
+        model = VisitDocument
 
+    id = ma.auto_field()
+    visit_id = ma.auto_field()
+    document_type = ma.auto_field()
+    filename = ma.auto_field()
+    content_type = ma.auto_field()
+    size = ma.auto_field()
+    sha256 = ma.auto_field()
+    upload_time = ma.auto_field()
 
+
+class PaymentSchema(BaseSchema):
+    class Meta:
+        model = Payment
+        exclude = ('idempotency_key',)
+
+    id = ma.auto_field()
+    visit_id = ma.auto_field()
+    kind = ma.auto_field()
+    amount = ma.auto_field()
+    payment_method = ma.auto_field()
+    bkash_number = ma.auto_field()
+    transaction_id = ma.auto_field()
+    status = ma.auto_field()
+    attempts = ma.auto_field()
+    last_error = ma.auto_field()
+    timestamp = ma.auto_field()
+    updated_time = ma.auto_field()
\ No newline at end of file
@@ -0,0 +1,240 @@
+# app/search.py
+import sqlite3
+from weakref import WeakKeyDictionary
+
+from sqlalchemy import bindparam, event, intersect, literal_column, select, table as table_clause, text
+from app.models import Chamber, Doctor, db, doctor_chamber, doctor_hospital, doctor_specialization
+
+# Doctor JSON list attribute -> lookup table holding one row per value
+POSTING_TABLES = (
+    ('specializations', doctor_specialization),
+    ('hospital_affiliations', doctor_hospital),
+)
+
+# SQLite FTS5 trigram indexes; rowid is the doctor / chamber id. The
+# trigram tokenizer matches any substring of three or more characters.
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS doctor_fts USING fts5("
+    "name, specializations, locations, tokenize='trigram')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS chamber_fts USING fts5("
+    "location, tokenize='trigram')",
+)
+FTS_MIN_SQLITE = (3, 34, 0)
+FTS_MIN_TERM = 3
+SEARCH_LIMIT = 50
+
+_fts_engines = WeakKeyDictionary()
+
+
+@event.listens_for(db.metadata, 'after_create')
+def create_fts_tables(target, connection, **kw):
+    if connection.dialect.name == 'sqlite' and sqlite3.sqlite_version_info >= FTS_MIN_SQLITE:
+        for ddl in FTS_DDL:
+            connection.execute(text(ddl))
+        _fts_engines[connection.engine] = True
+
+
+def fts_available():
+    """True once the FTS tables exist; only a lasting answer is cached per engine.
+
+    An SQLite database without them yet may get them from ``create_all``
+    or ``flask search rebuild`` later, so that answer is checked again.
+    """
+    engine = db.engine
+    available = _fts_engines.get(engine)
+    if available is None:
+        if engine.dialect.name != 'sqlite' or sqlite3.sqlite_version_info < FTS_MIN_SQLITE:
+            available = _fts_engines[engine] = False
+        else:
+            available = db.session.execute(text(
+                "SELECT count(*) FROM sqlite_master WHERE name IN ('doctor_fts', 'chamber_fts')"
+            )).scalar() == 2
+            if available:
+                _fts_engines[engine] = True
+    return available
+
+
+def _phrase(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def substring_expression(column, value):
+    """FTS5 query matching ``value`` as a substring of ``column``."""
+    return f'{column} : {_phrase(value)}'
+
+
+def fuzzy_expression(value):
+    """FTS5 query OR-ing the trigrams of ``value``.
+
+    Rows sharing more trigrams rank higher under bm25, which tolerates
+    typos and partial words.
+    """
+    value = ' '.join(value.lower().split())
+    trigrams = dict.fromkeys(value[i:i + 3] for i in range(len(value) - 2))
+    return ' OR '.join(_phrase(trigram) for trigram in trigrams if trigram.strip())
+
+
+def index_doctors(doctors):
+    """Rewrite the lookup-table and FTS rows for ``doctors`` in the current transaction.
+
+    ``doctors`` only need ``id``, ``specializations`` and
+    ``hospital_affiliations`` attributes (plus ``name`` for FTS), and must
+    already have ids.
+    """
+    doctors = list(doctors)
+    if not doctors:
+        return
+    doctor_ids = [doctor.id for doctor in doctors]
+
+    for attribute, table in POSTING_TABLES:
+        db.session.execute(table.delete().where(table.c.doctor_id.in_(doctor_ids)))
+        rows = [
+            {'doctor_id': doctor.id, 'value': value}
+            for doctor in doctors
+            for value in set(getattr(doctor, attribute) or [])
+        ]
+        if rows:
+            db.session.execute(table.insert(), rows)
+
+    if not fts_available():
+        return
+
+    locations = {}
+    for doctor_id, location in db.session.execute(
+        select(doctor_chamber.c.doctor_id, Chamber.location)
+        .join(Chamber, Chamber.id == doctor_chamber.c.chamber_id)
+        .where(doctor_chamber.c.doctor_id.in_(doctor_ids))
+    ):
+        locations.setdefault(doctor_id, []).append(location)
+
+    db.session.execute(
+        text('DELETE FROM doctor_fts WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True)),
+        {'ids': doctor_ids}
+    )
+    db.session.execute(
+        text('INSERT INTO doctor_fts (rowid, name, specializations, locations) '
+             'VALUES (:id, :name, :specializations, :locations)'),
+        [{
+            'id': doctor.id,
+            'name': doctor.name,
+            'specializations': ' '.join(doctor.specializations or []),
+            'locations': '\n'.join(locations.get(doctor.id, []))
+        } for doctor in doctors]
+    )
+
+
+def index_chambers(chambers):
+    """Refresh the chamber FTS rows for ``chambers``.
+
+    Doctors list their chamber locations too; callers changing a location
+    or a chamber's doctors also call ``reindex_chamber_doctors``.
+    """
+    chambers = list(chambers)
+    if not chambers or not fts_available():
+        return
+    chamber_ids = [chamber.id for chamber in chambers]
+
+    db.session.execute(
+        text('DELETE FROM chamber_fts WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True)),
+        {'ids': chamber_ids}
+    )
+    db.session.execute(
+        text('INSERT INTO chamber_fts (rowid, location) VALUES (:id, :location)'),
+        [{'id': chamber.id, 'location': chamber.location} for chamber in chambers]
+    )
+
+
+def reindex_chamber_doctors(doctor_ids):
+    """Re-index doctors whose chamber set or chamber locations changed."""
+    if doctor_ids:
+        index_doctors(Doctor.query.filter(Doctor.id.in_(set(doctor_ids))).all())
+
+
+def rebuild_doctor_index(batch_size=1000):
+    for _, table in POSTING_TABLES:
+        db.session.execute(table.delete())
+
+    if db.engine.dialect.name == 'sqlite' and sqlite3.sqlite_version_info >= FTS_MIN_SQLITE:
+        for ddl in FTS_DDL:
+            db.session.execute(text(ddl))
+    if fts_available():
+        db.session.execute(text('DELETE FROM doctor_fts'))
+        db.session.execute(text('DELETE FROM chamber_fts'))
+
+    last_id = 0
+    while True:
+        batch = Doctor.query.filter(Doctor.id > last_id).order_by(Doctor.id).limit(batch_size).all()
+        if not batch:
+            break
+        index_doctors(batch)
+        last_id = batch[-1].id
+
+    last_id = 0
+    while True:
+        batch = Chamber.query.filter(Chamber.id > last_id).order_by(Chamber.id).limit(batch_size).all()
+        if not batch:
+            break
+        index_chambers(batch)
+        last_id = batch[-1].id
+
+    db.session.commit()
+
+
+def _fts_match(table, expression):
+    return select(literal_column('rowid')).select_from(table_clause(table)).where(
+        text(f'{table} MATCH :expression').bindparams(expression=expression)
+    )
+
+
+def ranked_ids(table, query, limit=SEARCH_LIMIT, within=None):
+    """Ids of the best ``limit`` fuzzy matches for ``query``, best first.
+
+    ``within`` is a SELECT of ids the other filters allow; it applies
+    before the limit. Returns None if ``query`` has no trigrams to match
+    (under ``FTS_MIN_TERM`` characters), for callers to fall back to LIKE.
+    """
+    expression = fuzzy_expression(query)
+    if not expression:
+        return None
+    rowid = literal_column('rowid')
+    statement = _fts_match(table, expression).order_by(literal_column('rank')).limit(limit)
+    if within is not None:
+        statement = statement.where(rowid.in_(within))
+    return db.session.execute(statement).scalars().all()
+
+
+def doctor_postings(specialization=None, hospital=None, location=None, name=None):
+    """Return a SELECT of doctor ids matching every given filter, or None."""
+    use_fts = fts_available()
+    postings = []
+    if specialization:
+        postings.append(select(doctor_specialization.c.doctor_id).where(
+            doctor_specialization.c.value == specialization))
+    if hospital:
+        postings.append(select(doctor_hospital.c.doctor_id).where(
+            doctor_hospital.c.value == hospital))
+    if location:
+        if use_fts and len(location) >= FTS_MIN_TERM:
+            postings.append(_fts_match('doctor_fts', substring_expression('locations', location)))
+        else:
+            postings.append(select(doctor_chamber.c.doctor_id).join(
+                Chamber, Chamber.id == doctor_chamber.c.chamber_id
+            ).where(Chamber.location.ilike(f'%{location}%')))
+    if name:
+        if use_fts and len(name) >= FTS_MIN_TERM:
+            postings.append(_fts_match('doctor_fts', substring_expression('name', name)))
+        else:
+            postings.append(select(Doctor.id).where(Doctor.name.ilike(f'%{name}%')))
+
+    if not postings:
+        return None
+    if len(postings) == 1:
+        return postings[0]
+    return intersect(*postings)
+
+
+def chamber_postings(location):
+    """Return a SELECT of chamber ids whose location contains ``location``."""
+    if fts_available() and len(location) >= FTS_MIN_TERM:
+        return _fts_match('chamber_fts', substring_expression('location', location))
+    return select(Chamber.id).where(Chamber.location.ilike(f'%{location}%'))
@@ -0,0 +1,211 @@
+# app/slots.py
+from datetime import date, datetime, time, timedelta
+from app.caching import LRUCache
+from app.models import ACTIVE_VISIT_STATUSES, Schedule, Visit, db, doctor_chamber
+
+DEFAULT_SLOT_MINUTES = 15
+# Friday and Saturday (Monday is 0)
+DEFAULT_WEEKEND_DAYS = (4, 5)
+
+
+class ScheduleError(ValueError):
+    """A ``Schedule.time_slots`` document that cannot be compiled."""
+
+
+class CompiledSchedule:
+    """Slot bitmaps derived from a ``Schedule.time_slots`` document.
+
+    Bit ``i`` of a day mask is the slot starting ``i * slot_minutes``
+    minutes after midnight.
+    """
+
+    __slots__ = ('slot_minutes', 'weekday_masks', 'exceptions')
+
+    def __init__(self, slot_minutes, weekday_masks, exceptions):
+        self.slot_minutes = slot_minutes
+        self.weekday_masks = weekday_masks
+        self.exceptions = exceptions
+
+    def day_mask(self, day):
+        mask = self.exceptions.get(day)
+        if mask is None:
+            mask = self.weekday_masks[day.weekday()]
+        return mask
+
+    def slot_index(self, moment):
+        return (moment.hour * 60 + moment.minute) // self.slot_minutes
+
+
+def _parse_minutes(value):
+    try:
+        hours, minutes = (int(part) for part in value.strip().split(':')[:2])
+    except (AttributeError, ValueError):
+        raise ScheduleError(f'Invalid time {value!r}; expected HH:MM') from None
+    if not (0 <= hours and 0 <= minutes < 60 and hours * 60 + minutes <= 24 * 60):
+        raise ScheduleError(f'Invalid time {value!r}; expected HH:MM')
+    return hours * 60 + minutes
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ScheduleError(f'Invalid exception date {value!r}; expected YYYY-MM-DD') from None
+
+
+def _compile_slots(entries, slot_minutes):
+    if entries is None:
+        return 0
+    if not isinstance(entries, list):
+        raise ScheduleError('Slots must be a list of "HH:MM", "HH:MM-HH:MM" or {"start", "end"} entries')
+
+    mask = 0
+    day_slots = 24 * 60 // slot_minutes
+    for entry in entries:
+        if isinstance(entry, dict):
+            if 'start' not in entry:
+                raise ScheduleError('Slot objects need a start')
+            start = _parse_minutes(entry['start'])
+            end = _parse_minutes(entry['end']) if entry.get('end') else start + slot_minutes
+        elif isinstance(entry, str) and '-' in entry:
+            start, end = (_parse_minutes(part) for part in entry.split('-', 1))
+        else:
+            start = _parse_minutes(entry)
+            end = start + slot_minutes
+
+        first = start // slot_minutes
+        last = min(-(-end // slot_minutes), day_slots)
+        if last > first:
+            mask |= ((1 << (last - first)) - 1) << first
+    return mask
+
+
+def compile_schedule(time_slots):
+    """Compile a ``Schedule.time_slots`` document; raises ``ScheduleError`` if it is malformed."""
+    time_slots = time_slots or {}
+    if not isinstance(time_slots, dict):
+        raise ScheduleError('Schedule must be an object')
+    try:
+        slot_minutes = int(time_slots.get('slot_minutes') or DEFAULT_SLOT_MINUTES)
+    except (TypeError, ValueError):
+        slot_minutes = 0
+    if not 0 < slot_minutes <= 24 * 60:
+        raise ScheduleError('slot_minutes must be a whole number of minutes up to a day')
+    weekend_days = time_slots.get('weekend_days', DEFAULT_WEEKEND_DAYS)
+    if not isinstance(weekend_days, (list, tuple)) or not all(day in range(7) for day in weekend_days):
+        raise ScheduleError('weekend_days must list weekdays from 0 (Monday) to 6')
+    weekend_days = set(weekend_days)
+
+    weekday_mask = _compile_slots(time_slots.get('weekday'), slot_minutes)
+    weekend_mask = _compile_slots(time_slots.get('weekend'), slot_minutes)
+    weekday_masks = tuple(
+        weekend_mask if day in weekend_days else weekday_mask
+        for day in range(7)
+    )
+
+    # An exception is either a bare date (closed all day) or a
+    # {"date": ..., "slots": [...]} override for that date
+    exceptions = {}
+    exception_list = time_slots.get('exceptions') or []
+    if not isinstance(exception_list, list):
+        raise ScheduleError('exceptions must be a list')
+    for exception in exception_list:
+        if isinstance(exception, dict):
+            day = _parse_date(exception.get('date'))
+            exceptions[day] = _compile_slots(exception.get('slots'), slot_minutes)
+        else:
+            exceptions[_parse_date(exception)] = 0
+
+    return CompiledSchedule(slot_minutes, weekday_masks, exceptions)
+
+
+class ScheduleCache(LRUCache):
+    """Compiled schedules keyed by schedule id, tagged with ``Schedule.version``.
+
+    An entry whose version no longer matches the row counts as a miss, so
+    a schedule rewritten by another worker is recompiled on next use.
+    """
+
+    def lookup(self, schedule_id, version):
+        with self._lock:
+            entry = self._data.get(schedule_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._data.move_to_end(schedule_id)
+            self.hits += 1
+            return entry[1]
+
+    def invalidate(self, schedule_id):
+        self.pop(schedule_id)
+
+
+schedule_cache = ScheduleCache(maxsize=4096)
+
+
+def get_compiled_schedule(schedule_id, version):
+    compiled = schedule_cache.lookup(schedule_id, version)
+    if compiled is None:
+        time_slots = db.session.query(Schedule.time_slots).filter_by(id=schedule_id).scalar()
+        compiled = compile_schedule(time_slots)
+        schedule_cache.set(schedule_id, (version, compiled))
+    return compiled
+
+
+def booked_slots(compiled, chamber_id, doctor_id, start_day, end_day):
+    """Return {date: mask} of booked slots in [start_day, end_day].
+
+    Slots are held per doctor, so without ``doctor_id`` a slot is only
+    booked once every doctor of the chamber (and any other doctor with a
+    visit there) holds it.
+    """
+    query = Visit.query.with_entities(Visit.doctor_id, Visit.appointment_time).filter(
+        Visit.chamber_id == chamber_id,
+        Visit.appointment_time >= datetime.combine(start_day, time.min),
+        Visit.appointment_time < datetime.combine(end_day + timedelta(days=1), time.min),
+        Visit.visit_status.in_(ACTIVE_VISIT_STATUSES)
+    )
+    if doctor_id:
+        query = query.filter(Visit.doctor_id == doctor_id)
+
+    by_doctor = {}
+    for visit_doctor_id, appointment_time in query:
+        day = appointment_time.date()
+        booked = by_doctor.setdefault(visit_doctor_id, {})
+        booked[day] = booked.get(day, 0) | (1 << compiled.slot_index(appointment_time))
+    if doctor_id or not by_doctor:
+        return by_doctor.get(doctor_id, {})
+
+    chamber_doctor_ids = db.session.query(doctor_chamber.c.doctor_id).filter(
+        doctor_chamber.c.chamber_id == chamber_id
+    )
+    doctors = [by_doctor.get(chamber_doctor_id, {}) for (chamber_doctor_id,) in chamber_doctor_ids
+               if chamber_doctor_id not in by_doctor]
+    doctors.extend(by_doctor.values())
+    booked = {}
+    for day, mask in doctors[0].items():
+        for other in doctors[1:]:
+            mask &= other.get(day, 0)
+        if mask:
+            booked[day] = mask
+    return booked
+
+
+def calculate_available_slots(compiled, chamber_id, doctor_id, start_day, end_day):
+    """Return {date: [datetime, ...]} of free slots in [start_day, end_day]."""
+    booked = booked_slots(compiled, chamber_id, doctor_id, start_day, end_day)
+    step = timedelta(minutes=compiled.slot_minutes)
+
+    available = {}
+    day = start_day
+    while day <= end_day:
+        mask = compiled.day_mask(day) & ~booked.get(day, 0)
+        midnight = datetime.combine(day, time.min)
+        slots = []
+        while mask:
+            lowest = mask & -mask
+            slots.append(midnight + step * (lowest.bit_length() - 1))
+            mask ^= lowest
+        available[day] = slots
+        day += timedelta(days=1)
+    return available
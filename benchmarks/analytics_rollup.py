@@ -0,0 +1,130 @@
+# benchmarks/analytics_rollup.py
+"""Rollup rebuild speed and report latency against ad hoc GROUP BYs.
+
+    python -m benchmarks.analytics_rollup --visits 500000
+
+Bulk-loads visits and settled payments, rebuilds the rollups with NumPy
+(when installed) and in pure Python, then times a 30-day doctor report
+read from the rollups against the same GROUP BY over the raw tables.
+Exits non-zero if a rebuild disagrees with the raw tables.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import case, func, select
+
+from app import create_app, db
+from app.analytics import check_parity, numpy_available, rebuild
+from app.models import Chamber, Doctor, Payment, User, Visit
+
+STATUSES = ['scheduled', 'completed', 'completed', 'completed', 'cancelled']
+
+
+def seed(visits, doctors, chambers, days):
+    rng = random.Random(7)
+    start = datetime(2029, 1, 1)
+    db.session.add(User(id=1, name='Patient'))
+    db.session.execute(Doctor.__table__.insert(), [{'id': i, 'name': f'Doctor {i}'} for i in range(1, doctors + 1)])
+    db.session.execute(Chamber.__table__.insert(), [{'id': i, 'location': f'Chamber {i}'} for i in range(1, chambers + 1)])
+    for offset in range(0, visits, 50000):
+        rows = []
+        for visit_id in range(offset + 1, min(visits, offset + 50000) + 1):
+            # Spread each doctor's visits over the days first, then the
+            # 15-minute slots of a day, between two chambers
+            doctor_id, slot = visit_id % doctors + 1, visit_id // doctors
+            rows.append({
+                'id': visit_id, 'doctor_id': doctor_id, 'chamber_id': (doctor_id + slot % 2) % chambers + 1,
+                'booking_user_id': 1, 'patient_user_id': 1,
+                'appointment_time': start + timedelta(days=slot % days, minutes=15 * (slot // days % 96)),
+                'visit_status': rng.choice(STATUSES),
+                'visit_cost': rng.choice([None, 500.0, 700.0, 1000.0])
+            })
+        db.session.execute(Visit.__table__.insert(), rows)
+        db.session.execute(Payment.__table__.insert(), [
+            {'visit_id': row['id'], 'amount': 500.0 if row['visit_status'] != 'cancelled' else -500.0,
+             'status': 'completed' if row['visit_status'] != 'cancelled' else 'refunded',
+             'kind': 'deposit' if row['visit_status'] != 'cancelled' else 'refund',
+             'timestamp': row['appointment_time'] - timedelta(days=1)}
+            for row in rows if row['visit_cost']
+        ])
+    db.session.commit()
+
+
+def timed(fn, repeat=1):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return result, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--visits', type=int, default=500000)
+    parser.add_argument('--doctors', type=int, default=200)
+    parser.add_argument('--chambers', type=int, default=50)
+    parser.add_argument('--days', type=int, default=365, help='Days of history the visits span.')
+    parser.add_argument('--repeat', type=int, default=20, help='Report requests timed per method.')
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'), 'JOB_WORKERS': 0,
+                          'ADMIN_USER_IDS': [1]})
+        with app.app_context():
+            db.create_all()
+            seed(args.visits, args.doctors, args.chambers, args.days)
+            headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+
+            methods = [('numpy', True)] if numpy_available() else []
+            for name, use_numpy in methods + [('python', False)]:
+                rows, seconds = timed(lambda: rebuild(use_numpy=use_numpy))
+                mismatches = check_parity()
+                failed |= bool(mismatches)
+                print(f'rebuild ({name:<6})      {seconds:7.2f}s for {args.visits} visits -> {rows} rollup rows, '
+                      f'{len(mismatches)} mismatches')
+
+            # The same 30-day report straight from the raw tables
+            end = (datetime(2029, 1, 1) + timedelta(days=args.days - 1)).date()
+            start = end - timedelta(days=29)
+            visit_day = func.date(Visit.appointment_time)
+
+            def raw_report():
+                visits = db.session.execute(
+                    select(Visit.doctor_id, visit_day, func.count(),
+                           func.sum(case((Visit.visit_status == 'cancelled', 1), else_=0)), func.avg(Visit.visit_cost))
+                    .where(Visit.appointment_time >= start, Visit.appointment_time < end + timedelta(days=1))
+                    .group_by(Visit.doctor_id, visit_day)
+                ).all()
+                payment_day = func.date(Payment.timestamp)
+                payments = db.session.execute(
+                    select(Visit.doctor_id, payment_day, func.sum(Payment.amount))
+                    .join(Visit, Visit.id == Payment.visit_id)
+                    .where(Payment.status.in_(['completed', 'refunded']),
+                           Payment.timestamp >= start, Payment.timestamp < end + timedelta(days=1))
+                    .group_by(Visit.doctor_id, payment_day)
+                ).all()
+                return visits, payments
+
+            _, raw_seconds = timed(raw_report, args.repeat)
+
+        client = app.test_client()
+        query = f'/analytics/doctors?start={start.isoformat()}&end={end.isoformat()}'
+        response, rollup_seconds = timed(lambda: client.get(query, headers=headers), args.repeat)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    print(f'30-day doctor report   {rollup_seconds * 1000:7.1f} ms from rollups (HTTP, '
+          f'{len(response.get_json()["rows"])} rows), {raw_seconds * 1000:7.1f} ms as GROUP BYs over raw tables')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
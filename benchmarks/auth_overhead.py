@@ -0,0 +1,114 @@
+# benchmarks/auth_overhead.py
+"""Authentication overhead per request, and login lookups on a large user table.
+
+    python -m benchmarks.auth_overhead --users 100000 --requests 2000
+
+Times a do-nothing ``@jwt_required`` route with the identity cache warm
+and with it cleared before every request, then the old OR login query
+against the two point lookups. Exits non-zero unless a dependent added
+through the API can be booked for straight away (cache invalidation).
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import select, text
+
+from app import create_app, db
+from app.identity import identity_cache
+from app.models import Chamber, Doctor, User
+
+
+def seed(users):
+    rows = [{'id': i, 'name': f'User {i}', 'email': f'user{i}@example.com',
+             'contact_number': f'01{i:09d}', 'is_primary_user': i % 4 != 0,
+             'primary_user_id': i - 1 if i % 4 == 0 else None}
+            for i in range(1, users + 1)]
+    db.session.execute(User.__table__.insert(), rows)
+    db.session.add_all([Doctor(id=1, name='Doctor', contact_number='01800000000'), Chamber(id=1, location='Dhanmondi')])
+    db.session.commit()
+
+
+def per_request_us(client, path, headers, requests, before=None):
+    timings = []
+    for _ in range(requests):
+        if before:
+            before()
+        started = time.perf_counter()
+        response = client.post(path, headers=headers)
+        timings.append((time.perf_counter() - started) * 1e6)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return statistics.median(timings)
+
+
+def per_lookup_us(lookup, usernames):
+    started = time.perf_counter()
+    for username in usernames:
+        lookup(username)
+    return (time.perf_counter() - started) / len(usernames) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'), 'JOB_WORKERS': 0})
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            seed(args.users)
+
+        login = client.post('/auth/login', json={'username': 'user3@example.com'})
+        headers = {'Authorization': 'Bearer ' + login.get_json()['access_token']}
+
+        warm = per_request_us(client, '/auth/logout', headers, args.requests)
+        cold = per_request_us(client, '/auth/logout', headers, args.requests, before=identity_cache.clear)
+
+        usernames = [f'user{i}@example.com' if i % 2 else f'01{i:09d}' for i in range(1, args.users, args.users // 1000 or 1)]
+        with app.app_context():
+            def or_lookup(username):
+                return db.session.execute(select(User).where(
+                    (User.email == username) | (User.contact_number == username)
+                )).first()
+
+            def point_lookups(username):
+                columns = (User.email, User.contact_number) if '@' in username else (User.contact_number, User.email)
+                for column in columns:
+                    user = db.session.execute(select(User).where(column == username)).first()
+                    if user:
+                        return user
+
+            or_us = per_lookup_us(or_lookup, usernames)
+            point_us = per_lookup_us(point_lookups, usernames)
+            plans = {}
+            for name, statement in (('or', select(User).where((User.email == 'x') | (User.contact_number == 'x'))),
+                                    ('point', select(User).where(User.email == 'x'))):
+                compiled = statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+                plans[name] = [row[-1] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}'))]
+
+        # A new dependent must be bookable at once, with the primary's identity cached
+        dependent = client.post('/users/3/dependents', headers=headers, json={'name': 'New dependent'}).get_json()
+        booking = client.post('/visits', headers=headers, json={
+            'doctor_id': 1, 'chamber_id': 1, 'patient_user_id': dependent['id'],
+            'appointment_time': '2030-01-01T09:00:00'
+        })
+        app.extensions['jobs'].stop()
+
+    print(f'@jwt_required request   {warm:8.1f} us with the identity cached, {cold:8.1f} us uncached '
+          f'({cold - warm:+.1f} us per lookup)')
+    print(f'login lookup            {or_us:8.1f} us OR query, {point_us:8.1f} us point lookups '
+          f'over {len(usernames)} usernames, {args.users} users')
+    print(f'OR query plan           {"; ".join(plans["or"])}')
+    print(f'point lookup plan       {"; ".join(plans["point"])}')
+    print(f'booking for a new dependent: HTTP {booking.status_code}')
+    sys.exit(0 if booking.status_code == 201 else 1)
+
+
+if __name__ == '__main__':
+    main()
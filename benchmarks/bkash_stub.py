@@ -0,0 +1,110 @@
+# benchmarks/bkash_stub.py
+"""Local stand-in for the bKash gateway, with configurable latency.
+
+    python -m benchmarks.bkash_stub --port 9090 --latency 0.5
+
+Then point the app at it with ``MEDIGO_BKASH_BASE_URL=http://127.0.0.1:9090``.
+Payments are recorded per ``merchantInvoiceNumber`` so repeated calls
+with the same reference return the original transaction.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubGateway(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, failure_rate=0.0):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.transactions = {}
+        self.calls = 0
+        self.executions = 0
+        self.lock = threading.Lock()
+        self._failures = 0.0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def should_fail(self):
+        with self.lock:
+            self._failures += self.failure_rate
+            if self._failures >= 1:
+                self._failures -= 1
+                return True
+            return False
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+        reference = payload.get('merchantInvoiceNumber')
+        with server.lock:
+            server.calls += 1
+        time.sleep(server.latency)
+
+        if self.path == '/payment/query':
+            transaction = server.transactions.get(reference)
+            if transaction is None:
+                return self._send(404, {'errorMessage': 'Unknown reference'})
+            return self._send(200, transaction)
+        if self.path not in ('/payment/execute', '/payment/refund'):
+            return self._send(404, {'errorMessage': 'Unknown endpoint'})
+        if server.should_fail():
+            return self._send(503, {'errorMessage': 'Service unavailable'})
+
+        with server.lock:
+            transaction = server.transactions.get(reference)
+            if transaction is None:
+                server.executions += 1
+                transaction = server.transactions[reference] = {
+                    'trxID': uuid.uuid4().hex[:10].upper(),
+                    'transactionStatus': 'Completed',
+                    'amount': payload.get('amount'),
+                    'merchantInvoiceNumber': reference,
+                }
+        self._send(200, transaction)
+
+
+def start_stub(latency=0.0, failure_rate=0.0, port=0):
+    """Start a stub gateway on a background thread; returns the server."""
+    server = StubGateway(('127.0.0.1', port), latency=latency, failure_rate=failure_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=9090)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds per gateway call.')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of calls answered with 503.')
+    args = parser.parse_args()
+
+    server = StubGateway(('127.0.0.1', args.port), latency=args.latency, failure_rate=args.failure_rate)
+    print(f'bKash stub listening on {server.base_url}')
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/booking_stress.py
+"""Concurrent booking stress test.
+
+Many threads race to book the same (chamber, doctor, appointment_time)
+slots using three strategies:
+
+* ``check-then-insert``: the old SELECT + INSERT path, no constraint
+* ``serialized``: the same path behind a process-wide lock
+* ``atomic``: INSERT guarded by the ``uq_visit_active_slot`` index
+
+Run with ``python -m benchmarks.booking_stress --threads 16 --slots 200``.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app import create_app, db
+from app.models import ACTIVE_VISIT_STATUSES, Chamber, Doctor, User, Visit
+
+STRATEGIES = ('check-then-insert', 'serialized', 'atomic')
+FIRST_SLOT = datetime(2030, 1, 1, 9, 0)
+
+
+def setup_database(app, strategy):
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        if strategy != 'atomic':
+            db.session.execute(text('DROP INDEX uq_visit_active_slot'))
+        db.session.add_all([
+            Doctor(id=1, name='Doctor', contact_number='01700000000'),
+            Chamber(id=1, location='Dhanmondi'),
+            User(id=1, name='Patient')
+        ])
+        db.session.commit()
+
+
+def check_time_slot_available(chamber_id, doctor_id, appointment_time):
+    # The SELECT the routes used before uq_visit_active_slot
+    return Visit.query.filter_by(chamber_id=chamber_id, doctor_id=doctor_id, appointment_time=appointment_time) \
+        .filter(Visit.visit_status.in_(ACTIVE_VISIT_STATUSES)).first() is None
+
+
+def book(strategy, appointment_time, lock):
+    visit = Visit(chamber_id=1, doctor_id=1, booking_user_id=1, patient_user_id=1,
+                  appointment_time=appointment_time, visit_status='scheduled')
+    if strategy == 'atomic':
+        db.session.add(visit)
+        try:
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    if strategy == 'serialized':
+        with lock:
+            return book('check-then-insert', appointment_time, None)
+
+    if not check_time_slot_available(1, 1, appointment_time):
+        # End the read transaction so its connection goes back to the pool
+        db.session.rollback()
+        return False
+    db.session.add(visit)
+    db.session.commit()
+    return True
+
+
+def run(app, strategy, threads, slots):
+    setup_database(app, strategy)
+    lock = threading.Lock()
+    counts = {'booked': 0, 'rejected': 0, 'errors': 0}
+    counts_lock = threading.Lock()
+    start_barrier = threading.Barrier(threads)
+
+    def worker():
+        local = {'booked': 0, 'rejected': 0, 'errors': 0}
+        with app.app_context():
+            start_barrier.wait()
+            for slot in range(slots):
+                appointment_time = FIRST_SLOT + timedelta(minutes=15 * slot)
+                try:
+                    local['booked' if book(strategy, appointment_time, lock) else 'rejected'] += 1
+                except OperationalError:
+                    db.session.rollback()
+                    local['errors'] += 1
+        with counts_lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        duplicates = db.session.query(Visit.appointment_time).group_by(
+            Visit.chamber_id, Visit.doctor_id, Visit.appointment_time
+        ).having(func.count() > 1).count()
+
+    attempts = threads * slots
+    return dict(counts, strategy=strategy, double_booked_slots=duplicates,
+                elapsed=elapsed, attempts_per_sec=attempts / elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--slots', type=int, default=200)
+    parser.add_argument('--strategy', choices=STRATEGIES, action='append')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+            'SQLALCHEMY_ENGINE_OPTIONS': {'connect_args': {'timeout': 30}}
+        })
+        print(f'{"strategy":<18}{"booked":>8}{"rejected":>10}{"errors":>8}'
+              f'{"double":>8}{"attempts/s":>12}')
+        for strategy in args.strategy or STRATEGIES:
+            result = run(app, strategy, args.threads, args.slots)
+            print(f'{strategy:<18}{result["booked"]:>8}{result["rejected"]:>10}'
+                  f'{result["errors"]:>8}{result["double_booked_slots"]:>8}'
+                  f'{result["attempts_per_sec"]:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bulk_import.py
+"""Bulk import throughput on a generated NDJSON/CSV fixture.
+
+    python -m benchmarks.bulk_import --doctors 100000 --chambers 20000
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+
+from app import create_app, db
+from app.bulk_import import import_chambers, import_doctors, iter_records
+
+SPECIALIZATIONS = ['Cardiology', 'Neurology', 'Medicine', 'Pediatrics', 'Orthopedics', 'Dermatology', 'ENT']
+HOSPITALS = ['DMCH', 'BSMMU', 'Square', 'Evercare', 'Labaid', 'Popular']
+AREAS = ['Dhanmondi', 'Gulshan', 'Banani', 'Mirpur', 'Uttara', 'Mohammadpur', 'Motijheel']
+
+
+def write_fixtures(tmp, doctors, chambers, rng):
+    doctors_path = os.path.join(tmp, 'doctors.csv')
+    with open(doctors_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'contact_number', 'specializations', 'hospital_affiliations', 'degrees'])
+        for i in range(doctors):
+            writer.writerow([f'Doctor {i}', f'01{i:09d}', ';'.join(rng.sample(SPECIALIZATIONS, 2)),
+                             rng.choice(HOSPITALS), 'MBBS;FCPS'])
+
+    chambers_path = os.path.join(tmp, 'chambers.ndjson')
+    with open(chambers_path, 'w') as f:
+        for i in range(chambers):
+            f.write(json.dumps({
+                'location': f'House {rng.randint(1, 200)}, Road {rng.randint(1, 40)}, {rng.choice(AREAS)}',
+                'schedule': {'weekday': ['09:00-13:00', '17:00-21:00'], 'weekend': ['10:00-12:00']},
+                'doctor_contact_numbers': [f'01{rng.randrange(doctors):09d}' for _ in range(3)],
+            }) + '\n')
+    return doctors_path, chambers_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--doctors', type=int, default=100000)
+    parser.add_argument('--chambers', type=int, default=20000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        doctors_path, chambers_path = write_fixtures(tmp, args.doctors, args.chambers, random.Random(7))
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db')})
+        with app.app_context():
+            db.create_all()
+            for label, importer, path, fmt in (
+                ('doctors (csv, insert)', import_doctors, doctors_path, 'csv'),
+                ('doctors (csv, update)', import_doctors, doctors_path, 'csv'),
+                ('chambers (ndjson)', import_chambers, chambers_path, 'ndjson'),
+            ):
+                with open(path, 'rb') as stream:
+                    result = importer(iter_records(stream, fmt), batch_size=args.batch_size)
+                print(f'{label:<24}{result["processed"]:>8} rows {result["elapsed_seconds"]:>8.1f}s '
+                      f'{result["rows_per_sec"]:>10.0f} rows/s  failed={result["failed"]}')
+
+
+if __name__ == '__main__':
+    main()
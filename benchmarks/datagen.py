@@ -0,0 +1,235 @@
+# benchmarks/datagen.py
+"""Fill a database with seeded, realistically shaped synthetic data.
+
+    python -m benchmarks.datagen --database sqlite:///load.db --scale 0.01
+
+Scale 1 is 50k doctors, 20k chambers, 1M users (a third of primaries
+with dependents) and 10M visits with their payments and prescriptions.
+The same --seed always produces the same rows. Ids are dense from 1 in a
+fresh database, which the load suite relies on; search indexes and the
+analytics rollups are rebuilt at the end.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app import create_app, db
+from app.models import (Chamber, Doctor, Payment, Prescription, Schedule, User, Visit,
+                        chamber_operator, doctor_chamber)
+
+FULL_SCALE = {'doctors': 50000, 'chambers': 20000, 'users': 1000000, 'visits': 10000000}
+BATCH_SIZE = 20000
+
+SPECIALIZATIONS = ['Medicine', 'Cardiology', 'Neurology', 'Pediatrics', 'Gynecology', 'Orthopedics',
+                   'Dermatology', 'ENT', 'Ophthalmology', 'Psychiatry', 'Urology', 'Oncology',
+                   'Gastroenterology', 'Nephrology', 'Endocrinology', 'Dentistry']
+HOSPITALS = ['Dhaka Medical College Hospital', 'Square Hospital', 'United Hospital', 'Evercare Hospital',
+             'Labaid Hospital', 'Popular Medical College', 'BSMMU', 'Ibn Sina Hospital',
+             'Chittagong Medical College', 'Rajshahi Medical College', 'Sylhet MAG Osmani', 'Khulna Medical']
+AREAS = ['Dhanmondi', 'Gulshan', 'Banani', 'Mirpur', 'Uttara', 'Mohammadpur', 'Motijheel', 'Bashundhara',
+         'Panthapath', 'Shyamoli', 'Farmgate', 'Badda', 'Agrabad', 'Nasirabad', 'Zindabazar', 'Shaheb Bazar']
+DEGREES = ['MBBS', 'FCPS', 'MD', 'MS', 'FRCS', 'MRCP', 'DGO', 'DCH']
+FIRST_NAMES = ['Rahim', 'Karim', 'Fatema', 'Ayesha', 'Nusrat', 'Tanvir', 'Sadia', 'Imran', 'Farhana', 'Rafiq',
+               'Shirin', 'Hasan', 'Mahmud', 'Nasrin', 'Sabbir', 'Jannat', 'Arif', 'Rumana', 'Sohel', 'Tania']
+LAST_NAMES = ['Ahmed', 'Hossain', 'Rahman', 'Islam', 'Khan', 'Chowdhury', 'Akter', 'Uddin', 'Sarker', 'Begum',
+              'Das', 'Roy', 'Siddique', 'Talukder', 'Mia', 'Kabir']
+KEYWORDS = ['diabetes', 'hypertension', 'asthma', 'pregnancy', 'allergy', 'arthritis', 'thyroid', 'kidney']
+COSTS = [500.0, 700.0, 800.0, 1000.0, 1200.0, 1500.0]
+
+SCHEDULE = {'weekday': ['09:00-13:00', '16:00-21:00'], 'weekend': ['10:00-13:00'], 'exceptions': []}
+# Generated visits start on the quarter hours from 09:00 to 16:45; the
+# load suite books later slots so the two never collide
+VISIT_SLOTS_PER_DAY = 32
+HISTORY_DAYS = 365
+FUTURE_DAYS = 60
+
+
+def counts_for(scale):
+    return {name: max(1, int(count * scale)) for name, count in FULL_SCALE.items()}
+
+
+def _name(rng):
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+
+def _insert(table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+def generate_directory(rng, counts):
+    """Doctors, chambers with schedules, and the links between them; returns chambers per doctor."""
+    _insert(Schedule.__table__, [{'id': i, 'chamber_id': i, 'time_slots': SCHEDULE, 'version': 1}
+                                 for i in range(1, counts['chambers'] + 1)])
+    _insert(Chamber.__table__, [
+        {'id': i, 'location': f'House {rng.randint(1, 120)}, Road {rng.randint(1, 40)}, {rng.choice(AREAS)}',
+         'schedule_id': i}
+        for i in range(1, counts['chambers'] + 1)
+    ])
+    _insert(Doctor.__table__, [
+        {'id': i, 'name': f'Dr. {_name(rng)}', 'contact_number': f'018{i:08d}',
+         'specializations': rng.sample(SPECIALIZATIONS, rng.choice([1, 1, 2, 3])),
+         'hospital_affiliations': rng.sample(HOSPITALS, rng.choice([1, 2])),
+         'degrees': ['MBBS'] + rng.sample(DEGREES[1:], rng.choice([0, 1, 2]))}
+        for i in range(1, counts['doctors'] + 1)
+    ])
+    chambers_of = {
+        doctor_id: rng.sample(range(1, counts['chambers'] + 1), min(counts['chambers'], rng.choice([1, 2, 2, 3])))
+        for doctor_id in range(1, counts['doctors'] + 1)
+    }
+    _insert(doctor_chamber, [{'doctor_id': doctor_id, 'chamber_id': chamber_id}
+                             for doctor_id, chamber_ids in chambers_of.items() for chamber_id in chamber_ids])
+    db.session.commit()
+    return chambers_of
+
+
+def generate_users(rng, counts):
+    """Primary users with dependents filling the rest of the count; returns the primary ids."""
+    rows, primaries = [], []
+    user_id = 0
+    while user_id < counts['users']:
+        user_id += 1
+        primary_id = user_id
+        primaries.append(primary_id)
+        rows.append({'id': primary_id, 'name': _name(rng), 'email': f'user{primary_id}@example.com',
+                     'contact_number': f'017{primary_id:08d}', 'bkash_number': f'019{primary_id:08d}',
+                     'address': f'{rng.choice(AREAS)}, Dhaka', 'is_primary_user': True, 'primary_user_id': None,
+                     'precondition_keywords': rng.sample(KEYWORDS, rng.choice([0, 0, 1, 2]))})
+        # A third of accounts hold one to three dependents
+        for _ in range(rng.choice([0, 0, 1, 2, 3]) if rng.random() < 0.5 else 0):
+            if user_id >= counts['users']:
+                break
+            user_id += 1
+            rows.append({'id': user_id, 'name': _name(rng), 'email': None, 'contact_number': None,
+                         'bkash_number': None, 'address': None, 'is_primary_user': False,
+                         'primary_user_id': primary_id,
+                         'precondition_keywords': rng.sample(KEYWORDS, rng.choice([0, 1]))})
+        if len(rows) >= BATCH_SIZE:
+            _insert(User.__table__, rows)
+            rows = []
+    _insert(User.__table__, rows)
+    db.session.commit()
+    return primaries
+
+
+def generate_operators(rng, counts, primaries):
+    _insert(chamber_operator, [{'chamber_id': chamber_id, 'operator_id': rng.choice(primaries)}
+                               for chamber_id in range(1, counts['chambers'] + 1)])
+    db.session.commit()
+
+
+def generate_visits(rng, counts, chambers_of, primaries, now):
+    """Visits over the past year and next two months, with payments and prescriptions."""
+    first_day = (now - timedelta(days=HISTORY_DAYS)).replace(hour=9, minute=0, second=0, microsecond=0)
+    days = HISTORY_DAYS + FUTURE_DAYS
+    next_slot = dict.fromkeys(chambers_of, 0)
+    doctor_ids = list(chambers_of)
+    visits, payments, prescriptions = [], [], []
+    payment_id = 0
+
+    def flush():
+        _insert(Visit.__table__, visits)
+        _insert(Payment.__table__, payments)
+        _insert(Prescription.__table__, prescriptions)
+        db.session.commit()
+        visits.clear(), payments.clear(), prescriptions.clear()
+
+    for visit_id in range(1, counts['visits'] + 1):
+        doctor_id = rng.choice(doctor_ids)
+        # Each doctor's n-th visit takes its n-th slot: across days first, then later in the day
+        slot = next_slot[doctor_id]
+        next_slot[doctor_id] += 1
+        if slot >= days * VISIT_SLOTS_PER_DAY:
+            continue
+        appointment_time = first_day + timedelta(days=slot % days, minutes=15 * (slot // days))
+        booker = rng.choice(primaries)
+        past = appointment_time < now
+        roll = rng.random()
+        status = ('completed' if roll < 0.85 else 'cancelled') if past else ('scheduled' if roll < 0.9 else 'cancelled')
+        cost = rng.choice(COSTS)
+        paid = rng.random() < 0.6
+        payment_status = ('refunded' if status == 'cancelled' else 'deposit_paid') if paid else None
+        booking_time = appointment_time - timedelta(days=rng.randint(1, 20), minutes=rng.randint(0, 600))
+        visits.append({
+            'id': visit_id, 'chamber_id': rng.choice(chambers_of[doctor_id]), 'doctor_id': doctor_id,
+            'booking_user_id': booker, 'patient_user_id': booker, 'booking_time': booking_time,
+            'appointment_time': appointment_time, 'visit_cost': cost, 'visit_status': status,
+            'cancel_reason': 'Patient unavailable' if status == 'cancelled' else None,
+            'visit_end_time': appointment_time + timedelta(minutes=15) if status == 'completed' else None,
+            'payment_status': payment_status
+        })
+        if paid:
+            paid_at = booking_time + timedelta(minutes=rng.randint(1, 30))
+            payment_id += 1
+            payments.append({'id': payment_id, 'visit_id': visit_id, 'amount': cost, 'kind': 'deposit',
+                             'payment_method': 'bkash', 'bkash_number': f'019{booker:08d}',
+                             'transaction_id': f'TRX{payment_id:012d}', 'status': 'completed',
+                             'timestamp': paid_at, 'updated_time': paid_at, 'attempts': 1})
+            if status == 'cancelled':
+                payment_id += 1
+                refunded_at = min(appointment_time, now) - timedelta(hours=rng.randint(1, 24))
+                payments.append({'id': payment_id, 'visit_id': visit_id, 'amount': -cost, 'kind': 'refund',
+                                 'payment_method': 'bkash', 'bkash_number': f'019{booker:08d}',
+                                 'transaction_id': f'TRX{payment_id:012d}', 'status': 'refunded',
+                                 'timestamp': refunded_at, 'updated_time': refunded_at, 'attempts': 1})
+        if status == 'completed' and rng.random() < 0.3:
+            prescriptions.append({
+                'visit_id': visit_id, 'patient_user_id': booker, 'doctor_id': doctor_id,
+                'content': {'diagnosis': rng.choice(KEYWORDS),
+                            'medicines': [{'name': f'Medicine {rng.randint(1, 400)}', 'dose': '1+0+1',
+                                           'days': rng.choice([5, 7, 14, 30])} for _ in range(rng.randint(1, 5))],
+                            'advice': 'Follow up after two weeks.'},
+                'created_time': appointment_time + timedelta(minutes=15),
+                'updated_time': appointment_time + timedelta(minutes=15)
+            })
+        if len(visits) >= BATCH_SIZE:
+            flush()
+    flush()
+
+
+def generate(scale=0.01, seed=42, now=None, log=print):
+    """Fill the current app's (empty) database; returns the row counts requested."""
+    from app.analytics import rebuild
+    from app.search import rebuild_doctor_index
+
+    rng = random.Random(seed)
+    now = now or datetime.utcnow().replace(second=0, microsecond=0)
+    counts = counts_for(scale)
+    if db.session.execute(select(func.count()).select_from(Doctor)).scalar():
+        raise RuntimeError('The database already has doctors; generate into an empty database')
+
+    def step(name, fn):
+        started = time.perf_counter()
+        result = fn()
+        log(f'{name:<12} {time.perf_counter() - started:8.1f}s')
+        return result
+
+    chambers_of = step('directory', lambda: generate_directory(rng, counts))
+    primaries = step('users', lambda: generate_users(rng, counts))
+    step('operators', lambda: generate_operators(rng, counts, primaries))
+    step('visits', lambda: generate_visits(rng, counts, chambers_of, primaries, now))
+    step('search', rebuild_doctor_index)
+    step('rollups', rebuild)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', required=True, help='SQLAlchemy URL of an empty database.')
+    parser.add_argument('--scale', type=float, default=0.01, help='Fraction of the full-scale row counts.')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': args.database, 'JOB_WORKERS': 0})
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        counts = generate(args.scale, args.seed)
+    print(f'generated {counts} in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
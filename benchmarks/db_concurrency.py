@@ -0,0 +1,108 @@
+# benchmarks/db_concurrency.py
+"""Concurrent read/write throughput under different SQLite engine settings.
+
+    python -m benchmarks.db_concurrency --readers 8 --writers 4 --seconds 5
+
+Each setting runs against a fresh file database. Readers page through a
+doctor's visits; writers insert and commit visits one at a time.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from itertools import count
+
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db
+from app.models import Chamber, Doctor, Visit
+
+SETTINGS = {
+    'delete/full': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'wal/full': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'wal/normal': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL'},
+}
+
+
+def run(name, overrides, args, tmp):
+    app = create_app(dict(overrides, **{
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, f'{name.replace("/", "-")}.db'),
+        'DB_POOL_SIZE': args.pool_size,
+        'DB_MAX_OVERFLOW': args.max_overflow,
+        'SQLITE_BUSY_TIMEOUT_MS': args.busy_timeout,
+    }))
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Doctor(id=1, name='Doctor', contact_number='1'), Chamber(id=1, location='Dhanmondi')])
+        db.session.commit()
+
+    slots = count()
+    counters = {'reads': 0, 'writes': 0, 'locked': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+
+    def reader():
+        reads = locked = 0
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                try:
+                    Visit.query.filter_by(doctor_id=1).order_by(Visit.appointment_time.desc()).limit(50).all()
+                    db.session.rollback()
+                    reads += 1
+                except OperationalError:
+                    db.session.rollback()
+                    locked += 1
+        with lock:
+            counters['reads'] += reads
+            counters['locked'] += locked
+
+    def writer():
+        writes = locked = 0
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                db.session.add(Visit(chamber_id=1, doctor_id=1, visit_status='scheduled',
+                                     appointment_time=datetime(2030, 1, 1) + timedelta(minutes=next(slots))))
+                try:
+                    db.session.commit()
+                    writes += 1
+                except OperationalError:
+                    db.session.rollback()
+                    locked += 1
+        with lock:
+            counters['writes'] += writes
+            counters['locked'] += locked
+
+    threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+    threads += [threading.Thread(target=writer) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        db.engine.dispose()
+    return {key: value / args.seconds for key, value in counters.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--pool-size', type=int, default=16)
+    parser.add_argument('--max-overflow', type=int, default=8)
+    parser.add_argument('--busy-timeout', type=int, default=5000)
+    parser.add_argument('--setting', choices=SETTINGS, action='append')
+    args = parser.parse_args()
+
+    print(f'{"setting":<14}{"reads/s":>10}{"writes/s":>10}{"locked/s":>10}')
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in args.setting or SETTINGS:
+            result = run(name, SETTINGS[name], args, tmp)
+            print(f'{name:<14}{result["reads"]:>10.0f}{result["writes"]:>10.0f}{result["locked"]:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
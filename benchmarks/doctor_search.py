@@ -0,0 +1,86 @@
+# benchmarks/doctor_search.py
+"""Doctor search latency: leading-wildcard LIKE scans vs the FTS5 trigram index.
+
+    python -m benchmarks.doctor_search --doctors 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import select
+
+from app import create_app, db
+from app.models import Chamber, Doctor, doctor_chamber
+from app.search import doctor_postings, ranked_ids, rebuild_doctor_index
+
+FIRST_NAMES = ['Abdur', 'Nusrat', 'Farhana', 'Kamal', 'Tahmina', 'Rafiq', 'Sadia', 'Imran', 'Shirin', 'Mahbub']
+LAST_NAMES = ['Rahman', 'Jahan', 'Hossain', 'Chowdhury', 'Akter', 'Islam', 'Karim', 'Begum', 'Uddin', 'Sarkar']
+SPECIALIZATIONS = ['Cardiology', 'Neurology', 'Medicine', 'Pediatrics', 'Orthopedics', 'Dermatology', 'ENT']
+AREAS = ['Dhanmondi', 'Gulshan', 'Banani', 'Mirpur', 'Uttara', 'Mohammadpur', 'Motijheel', 'Bashundhara']
+
+
+def seed(doctors, chambers, rng):
+    db.session.execute(Chamber.__table__.insert(), [
+        {'id': i, 'location': f'House {rng.randint(1, 200)}, Road {rng.randint(1, 40)}, {rng.choice(AREAS)}'}
+        for i in range(1, chambers + 1)
+    ])
+    db.session.execute(Doctor.__table__.insert(), [
+        {'id': i, 'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}',
+         'contact_number': f'01{i:09d}', 'specializations': rng.sample(SPECIALIZATIONS, 2),
+         'hospital_affiliations': [], 'degrees': ['MBBS']}
+        for i in range(1, doctors + 1)
+    ])
+    db.session.execute(doctor_chamber.insert(), [
+        {'doctor_id': i, 'chamber_id': rng.randint(1, chambers)} for i in range(1, doctors + 1)
+    ])
+    db.session.commit()
+
+
+def timed(run, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        rows = run()
+    return (time.perf_counter() - started) / repeat * 1000, len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--doctors', type=int, default=100000)
+    parser.add_argument('--chambers', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db')})
+        with app.app_context():
+            db.create_all()
+            seed(args.doctors, args.chambers, random.Random(42))
+            started = time.perf_counter()
+            rebuild_doctor_index(batch_size=5000)
+            print(f'indexed {args.doctors} doctors in {time.perf_counter() - started:.1f}s\n')
+
+            cases = [
+                ('name contains "hossain 12"',
+                 lambda: Doctor.query.with_entities(Doctor.id).filter(Doctor.name.ilike('%hossain 12%')).all(),
+                 lambda: db.session.execute(doctor_postings(name='hossain 12')).all()),
+                ('location contains "banani"',
+                 lambda: db.session.execute(select(doctor_chamber.c.doctor_id).join(
+                     Chamber, Chamber.id == doctor_chamber.c.chamber_id
+                 ).where(Chamber.location.ilike('%road 7, banani%'))).all(),
+                 lambda: db.session.execute(doctor_postings(location='road 7, banani')).all()),
+                ('fuzzy "tahmna akter"',
+                 lambda: Doctor.query.with_entities(Doctor.id).filter(Doctor.name.ilike('%tahmna akter%')).all(),
+                 lambda: ranked_ids('doctor_fts', 'tahmna akter')),
+            ]
+
+            print(f'{"query":<30}{"LIKE ms":>10}{"rows":>8}{"FTS ms":>10}{"rows":>8}')
+            for label, like, fts in cases:
+                like_ms, like_rows = timed(like, args.repeat)
+                fts_ms, fts_rows = timed(fts, args.repeat)
+                print(f'{label:<30}{like_ms:>10.2f}{like_rows:>8}{fts_ms:>10.2f}{fts_rows:>8}')
+
+
+if __name__ == '__main__':
+    main()
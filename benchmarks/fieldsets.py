@@ -0,0 +1,121 @@
+# benchmarks/fieldsets.py
+"""Payload size and SQL work of sparse fieldsets on the list endpoints.
+
+    python -m benchmarks.fieldsets --rows 500
+
+Requests each list endpoint in full and with the ``fields``/``include``
+a list screen would send, and reports response bytes, SQL statements,
+columns selected and median latency for both. Exits non-zero if a sparse
+response is not the full one cut down to its fields, or if it is no
+smaller or issues more statements than the full one.
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import Chamber, Doctor, Schedule, User, Visit
+from app.response_cache import directory_cache
+
+# (full request, sparse request, key holding the rows or None for a bare list)
+CASES = [
+    ('/doctors', '/doctors?fields=id,name', None),
+    ('/doctors', '/doctors?fields=id,name,specializations,chambers.location', None),
+    ('/chambers', '/chambers?fields=id,location', None),
+    ('/visits?limit=200', '/visits?limit=200&fields=id,appointment_time,visit_status', 'visits'),
+    ('/visits?limit=200', '/visits?limit=200&fields=id,appointment_time,visit_status,doctor.name,chamber.location',
+     'visits'),
+]
+
+
+def seed(rows):
+    db.session.add(User(id=1, name='Patient', email='patient@example.com'))
+    for i in range(rows):
+        schedule = Schedule(time_slots={'weekday': ['09:00-12:00', '17:00-21:00'], 'weekend': ['10:00-13:00']})
+        chamber = Chamber(location=f'House {i}, Road {i % 32}, Dhanmondi, Dhaka', schedule=schedule)
+        doctor = Doctor(name=f'Doctor {i}', contact_number=f'017{i:08d}',
+                        specializations=['Cardiology', 'Medicine'], hospital_affiliations=['DMCH', 'BSMMU'],
+                        degrees=['MBBS', 'FCPS'])
+        doctor.chambers.append(chamber)
+        db.session.add_all([schedule, chamber, doctor])
+        db.session.add(Visit(
+            doctor=doctor, chamber=chamber, booking_user_id=1, patient_user_id=1,
+            appointment_time=datetime(2030, 1, 1, 9) + timedelta(minutes=15 * i),
+            visit_cost=500.0, visit_status='scheduled', booking_remarks='Follow-up after test results'
+        ))
+    db.session.commit()
+
+
+def is_cut_of(sparse, full):
+    """True if ``sparse`` is ``full`` with some keys left out, at every level."""
+    if isinstance(sparse, dict):
+        return isinstance(full, dict) and all(key in full and is_cut_of(value, full[key])
+                                              for key, value in sparse.items())
+    if isinstance(sparse, list):
+        return isinstance(full, list) and len(sparse) == len(full) and all(map(is_cut_of, sparse, full))
+    return sparse == full
+
+
+def measure(client, path, headers, statements, repeat):
+    timings = []
+    for _ in range(repeat):
+        directory_cache.invalidate()
+        statements.clear()
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return {
+        'body': response.get_json(),
+        'bytes': len(response.get_data()),
+        'statements': len(statements),
+        'columns': sum(statements),
+        'ms': statistics.median(timings),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500, help='Doctors, chambers and visits to seed.')
+    parser.add_argument('--repeat', type=int, default=20, help='Requests per endpoint and variant.')
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'JOB_WORKERS': 0})
+    statements = []  # one entry per SQL statement: the number of columns it selected
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+        event.listen(db.engine, 'after_cursor_execute',
+                     lambda conn, cursor, *rest: statements.append(len(cursor.description or ())))
+
+    client = app.test_client()
+    failed = False
+    print(f'{"request":<92}{"bytes":>10}{"stmts":>7}{"cols":>6}{"ms":>9}')
+    for full_path, sparse_path, key in CASES:
+        full = measure(client, full_path, headers, statements, args.repeat)
+        sparse = measure(client, sparse_path, headers, statements, args.repeat)
+        rows = (sparse['body'][key], full['body'][key]) if key else (sparse['body'], full['body'])
+        problems = []
+        if not rows[0] or not is_cut_of(*rows):
+            problems.append('output differs from the full response')
+        if sparse['bytes'] >= full['bytes']:
+            problems.append('payload did not shrink')
+        if sparse['statements'] > full['statements']:
+            problems.append('more statements than the full response')
+        failed |= bool(problems)
+        for path, result in ((full_path, full), (sparse_path, sparse)):
+            print(f'{path:<92}{result["bytes"]:>10}{result["statements"]:>7}{result["columns"]:>6}'
+                  f'{result["ms"]:>9.2f}')
+        print(f'{"":<4}-> {sparse["bytes"] / full["bytes"]:.0%} of the bytes, '
+              f'{sparse["ms"] / full["ms"]:.0%} of the latency' + ''.join(f'; FAIL {p}' for p in problems))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,551 @@
+# benchmarks/loadtest.py
+"""End-to-end load test of every API route against generated data.
+
+    python -m benchmarks.loadtest --scale 0.01 --concurrency 8 --duration 30
+    python -m benchmarks.loadtest --database sqlite:///load.db --output run.json --baseline base.json
+    python -m benchmarks.loadtest --url http://127.0.0.1:5000 --scale 0.01 --scenarios 'visits.*'
+
+Without --database or --url, a temporary SQLite database is filled by
+``benchmarks.datagen`` at --scale first. --database runs the app
+in-process through the Flask test client, with a local bKash stub and a
+temporary document store; --url drives a running server over HTTP, which
+must be serving a database generated at the same --scale. Each worker
+logs in as its own primary user and runs a weighted mix of scenarios;
+only the scenario's own request is timed, not the setup it needs.
+
+Reports throughput and p50/p95/p99 latency per scenario. Exits non-zero
+on any unexpected status, or when --baseline is given and a scenario's
+p95 (over at least 20 requests in both runs) or the total throughput is
+worse than the baseline by more than --tolerance. Bulk imports and
+dead-job retries are left out.
+"""
+import argparse
+import fnmatch
+import http.client
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict, deque, namedtuple
+from datetime import datetime, timedelta
+from urllib.parse import quote, urlsplit
+
+from benchmarks.datagen import AREAS, FUTURE_DAYS, KEYWORDS, SPECIALIZATIONS, counts_for
+
+Scenario = namedtuple('Scenario', 'name weight expect build')
+
+# Bookings and reschedules take quarter hours from 17:00, after the
+# generated data's last slot, each on a time no other request uses
+BOOKING_HOUR = 17
+BOOKING_SLOTS_PER_DAY = 16
+BOOKING_YEARS = 400
+DOCUMENT = os.urandom(16 * 1024)
+LATENCY_KEYS = ('p50_ms', 'p95_ms', 'p99_ms')
+# Random user ids tried per worker before concluding the database has no free primary user
+MAX_LOGIN_ATTEMPTS = 500
+# Fewer samples than this make a p95 too noisy to compare
+MIN_COMPARE_REQUESTS = 20
+
+
+class TestClientTransport:
+    """Requests through one Flask test client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, headers, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, headers=headers, data=body)
+        data = response.get_data()
+        response.close()
+        return response.status_code, data
+
+
+class HTTPTransport:
+    """Requests over one keep-alive connection per thread."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self._local = threading.local()
+
+    def request(self, method, path, headers, body=None):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = self.connection_class(self.netloc, timeout=60)
+        try:
+            connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            connection.close()
+            self._local.connection = None
+            return 0, str(exc).encode()
+
+
+def _json_body(payload):
+    return json.dumps(payload).encode(), 'application/json'
+
+
+def _multipart_body(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content_type, content) in files.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                     f'Content-Type: {content_type}\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+class SetupError(Exception):
+    """The target cannot support the run, e.g. it lacks the generated users."""
+
+
+class Worker:
+    """One simulated client: a logged-in primary user and what it has created so far."""
+
+    def __init__(self, transport, counts, rng, booking_slots):
+        self.transport = transport
+        self.counts = counts
+        self.rng = rng
+        self.booking_slots = booking_slots
+        self.user_id = None
+        self.headers = {}
+        self.visit_ids = []
+        self.booked = deque()
+        self.prescribed = []
+        self.documents = []
+        self.payment_ids = []
+
+    def call(self, method, path, payload=None, multipart=None, headers=None):
+        """Send one request; returns ``(status, parsed JSON or raw bytes)``."""
+        body, content_type = None, None
+        if payload is not None:
+            body, content_type = _json_body(payload)
+        elif multipart is not None:
+            body, content_type = _multipart_body(*multipart)
+        request_headers = {**self.headers, **(headers or {})}
+        if content_type:
+            request_headers['Content-Type'] = content_type
+        status, data = self.transport.request(method, quote(path, safe='/?&='), request_headers, body)
+        try:
+            return status, json.loads(data)
+        except ValueError:
+            return status, data
+
+    def login(self, claimed):
+        """Log in as a primary user no other worker holds, then learn its visits."""
+        for _ in range(MAX_LOGIN_ATTEMPTS):
+            if self.user_id is not None:
+                break
+            user_id = self.rng.randint(1, self.counts['users'])
+            if user_id in claimed:
+                continue
+            status, data = self.call('POST', '/auth/login', {'username': f'user{user_id}@example.com'})
+            # Dependents have no email and are not found
+            if status == 200:
+                claimed.add(user_id)
+                self.user_id = user_id
+                self.headers = {'Authorization': 'Bearer ' + data['access_token']}
+        if self.user_id is None:
+            raise SetupError(f'no free primary user among ids 1-{self.counts["users"]} after {MAX_LOGIN_ATTEMPTS} '
+                             'logins; point --database/--url at data generated with the same --scale')
+        status, data = self.call('GET', f'/visits?user_id={self.user_id}&limit=100')
+        self.visit_ids = [visit['id'] for visit in data['visits'] if visit['booking_user_id'] == self.user_id]
+        if not self.visit_ids:
+            self.visit_ids.append(self.book())
+
+    def next_slot(self):
+        slot = next(self.booking_slots)
+        day = datetime.utcnow().date() + timedelta(days=FUTURE_DAYS + 1 + slot // BOOKING_SLOTS_PER_DAY)
+        return datetime(day.year, day.month, day.day, BOOKING_HOUR) + timedelta(minutes=15 * (slot % BOOKING_SLOTS_PER_DAY))
+
+    def booking(self):
+        return {'doctor_id': self.random_doctor(), 'chamber_id': self.random_chamber(),
+                'appointment_time': self.next_slot().isoformat(), 'visit_cost': 800.0,
+                'booking_remarks': 'Load test booking'}
+
+    def book(self):
+        status, data = self.call('POST', '/visits', self.booking())
+        if status != 201:
+            raise SetupError(f'setup booking failed with HTTP {status}: {data}')
+        return data['id']
+
+    def random_doctor(self):
+        return self.rng.randint(1, self.counts['doctors'])
+
+    def random_chamber(self):
+        return self.rng.randint(1, self.counts['chambers'])
+
+    def own_visit(self):
+        return self.rng.choice(self.visit_ids)
+
+    def booked_visit(self):
+        return self.booked.popleft() if self.booked else self.book()
+
+    def prescribed_visit(self):
+        # Only chamber operators may prescribe, so most workers read visits
+        # that may have none
+        if not self.prescribed:
+            visit_id = self.own_visit()
+            status, _ = self.call('POST', f'/visits/{visit_id}/prescription', prescription(self.rng))
+            if status != 200:
+                return visit_id
+            self.prescribed.append(visit_id)
+        return self.rng.choice(self.prescribed)
+
+    def document(self):
+        if not self.documents:
+            visit_id = self.own_visit()
+            status, data = self.call('POST', f'/visits/{visit_id}/documents', multipart=upload())
+            self.documents.append((visit_id, data[0]['id']))
+        return self.rng.choice(self.documents)
+
+
+def prescription(rng):
+    return {'diagnosis': rng.choice(KEYWORDS), 'advice': 'Load test prescription',
+            'medicines': [{'name': f'Medicine {rng.randint(1, 400)}', 'dose': '1+0+1', 'days': 7}]}
+
+
+def upload():
+    return {'document_type': 'report'}, {'file': ('report.pdf', 'application/pdf', DOCUMENT)}
+
+
+def _remember(collection, key='id'):
+    def callback(worker, data):
+        collection(worker).append(data[key])
+    return callback
+
+
+def _future_day(worker, offset=1):
+    return (datetime.utcnow().date() + timedelta(days=offset + worker.rng.randint(0, 13))).isoformat()
+
+
+def _signup(worker):
+    token = uuid.uuid4()
+    return 'POST', '/auth/signup', {
+        'name': 'Load Test', 'email': f'load-{token.hex}@example.com',
+        'contact_number': '01' + str(token.int)[:12], 'address': f'{worker.rng.choice(AREAS)}, Dhaka'
+    }
+
+
+def _deposit(worker):
+    return 'POST', '/payments/deposit', {'visit_id': worker.own_visit(), 'amount': 800.0,
+                                         'bkash_number': f'019{worker.user_id:08d}',
+                                         'idempotency_key': uuid.uuid4().hex}
+
+
+def _refund(worker):
+    return 'POST', '/payments/refund', {'visit_id': worker.own_visit(), 'amount': 800.0,
+                                        'bkash_number': f'019{worker.user_id:08d}',
+                                        'idempotency_key': uuid.uuid4().hex}
+
+
+def _batch(worker):
+    visit_ids = worker.rng.sample(worker.visit_ids, min(5, len(worker.visit_ids)))
+    return 'POST', '/visits/batch', {'operations': [{'id': visit_id, 'visit_cost': 900.0} for visit_id in visit_ids]}
+
+
+def _get_payment(worker):
+    payment_id = (worker.rng.choice(worker.payment_ids) if worker.payment_ids
+                  else worker.rng.randint(1, max(1, worker.counts['visits'] // 2)))
+    return 'GET', f'/payments/{payment_id}', None
+
+
+# name, relative weight, expected statuses, and a builder returning
+# (method, path, body) where body is JSON, ('multipart', fields, files)
+# or None; an optional fourth element is called with the parsed response
+SCENARIOS = [
+    Scenario('auth.signup', 1, {201}, _signup),
+    Scenario('auth.login', 3, {200}, lambda w: ('POST', '/auth/login', {
+        'username': f'user{w.user_id}@example.com' if w.rng.random() < 0.5 else f'017{w.user_id:08d}'})),
+    Scenario('auth.logout', 1, {200}, lambda w: ('POST', '/auth/logout', None)),
+
+    Scenario('users.get', 4, {200}, lambda w: ('GET', f'/users/{w.rng.randint(1, w.counts["users"])}', None)),
+    Scenario('users.update', 1, {200}, lambda w: ('PUT', f'/users/{w.user_id}', {
+        'address': f'{w.rng.choice(AREAS)}, Dhaka'})),
+    Scenario('users.dependents', 2, {200}, lambda w: ('GET', f'/users/{w.user_id}/dependents', None)),
+    Scenario('users.add_dependent', 1, {201}, lambda w: ('POST', f'/users/{w.user_id}/dependents', {
+        'name': 'Load Test Dependent', 'precondition_keywords': [w.rng.choice(KEYWORDS)]})),
+    Scenario('users.family', 2, {200}, lambda w: ('GET', f'/users/{w.user_id}/family', None)),
+    Scenario('users.prescriptions', 2, {200}, lambda w: ('GET', f'/users/{w.user_id}/prescriptions', None)),
+
+    Scenario('doctors.list', 3, {200}, lambda w: ('GET', '/doctors', None)),
+    Scenario('doctors.filter', 6, {200}, lambda w: ('GET', w.rng.choice([
+        f'/doctors?specialization={w.rng.choice(SPECIALIZATIONS)}',
+        f'/doctors?location={w.rng.choice(AREAS)}',
+        f'/doctors?q={w.rng.choice(SPECIALIZATIONS).lower()}']), None)),
+    Scenario('doctors.get', 6, {200}, lambda w: ('GET', f'/doctors/{w.random_doctor()}', None)),
+    Scenario('doctors.create', 1, {201}, lambda w: ('POST', '/doctors', {
+        'name': 'Dr. Load Test', 'contact_number': '01' + str(uuid.uuid4().int)[:12],
+        'specializations': [w.rng.choice(SPECIALIZATIONS)], 'degrees': ['MBBS']})),
+    Scenario('doctors.update', 1, {200}, lambda w: ('PUT', f'/doctors/{w.random_doctor()}', {
+        'hospital_affiliations': ['Square Hospital']})),
+
+    Scenario('chambers.list', 3, {200}, lambda w: ('GET', w.rng.choice([
+        '/chambers', f'/chambers?location={w.rng.choice(AREAS)}', f'/chambers?q={w.rng.choice(AREAS).lower()}']),
+        None)),
+    Scenario('chambers.get', 4, {200}, lambda w: ('GET', f'/chambers/{w.random_chamber()}', None)),
+    Scenario('chambers.schedule', 2, {200}, lambda w: ('GET', f'/chambers/{w.random_chamber()}/schedule', None)),
+    Scenario('chambers.create', 1, {201}, lambda w: ('POST', '/chambers', {
+        'location': f'Load Test Road, {w.rng.choice(AREAS)}', 'doctor_ids': [w.random_doctor()],
+        'schedule': {'weekday': ['17:00-21:00'], 'weekend': [], 'exceptions': []}})),
+    Scenario('chambers.update', 1, {200}, lambda w: ('PUT', f'/chambers/{w.random_chamber()}', {
+        'location': f'House {w.rng.randint(1, 120)}, {w.rng.choice(AREAS)}'})),
+
+    Scenario('schedules.day', 6, {200}, lambda w: (
+        'GET', f'/schedules/chamber/{w.random_chamber()}/available-slots?date={_future_day(w)}', None)),
+    Scenario('schedules.range', 2, {200}, lambda w: (
+        'GET', f'/schedules/chamber/{w.random_chamber()}/available-slots?from={_future_day(w)}'
+               f'&to={_future_day(w, 15)}&doctor_id={w.random_doctor()}', None)),
+    Scenario('schedules.create', 1, {200}, lambda w: ('POST', f'/schedules/chamber/{w.random_chamber()}/slots', {
+        'weekday_slots': ['09:00-13:00', '16:00-21:00'], 'weekend_slots': ['10:00-13:00']})),
+
+    Scenario('visits.list', 4, {200}, lambda w: ('GET', w.rng.choice([
+        f'/visits?user_id={w.user_id}', f'/visits?doctor_id={w.random_doctor()}&limit=20']), None)),
+    Scenario('visits.get', 4, {200}, lambda w: ('GET', f'/visits/{w.rng.randint(1, w.counts["visits"])}', None)),
+    Scenario('visits.create', 3, {201}, lambda w: ('POST', '/visits', w.booking(),
+                                                   _remember(lambda worker: worker.booked))),
+    Scenario('visits.update', 1, {200}, lambda w: ('PUT', f'/visits/{w.own_visit()}', {
+        'booking_remarks': 'Updated by the load test'})),
+    Scenario('visits.reschedule', 1, {200}, lambda w: ('PUT', f'/visits/{w.booked_visit()}', {
+        'appointment_time': w.next_slot().isoformat()})),
+    Scenario('visits.cancel', 1, {200}, lambda w: ('DELETE', f'/visits/{w.booked_visit()}', {
+        'cancel_reason': 'Load test'})),
+    Scenario('visits.batch', 1, {200}, _batch),
+    Scenario('visits.upload', 1, {201}, lambda w: (
+        'POST', f'/visits/{w.own_visit()}/documents', ('multipart', *upload()),
+        lambda worker, data: worker.documents.append((data[0]['visit_id'], data[0]['id'])))),
+    Scenario('visits.documents', 2, {200}, lambda w: ('GET', f'/visits/{w.document()[0]}/documents', None)),
+    Scenario('visits.download', 2, {200}, lambda w: ('GET', '/visits/{}/documents/{}'.format(*w.document()), None)),
+    Scenario('visits.prescribe', 1, {200, 403}, lambda w: (
+        'POST', f'/visits/{w.own_visit()}/prescription', prescription(w.rng))),
+    Scenario('visits.prescription', 2, {200, 404}, lambda w: (
+        'GET', f'/visits/{w.prescribed_visit()}/prescription', None)),
+
+    Scenario('payments.deposit', 1, {200, 202}, lambda w: (*_deposit(w), _remember(lambda worker: worker.payment_ids))),
+    # Only the chamber's operators (or admins) may refund, so most workers are refused
+    Scenario('payments.refund', 1, {200, 202, 403}, _refund),
+    # Until a worker has deposited, it probes seeded payments of other users
+    Scenario('payments.get', 2, {200, 403}, _get_payment),
+
+    # Reports are for ADMIN_USER_IDS only; workers are refused unless listed there
+    Scenario('analytics.doctors', 1, {200, 403}, lambda w: ('GET', f'/analytics/doctors?doctor_id={w.random_doctor()}', None)),
+    Scenario('analytics.chambers', 1, {200, 403}, lambda w: ('GET', f'/analytics/chambers?chamber_id={w.random_chamber()}',
+                                                        None)),
+    Scenario('jobs.metrics', 1, {200}, lambda w: ('GET', '/jobs/metrics', None)),
+]
+
+
+def select_scenarios(patterns):
+    if not patterns:
+        return SCENARIOS
+    patterns = [pattern.strip() for pattern in patterns.split(',') if pattern.strip()]
+    return [scenario for scenario in SCENARIOS if any(fnmatch.fnmatch(scenario.name, p) for p in patterns)]
+
+
+def run_scenario(worker, scenario):
+    """Build and send one scenario request; returns ``(seconds, status, data)``."""
+    method, path, body, *callback = scenario.build(worker)
+    if isinstance(body, tuple):
+        request = {'multipart': body[1:]}
+    elif body is not None:
+        request = {'payload': body}
+    else:
+        request = {}
+    started = time.perf_counter()
+    status, data = worker.call(method, path, **request)
+    seconds = time.perf_counter() - started
+    if status in scenario.expect and callback:
+        callback[0](worker, data)
+    return seconds, status, data
+
+
+def run_load(transport, counts, scenarios, concurrency, duration=None, requests=None, warmup=0.0, seed=1):
+    """Drive ``scenarios`` from ``concurrency`` workers; returns samples and the measured wall time."""
+    claimed = set()
+    # Each run books within its own, randomly placed year so reruns against
+    # one database rarely meet an earlier run's bookings
+    booking_slots = itertools.count(random.randrange(BOOKING_YEARS) * BOOKING_SLOTS_PER_DAY * 365)
+    workers = [Worker(transport, counts, random.Random(seed * 1000 + index), booking_slots)
+               for index in range(concurrency)]
+    for worker in workers:
+        worker.login(claimed)
+
+    samples = defaultdict(list)
+    failures = defaultdict(list)
+    lock = threading.Lock()
+    remaining = itertools.count()
+    weights = [scenario.weight for scenario in scenarios]
+    measure_from = time.perf_counter() + warmup
+    deadline = measure_from + duration if duration else None
+
+    def loop(worker):
+        local = defaultdict(list)
+        while True:
+            now = time.perf_counter()
+            measured = now >= measure_from
+            if deadline and now >= deadline:
+                break
+            if measured and requests and next(remaining) >= requests:
+                break
+            scenario = worker.rng.choices(scenarios, weights)[0]
+            try:
+                seconds, status, data = run_scenario(worker, scenario)
+            except Exception as exc:
+                seconds, status, data = 0.0, 0, repr(exc)
+            if not measured:
+                continue
+            local[scenario.name].append((seconds, status in scenario.expect))
+            if status not in scenario.expect:
+                with lock:
+                    failures[scenario.name].append((status, str(data)[:200]))
+        with lock:
+            for name, entries in local.items():
+                samples[name].extend(entries)
+
+    threads = [threading.Thread(target=loop, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, failures, time.perf_counter() - measure_from
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))]
+
+
+def summarize(entries, wall):
+    timings = sorted(seconds * 1000 for seconds, _ in entries)
+    return {
+        'requests': len(entries),
+        'errors': sum(1 for _, ok in entries if not ok),
+        'throughput_rps': round(len(entries) / wall, 2) if wall else None,
+        'p50_ms': round(percentile(timings, 0.50), 2) if timings else None,
+        'p95_ms': round(percentile(timings, 0.95), 2) if timings else None,
+        'p99_ms': round(percentile(timings, 0.99), 2) if timings else None,
+        'max_ms': round(timings[-1], 2) if timings else None,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Scenarios whose p95 or whose total throughput regressed by more than ``tolerance``."""
+    regressions = []
+    for name, stats in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before or min(before['requests'], stats['requests']) < MIN_COMPARE_REQUESTS:
+            continue
+        if stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {stats["p95_ms"]} ms vs {before["p95_ms"]} ms')
+    before = baseline.get('total', {}).get('throughput_rps')
+    after = results['total']['throughput_rps']
+    if before and after is not None and after < before * (1 - tolerance):
+        regressions.append(f'total: {after} req/s vs {before} req/s')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--database', help='SQLAlchemy URL of a database filled by benchmarks.datagen.')
+    target.add_argument('--url', help='Base URL of a running server instead of the in-process app.')
+    parser.add_argument('--scale', type=float, default=0.01,
+                        help='Scale the database was (or is to be) generated at; sets the id ranges used.')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help='Measured seconds, unless --requests is set.')
+    parser.add_argument('--requests', type=int, help='Stop after this many measured requests instead.')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Unmeasured seconds before measuring.')
+    parser.add_argument('--scenarios', help="Comma-separated name patterns, e.g. 'visits.*,auth.login'.")
+    parser.add_argument('--output', help='Write the results as JSON here.')
+    parser.add_argument('--baseline', help='Results JSON from an earlier run to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression as a fraction.')
+    args = parser.parse_args()
+
+    scenarios = select_scenarios(args.scenarios)
+    if not scenarios:
+        parser.error('--scenarios matched nothing')
+    counts = counts_for(args.scale)
+    duration = None if args.requests else args.duration
+
+    def drive(transport):
+        try:
+            return run_load(transport, counts, scenarios, args.concurrency, duration, args.requests,
+                            args.warmup, args.seed)
+        except SetupError as exc:
+            sys.exit(f'loadtest: {exc}')
+
+    if args.url:
+        samples, failures, wall = drive(HTTPTransport(args.url))
+    else:
+        from app import create_app, db
+        from benchmarks.bkash_stub import start_stub
+        from benchmarks.datagen import generate
+
+        stub = start_stub()
+        with tempfile.TemporaryDirectory() as tmp:
+            database = args.database or 'sqlite:///' + os.path.join(tmp, 'load.db')
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': database,
+                'BKASH_BASE_URL': stub.base_url,
+                'DOCUMENT_STORE_PATH': os.path.join(tmp, 'documents'),
+            })
+            if not args.database:
+                with app.app_context():
+                    db.create_all()
+                    started = time.perf_counter()
+                    generate(args.scale, log=lambda line: None)
+                    print(f'generated {counts} in {time.perf_counter() - started:.1f}s')
+            try:
+                samples, failures, wall = drive(TestClientTransport(app))
+            finally:
+                app.extensions['jobs'].stop(timeout=10)
+                app.extensions['payments'].shutdown()
+                stub.shutdown()
+
+    results = {
+        'config': {'target': args.url or args.database or 'generated', 'scale': args.scale,
+                   'concurrency': args.concurrency, 'duration': duration, 'requests': args.requests,
+                   'warmup': args.warmup, 'seed': args.seed, 'wall_seconds': round(wall, 2)},
+        'total': summarize([entry for entries in samples.values() for entry in entries], wall),
+        'scenarios': {name: summarize(samples[name], wall) for name in sorted(samples)},
+    }
+
+    print(f'{"scenario":<22}{"requests":>9}{"errors":>8}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}')
+    for name, stats in [*results['scenarios'].items(), ('total', results['total'])]:
+        print(f'{name:<22}{stats["requests"]:>9}{stats["errors"]:>8}{stats["throughput_rps"]:>9}'
+              + ''.join(f'{stats[key]:>9}' for key in LATENCY_KEYS))
+    for name, entries in sorted(failures.items()):
+        status, body = entries[0]
+        print(f'unexpected status in {name}: {len(entries)}x, first HTTP {status}: {body}')
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+    sys.exit(1 if failures or regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# benchmarks/metrics_overhead.py
+"""Per-request cost of the /metrics instrumentation.
+
+    python -m benchmarks.metrics_overhead --requests 2000
+
+Serves the same database from an app with METRICS_ENABLED and one
+without, alternating rounds between them, and reports the median
+latency of a few read endpoints under each. Exits non-zero unless
+/metrics counted exactly the requests sent to the instrumented app.
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.models import Chamber, Doctor, Schedule, User, Visit
+
+PATHS = {
+    '/doctors/1': 'doctors.get_doctor',
+    '/doctors': 'doctors.get_doctors',
+    '/visits?limit=20': 'visits.get_visits',
+    '/users/1': 'users.get_user',
+}
+ROUNDS = 5
+# Untimed requests per endpoint and app before the measured rounds
+WARMUP_REQUESTS = 50
+
+
+def seed(doctors, visits):
+    db.session.add(User(id=1, name='Patient', email='patient@example.com'))
+    for i in range(1, doctors + 1):
+        doctor = Doctor(id=i, name=f'Doctor {i}', contact_number=f'0170000{i:04d}')
+        doctor.chambers.append(Chamber(location=f'Chamber {i}', schedule=Schedule(
+            time_slots={'weekday': ['09:00-13:00'], 'weekend': []})))
+        db.session.add(doctor)
+    db.session.flush()
+    db.session.add_all([
+        Visit(doctor_id=i % doctors + 1, chamber_id=i % doctors + 1, booking_user_id=1, patient_user_id=1,
+              appointment_time=datetime(2030, 1, 1, 9) + timedelta(minutes=15 * i), visit_status='scheduled')
+        for i in range(visits)
+    ])
+    db.session.commit()
+
+
+def per_request_us(client, path, headers, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings.append((time.perf_counter() - started) * 1e6)
+        assert response.status_code == 200, response.get_data(as_text=True)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per endpoint and app.')
+    parser.add_argument('--doctors', type=int, default=50)
+    parser.add_argument('--visits', type=int, default=500)
+    args = parser.parse_args()
+    per_round = max(1, args.requests // ROUNDS)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'), 'JOB_WORKERS': 0,
+                  'SLOW_REQUEST_MS': None, 'SLOW_QUERY_MS': None}
+        apps = {'off': create_app({**config, 'METRICS_ENABLED': False}), 'on': create_app(config)}
+        with apps['on'].app_context():
+            db.create_all()
+            seed(args.doctors, args.visits)
+            headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+
+        clients = {name: app.test_client() for name, app in apps.items()}
+        for path in PATHS:
+            for client in clients.values():
+                for _ in range(WARMUP_REQUESTS):
+                    client.get(path, headers=headers)
+        timings = {(name, path): [] for name in apps for path in PATHS}
+        for _ in range(ROUNDS):
+            for path in PATHS:
+                for name, client in clients.items():
+                    timings[name, path].append(per_request_us(client, path, headers, per_round))
+
+        metrics = clients['on'].get('/metrics').get_data(as_text=True)
+        for app in apps.values():
+            app.extensions['jobs'].stop()
+
+    failed = False
+    for path, endpoint in PATHS.items():
+        off, on = (statistics.median(timings[name, path]) for name in ('off', 'on'))
+        counted = re.search(rf'medigo_requests_total{{endpoint="{re.escape(endpoint)}",method="GET",status="200"}} (\d+)',
+                            metrics)
+        counted = int(counted.group(1)) if counted else 0
+        failed |= counted != per_round * ROUNDS + WARMUP_REQUESTS
+        print(f'GET {path:<18} {off:8.1f} us without, {on:8.1f} us with metrics ({on - off:+6.1f} us, '
+              f'{(on - off) / off:+.1%}); {counted} of {per_round * ROUNDS + WARMUP_REQUESTS} requests counted')
+    print(f'/metrics body          {len(metrics)} bytes')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
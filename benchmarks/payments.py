@@ -0,0 +1,113 @@
+# benchmarks/payments.py
+"""Deposit latency against a slow, flaky gateway, plus an idempotency check.
+
+    python -m benchmarks.payments --payments 200 --latency 0.3 --failure-rate 0.1
+
+Every deposit is sent twice with the same Idempotency-Key. Exits non-zero
+unless each key produced exactly one payment row and one gateway
+execution, and every payment settled.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func, select
+
+from app import create_app, db
+from app.models import Chamber, Doctor, Payment, User, Visit
+from app.payments import COMPLETED
+from benchmarks.bkash_stub import start_stub
+
+
+def seed(visits):
+    db.session.add_all([
+        User(id=1, name='Patient'),
+        Doctor(id=1, name='Doctor', contact_number='01700000000'),
+        Chamber(id=1, location='Dhanmondi'),
+    ])
+    db.session.execute(Visit.__table__.insert(), [
+        {'chamber_id': 1, 'doctor_id': 1, 'booking_user_id': 1, 'patient_user_id': 1,
+         'appointment_time': datetime(2030, 1, 1, 9) + timedelta(minutes=15 * i), 'visit_status': 'scheduled'}
+        for i in range(visits)
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--payments', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.3, help='Gateway seconds per call.')
+    parser.add_argument('--failure-rate', type=float, default=0.1)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--settle-timeout', type=float, default=120)
+    args = parser.parse_args()
+
+    stub = start_stub(latency=args.latency, failure_rate=args.failure_rate)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db'),
+            'BKASH_BASE_URL': stub.base_url,
+            'JOB_WORKERS': 16,
+            'JOB_RETRY_BASE_SECONDS': 0.2,
+            'BKASH_POOL_SIZE': 16,
+            'PAYMENT_RECONCILE_INTERVAL': 1,
+            'PAYMENT_STALE_SECONDS': 1,
+        })
+        with app.app_context():
+            db.create_all()
+            seed(args.payments)
+            headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+
+        def deposit(visit_id):
+            key = uuid.uuid4().hex
+            timings = []
+            for _ in range(2):
+                started = time.perf_counter()
+                response = app.test_client().post('/payments/deposit', headers={**headers, 'Idempotency-Key': key}, json={
+                    'visit_id': visit_id, 'amount': 500.0, 'bkash_number': '01711111111'
+                })
+                timings.append((time.perf_counter() - started) * 1000)
+                assert response.status_code in (200, 202), response.get_data(as_text=True)
+            return timings
+
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            timings = [t for pair in pool.map(deposit, range(1, args.payments + 1)) for t in pair]
+
+        started = time.perf_counter()
+        with app.app_context():
+            while time.perf_counter() - started < args.settle_timeout:
+                unsettled = db.session.execute(
+                    select(func.count()).select_from(Payment).where(Payment.status != COMPLETED)
+                ).scalar()
+                if not unsettled:
+                    break
+                db.session.rollback()
+                time.sleep(0.2)
+            settle = time.perf_counter() - started
+            rows = db.session.execute(select(func.count()).select_from(Payment)).scalar()
+            paid = Visit.query.filter_by(payment_status='deposit_paid').count()
+        app.extensions['jobs'].stop(timeout=10)
+        app.extensions['payments'].shutdown()
+    stub.shutdown()
+
+    timings.sort()
+    print(f'gateway latency       {args.latency * 1000:.0f} ms, {args.failure_rate:.0%} of calls fail')
+    print(f'POST /payments/deposit p50 {statistics.median(timings):.1f} ms, '
+          f'p99 {timings[int(len(timings) * 0.99) - 1]:.1f} ms over {len(timings)} requests')
+    print(f'settled in            {settle:.1f}s after the last request ({unsettled} unsettled)')
+    print(f'payment rows          {rows} for {args.payments} keys; gateway executions {stub.executions}; '
+          f'gateway calls {stub.calls}; visits paid {paid}')
+
+    ok = rows == args.payments == stub.executions == paid and not unsettled
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
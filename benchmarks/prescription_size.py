@@ -0,0 +1,89 @@
+# benchmarks/prescription_size.py
+"""GET /visits latency with and without large prescriptions attached.
+
+    python -m benchmarks.prescription_size --visits 2000 --prescription-kb 64
+
+Prescriptions live in their own compressed table, so the list latency
+should not move when every visit carries a large one.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func, select
+
+from app import create_app, db
+from app.models import Chamber, Doctor, Prescription, User, Visit
+
+
+def seed(visits):
+    db.session.add_all([
+        User(id=1, name='Patient'),
+        Doctor(id=1, name='Doctor', contact_number='01700000000'),
+        Chamber(id=1, location='Dhanmondi'),
+    ])
+    db.session.execute(Visit.__table__.insert(), [
+        {'chamber_id': 1, 'doctor_id': 1, 'booking_user_id': 1, 'patient_user_id': 1,
+         'appointment_time': datetime(2030, 1, 1, 9) + timedelta(minutes=15 * i),
+         'visit_cost': 500.0, 'visit_status': 'completed'}
+        for i in range(visits)
+    ])
+    db.session.commit()
+
+
+def prescription(kb, rng):
+    notes = ' '.join(rng.choice(['take', 'after', 'meals', 'twice', 'daily', 'review', 'in', 'two', 'weeks'])
+                     for _ in range(kb * 160))
+    return {'medicines': [{'name': f'Medicine {i}', 'dose': '500mg'} for i in range(20)], 'notes': notes}
+
+
+def list_latency(client, headers, repeat):
+    timings = []
+    for _ in range(5):
+        client.get('/visits?limit=200', headers=headers)
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get('/visits?limit=200', headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--visits', type=int, default=2000)
+    parser.add_argument('--prescription-kb', type=int, default=64)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmp, 'bench.db')})
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+            seed(args.visits)
+            headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+
+            before = list_latency(client, headers, args.repeat)
+
+            content = prescription(args.prescription_kb, random.Random(42))
+            for visit_id in range(1, args.visits + 1):
+                db.session.add(Prescription(visit_id=visit_id, patient_user_id=1, doctor_id=1, content=content))
+            db.session.commit()
+            stored = db.session.execute(select(func.avg(func.length(Prescription.content)))).scalar()
+
+            after = list_latency(client, headers, args.repeat)
+
+    raw = len(app.json.dumps(content))
+    print(f'prescription size   {raw / 1024:.1f} KiB raw, {stored / 1024:.1f} KiB stored')
+    print(f'GET /visits p50     {before:.2f} ms without, {after:.2f} ms with prescriptions '
+          f'({(after - before) / before * 100:+.1f}%)')
+
+
+if __name__ == '__main__':
+    main()
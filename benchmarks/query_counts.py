@@ -0,0 +1,86 @@
+# benchmarks/query_counts.py
+"""Fail if a list endpoint issues more SQL statements than its loader plan allows.
+
+Seeds enough rows that a lazy load per row would blow the budget, then
+counts statements per request with a cursor-execute listener. Exits
+non-zero on regression so it can run in CI:
+
+    python -m benchmarks.query_counts
+"""
+import sys
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import create_app, db
+from app.identity import get_identity
+from app.models import Chamber, Doctor, Schedule, User, Visit
+from app.search import fts_available
+
+ROWS = 20
+
+# Statement budgets per request, independent of ROWS
+BUDGETS = {
+    '/doctors': 2,
+    '/doctors/1': 2,
+    '/chambers': 2,
+    '/chambers/1': 2,
+    '/visits': 1,
+    '/visits/1': 1,
+    '/users/1': 2,
+    '/users/1/dependents': 3,
+    '/users/1/family': 1,
+    '/users/41/family': 1,  # a grandchild: walks up to the owner, then down
+}
+
+
+def seed():
+    owner = User(id=1, name='Owner', email='owner@example.com')
+    db.session.add(owner)
+    for i in range(ROWS):
+        schedule = Schedule(time_slots={'weekday': ['09:00-12:00'], 'weekend': []})
+        chamber = Chamber(location=f'Chamber {i}', schedule=schedule)
+        doctor = Doctor(name=f'Doctor {i}', contact_number=f'0170000{i:04d}')
+        doctor.chambers.append(chamber)
+        dependent = User(name=f'Dependent {i}', is_primary_user=False, primary_user=owner)
+        db.session.add_all([schedule, chamber, doctor, dependent])
+        db.session.add(User(name=f'Grandchild {i}', is_primary_user=False, primary_user=dependent))
+        db.session.add(Visit(
+            doctor=doctor, chamber=chamber, booking_user_id=1, patient_user_id=1,
+            appointment_time=datetime(2030, 1, 1, 9) + timedelta(minutes=15 * i),
+            visit_status='scheduled'
+        ))
+    db.session.commit()
+
+
+def main():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    client = app.test_client()
+    statements = []
+
+    with app.app_context():
+        db.create_all()
+        seed()
+        # One-off per-engine probe and the token's identity, cached for
+        # later requests; neither is part of any request's budget
+        fts_available()
+        get_identity(1)
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *args: statements.append(args[2]))
+
+    failed = False
+    for path, budget in BUDGETS.items():
+        statements.clear()
+        response = client.get(path, headers=headers)
+        count = len(statements)
+        status = 'ok' if response.status_code == 200 and count <= budget else 'FAIL'
+        failed |= status == 'FAIL'
+        print(f'{status:<5}{path:<24}{count:>3} statements (budget {budget}, HTTP {response.status_code})')
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/query_plans.py
+"""Query-plan regression check: no route may fall back to a full table scan.
+
+Drives each route through the test client, captures every SELECT, UPDATE
+and DELETE it issues, and runs ``EXPLAIN QUERY PLAN`` on each. A plain
+``SCAN <table>`` of a guarded table fails the run (index scans are fine):
+
+    python -m benchmarks.query_plans
+"""
+import re
+import sys
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import Chamber, Doctor, Schedule, User, Visit
+from app.routes.visits import encode_cursor
+from app.search import fts_available, index_doctors
+
+GUARDED_TABLES = {'visit', 'doctor', 'chamber', 'user', 'doctor_specialization', 'doctor_hospital'}
+FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+def seed():
+    owner = User(id=1, name='Owner', email='owner@example.com', contact_number='01700000000')
+    db.session.add(owner)
+    for i in range(1, 21):
+        schedule = Schedule(time_slots={'weekday': ['09:00-12:00'], 'weekend': []})
+        chamber = Chamber(id=i, location=f'Road {i}, Dhanmondi', schedule=schedule)
+        doctor = Doctor(id=i, name=f'Doctor {i}', contact_number=f'0180000{i:04d}',
+                        specializations=['Cardiology'], hospital_affiliations=['DMCH'])
+        doctor.chambers.append(chamber)
+        db.session.add_all([schedule, chamber, doctor])
+        db.session.add(User(name=f'Dependent {i}', is_primary_user=False, primary_user=owner))
+        for j in range(5):
+            db.session.add(Visit(
+                doctor=doctor, chamber=chamber, booking_user_id=1, patient_user_id=1 + j,
+                appointment_time=datetime(2030, 1, 1, 9) + timedelta(minutes=15 * j),
+                visit_status='scheduled'
+            ))
+    db.session.flush()
+    index_doctors(Doctor.query.all())
+    db.session.commit()
+
+
+def requests(cursor):
+    return [
+        ('GET', '/visits?user_id=1', None),
+        ('GET', '/visits?doctor_id=1', None),
+        ('GET', '/visits?status=scheduled', None),
+        ('GET', '/visits?doctor_id=1&status=scheduled&from_date=2030-01-01&to_date=2030-01-02', None),
+        ('GET', f'/visits?user_id=1&cursor={cursor}', None),
+        ('GET', '/visits?limit=10', None),
+        ('GET', '/visits/1', None),
+        ('POST', '/visits', {'doctor_id': 1, 'chamber_id': 1, 'appointment_time': '2030-01-02T09:00:00'}),
+        ('GET', '/schedules/chamber/1/available-slots?date=2030-01-01&doctor_id=1', None),
+        ('GET', '/schedules/chamber/1/available-slots?from=2030-01-01&to=2030-01-31', None),
+        ('GET', '/doctors?specialization=Cardiology&hospital=DMCH', None),
+        ('GET', '/doctors?name=doctor 1&location=dhanmondi', None),
+        ('GET', '/doctors/1', None),
+        ('GET', '/chambers/1', None),
+        ('GET', '/chambers?location=road 1', None),
+        ('GET', '/users/1/dependents', None),
+    ]
+
+
+def main():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    client = app.test_client()
+    captured = []
+
+    with app.app_context():
+        db.create_all()
+        seed()
+        fts_available()
+        headers = {'Authorization': 'Bearer ' + create_access_token(identity='1')}
+        cursor = encode_cursor(db.session.get(Visit, 3))
+        engine = db.engine
+
+        def capture(conn, cursor_, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                captured.append((statement, parameters))
+
+        event.listen(engine, 'before_cursor_execute', capture)
+
+    failed = False
+    for method, path, body in requests(cursor):
+        captured.clear()
+        response = client.open(path, method=method, json=body, headers=headers)
+        scans = []
+        with app.app_context(), engine.connect() as connection:
+            for statement, parameters in list(captured):
+                plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                for row in plan:
+                    match = FULL_SCAN.match(row[-1])
+                    if match and match.group(1) in GUARDED_TABLES:
+                        scans.append((match.group(1), statement.split()[0]))
+
+        ok = response.status_code < 400 and not scans
+        failed |= not ok
+        detail = ', '.join(f'full scan of {table} in {kind}' for table, kind in scans)
+        print(f'{"ok" if ok else "FAIL":<5}{method:<5}{path:<80}{response.status_code} {detail}')
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/reminder_scheduler.py
+"""Per-operation cost of the reminder schedule as it grows to 1M visits.
+
+    python -m benchmarks.reminder_scheduler --visits 1000000
+
+Schedule should grow with log n and cancel stay flat; the table prints
+the mean cost of a batch of operations at each size.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from app.reminders import ReminderSchedule
+
+LEADS = [timedelta(hours=24), timedelta(hours=1)]
+
+
+def timed(operation, items):
+    started = time.perf_counter()
+    for item in items:
+        operation(*item)
+    return (time.perf_counter() - started) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--visits', type=int, default=1000000)
+    parser.add_argument('--sample', type=int, default=10000, help='Operations timed at each size.')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    now = datetime(2030, 1, 1)
+    horizon = 60 * 24 * 30  # a month of minutes
+
+    def visit(visit_id):
+        return visit_id, now + timedelta(minutes=rng.randrange(120, horizon))
+
+    schedule = ReminderSchedule(LEADS)
+    checkpoints = sorted({size for size in (1000, 10000, 100000, args.visits) if size <= args.visits})
+    next_id = 1
+
+    print(f'{"visits":>10}{"schedule us":>14}{"cancel us":>12}{"reschedule us":>16}{"pop_due us":>13}')
+    for size in checkpoints:
+        while len(schedule) < size:
+            schedule.schedule(*visit(next_id), now=now)
+            next_id += 1
+
+        new = [visit(visit_id) for visit_id in range(next_id, next_id + args.sample)]
+        next_id += args.sample
+        schedule_us = timed(lambda visit_id, at: schedule.schedule(visit_id, at, now=now), new)
+        cancel_us = timed(lambda visit_id, at: schedule.cancel(visit_id), new)
+        moved = [visit(rng.randrange(1, next_id)) for _ in range(args.sample)]
+        reschedule_us = timed(lambda visit_id, at: schedule.schedule(visit_id, at, now=now), moved)
+
+        # Pop whatever falls due in the next half hour
+        started = time.perf_counter()
+        due = schedule.pop_due(now + timedelta(minutes=30))
+        pop_us = (time.perf_counter() - started) / max(len(due), 1) * 1e6
+        print(f'{size:>10}{schedule_us:>14.2f}{cancel_us:>12.2f}{reschedule_us:>16.2f}{pop_us:>13.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/serializers.py
+"""Parity check and rows/sec microbenchmark: marshmallow vs compiled serializers.
+
+    python -m benchmarks.serializers --rows 2000
+
+Exits non-zero if any compiled serializer output differs from
+``schema.dump``.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.loaders import CHAMBER_PLAN, DOCTOR_PLAN, USER_PLAN, VISIT_PLAN
+from app.models import Chamber, Doctor, Schedule, User, Visit
+from app.schemas import ChamberSchema, DoctorSchema, UserSchema, VisitSchema
+from app.serializers import compile_serializer
+
+
+def seed(rows):
+    owner = User(name='Owner', email='owner@example.com', precondition_keywords=['asthma'])
+    db.session.add(owner)
+    for i in range(rows):
+        schedule = Schedule(time_slots={'weekday': ['09:00-12:00'], 'weekend': ['10:00']})
+        chamber = Chamber(location=f'House {i}, Road {i % 32}, Dhanmondi', schedule=schedule)
+        doctor = Doctor(name=f'Doctor {i}', contact_number=f'017{i:08d}',
+                        specializations=['Cardiology', 'Medicine'],
+                        hospital_affiliations=['DMCH'], degrees=['MBBS', 'FCPS'])
+        doctor.chambers.append(chamber)
+        db.session.add_all([schedule, chamber, doctor])
+        db.session.add(User(name=f'Dependent {i}', is_primary_user=False, primary_user=owner,
+                            precondition_keywords=[]))
+        db.session.add(Visit(
+            doctor=doctor, chamber=chamber, booking_user_id=1, patient_user_id=1,
+            appointment_time=datetime(2030, 1, 1, 9) + timedelta(minutes=15 * i),
+            visit_cost=500.0 + i, visit_status='scheduled', booking_remarks='Follow-up'
+        ))
+    db.session.commit()
+
+
+def rows_per_sec(dump, rows, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        dump(rows)
+    return len(rows) * repeat / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+    cases = [
+        ('DoctorSchema', DoctorSchema, Doctor, DOCTOR_PLAN),
+        ('ChamberSchema', ChamberSchema, Chamber, CHAMBER_PLAN),
+        ('VisitSchema', VisitSchema, Visit, VISIT_PLAN),
+        ('UserSchema', UserSchema, User, USER_PLAN),
+    ]
+
+    failed = False
+    with app.app_context():
+        db.create_all()
+        seed(args.rows)
+        print(f'{"schema":<16}{"parity":>8}{"marshmallow/s":>16}{"compiled/s":>14}{"speedup":>9}')
+        for name, schema_class, model, plan in cases:
+            rows = model.query.options(*plan).all()
+            schema = schema_class(many=True)
+            serialize = compile_serializer(schema_class())
+            compiled_dump = lambda objs: [serialize(obj) for obj in objs]
+
+            parity = schema.dump(rows) == compiled_dump(rows)
+            failed |= not parity
+            slow = rows_per_sec(schema.dump, rows, args.repeat)
+            fast = rows_per_sec(compiled_dump, rows, args.repeat)
+            print(f'{name:<16}{"ok" if parity else "FAIL":>8}{slow:>16.0f}{fast:>14.0f}{fast / slow:>8.1f}x')
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/startup.py
+"""Cold start: import, create_app and first response, each in a fresh interpreter.
+
+    python -m benchmarks.startup --runs 7 --output startup.json
+    python -m benchmarks.startup --baseline startup.json --tolerance 0.2
+
+Times ``import app``, ``create_app()`` and the first ``GET /doctors/1``
+with blueprints registered at startup and with LAZY_BLUEPRINTS. Exits
+non-zero if ``create_app`` imports NumPy, if the lazy app imports route
+modules or marshmallow before its first request, if the first request
+fails, or if a median total is worse than --baseline by more than
+--tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+MODES = {'eager': False, 'lazy': True}
+# Modules create_app must leave alone, and those only the lazy app may defer
+NEVER_AT_STARTUP = ('numpy',)
+DEFERRED_WHEN_LAZY = ('marshmallow', 'app.schemas', 'app.routes.users', 'app.routes.visits')
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1], "JOB_WORKERS": 0, "LAZY_BLUEPRINTS": sys.argv[2] == "1"})
+created = time.perf_counter()
+loaded = sorted(name for name in sys.argv[3:] if name in sys.modules)
+status = app.test_client().get("/doctors/1").status_code
+responded = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_response_ms": (responded - created) * 1000,
+    "total_ms": (responded - started) * 1000,
+    "loaded": loaded,
+    "status": status,
+}))
+'''
+
+SETUP = '''
+import sys
+from app import create_app, db
+from app.models import Doctor
+app = create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1], "JOB_WORKERS": 0})
+with app.app_context():
+    db.create_all()
+    db.session.add(Doctor(id=1, name="Doctor", contact_number="01700000000"))
+    db.session.commit()
+'''
+
+
+def run(code, *args):
+    output = subprocess.run([sys.executable, '-W', 'ignore', '-c', code, *args], check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1]) if output.strip() else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7, help='Fresh interpreters per mode.')
+    parser.add_argument('--output', help='Write the medians as JSON here.')
+    parser.add_argument('--baseline', help='Medians JSON from an earlier run to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression as a fraction.')
+    args = parser.parse_args()
+
+    problems = []
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database = 'sqlite:///' + os.path.join(tmp, 'startup.db')
+        run(SETUP, database)
+        for mode, lazy in MODES.items():
+            samples = [run(PROBE, database, '1' if lazy else '0', *NEVER_AT_STARTUP, *DEFERRED_WHEN_LAZY)
+                       for _ in range(args.runs)]
+            results[mode] = {key: round(statistics.median(sample[key] for sample in samples), 1)
+                             for key in ('import_ms', 'create_app_ms', 'first_response_ms', 'total_ms')}
+            sample = samples[-1]
+            unexpected = [name for name in sample['loaded']
+                          if name in NEVER_AT_STARTUP or (lazy and name in DEFERRED_WHEN_LAZY)]
+            if unexpected:
+                problems.append(f'{mode}: create_app imported {", ".join(unexpected)}')
+            if sample['status'] != 200:
+                problems.append(f'{mode}: first request answered HTTP {sample["status"]}')
+
+    print(f'{"mode":<8}{"import":>10}{"create_app":>12}{"first resp":>12}{"total":>10}   (median ms, {args.runs} runs)')
+    for mode, stats in results.items():
+        print(f'{mode:<8}{stats["import_ms"]:>10}{stats["create_app_ms"]:>12}{stats["first_response_ms"]:>12}'
+              f'{stats["total_ms"]:>10}')
+
+    if args.output:
+        with open(args.output, 'w') as fh:
+            json.dump(results, fh, indent=2)
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        for mode, stats in results.items():
+            before = baseline.get(mode, {}).get('total_ms')
+            if before and stats['total_ms'] > before * (1 + args.tolerance):
+                problems.append(f'{mode}: total {stats["total_ms"]} ms vs {before} ms')
+    for problem in problems:
+        print(f'FAIL {problem}')
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
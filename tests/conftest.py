@@ -0,0 +1,51 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.identity import identity_cache
+from app.payments import idempotency_cache
+from app.response_cache import directory_cache
+from app.slots import schedule_cache
+
+TEST_CONFIG = {
+    'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+    'JOB_WORKERS': 0,
+    'JWT_SECRET_KEY': 'test-secret-key-long-enough-for-hs256',
+    'BKASH_BASE_URL': 'http://bkash.invalid',
+    'PAYMENT_RECONCILE_INTERVAL': 0,
+}
+
+
+def clear_caches():
+    # Process-wide caches are keyed by row ids, which every test database reuses
+    identity_cache.clear()
+    idempotency_cache.clear()
+    directory_cache.invalidate()
+    schedule_cache.clear()
+
+
+def make_app(**config):
+    clear_caches()
+    app = create_app({**TEST_CONFIG, **config})
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def auth_headers(app, user_id):
+    with app.app_context():
+        return {'Authorization': 'Bearer ' + create_access_token(identity=str(user_id))}
+
+
+@pytest.fixture
+def app():
+    # Tests push their own app context around database work; requests
+    # through the test client push another, sharing the one in-memory
+    # connection, so leave no transaction open across a request
+    yield make_app()
+    clear_caches()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,104 @@
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import insert
+
+from app import analytics, db
+from app.models import Chamber, DailyRollup, Doctor, Visit
+
+MONDAY = date(2030, 1, 7)
+TUESDAY = date(2030, 1, 8)
+
+
+@pytest.fixture(params=['upsert', 'update_or_insert'])
+def app(request, app, monkeypatch):
+    if request.param == 'update_or_insert':
+        monkeypatch.delitem(analytics.UPSERT_DIALECTS, 'sqlite')
+    with app.app_context():
+        db.session.add_all([Chamber(id=1, location='Dhanmondi'), Chamber(id=2, location='Gulshan'),
+                            Doctor(id=1, name='Doctor', contact_number='01700000000')])
+        db.session.commit()
+    return app
+
+
+def rollup():
+    return {(row.day, row.doctor_id, row.chamber_id): (row.bookings, row.cancellations, row.cost_total,
+                                                       row.costed_visits)
+            for row in DailyRollup.query if row.bookings or row.payment_net}
+
+
+def book(hour, day=MONDAY, cost=None, chamber_id=1):
+    visit = Visit(doctor_id=1, chamber_id=chamber_id, visit_cost=cost, visit_status='scheduled',
+                  appointment_time=datetime.combine(day, datetime.min.time()).replace(hour=hour))
+    db.session.add(visit)
+    return visit
+
+
+def test_visit_writes_adjust_their_day(app):
+    with app.app_context():
+        first, second = book(9, cost=500), book(10, cost='700')
+        book(11)
+        db.session.commit()
+        assert rollup() == {(MONDAY, 1, 1): (3, 0, 1200, 2)}
+
+        first.visit_status = 'cancelled'
+        second.visit_cost = None
+        db.session.commit()
+        assert rollup() == {(MONDAY, 1, 1): (3, 1, 500, 1)}
+
+        first.appointment_time = datetime(2030, 1, 8, 9)
+        second.chamber_id = 2
+        db.session.commit()
+        assert rollup() == {(MONDAY, 1, 1): (1, 0, 0, 0), (TUESDAY, 1, 1): (1, 1, 500, 1),
+                            (MONDAY, 1, 2): (1, 0, 0, 0)}
+
+        db.session.delete(first)
+        db.session.commit()
+        assert rollup() == {(MONDAY, 1, 1): (1, 0, 0, 0), (MONDAY, 1, 2): (1, 0, 0, 0)}
+        assert analytics.check_parity() == []
+
+
+def test_expired_visits_subtract_their_stored_values(app):
+    with app.app_context():
+        visit = book(9, cost=500)
+        db.session.commit()
+        db.session.expire_all()
+        visit.visit_cost = 300
+        db.session.commit()
+        assert rollup() == {(MONDAY, 1, 1): (1, 0, 300, 1)}
+
+
+def test_rolled_back_writes_leave_the_rollup_alone(app):
+    with app.app_context():
+        book(9, cost=500)
+        db.session.flush()
+        db.session.rollback()
+        assert rollup() == {}
+
+
+def test_rebuild_picks_up_writes_outside_the_orm(app):
+    with app.app_context():
+        book(9, cost=500)
+        db.session.commit()
+        db.session.execute(insert(Visit), [{'doctor_id': 1, 'chamber_id': 1, 'visit_status': 'cancelled',
+                                            'appointment_time': datetime(2030, 1, 7, 10)}])
+        db.session.commit()
+        assert len(analytics.check_parity()) == 1
+
+        assert analytics.rebuild(use_numpy=False) == 1
+        assert rollup() == {(MONDAY, 1, 1): (2, 1, 500, 1)}
+        assert analytics.check_parity() == []
+
+
+def test_numpy_rebuild_matches_python(app):
+    if not analytics.numpy_available():
+        pytest.skip('NumPy is not installed')
+    with app.app_context():
+        for hour, day, cost, chamber_id in ((9, MONDAY, 500, 1), (10, MONDAY, None, 1), (9, TUESDAY, 250.5, 2)):
+            book(hour, day, cost, chamber_id)
+        db.session.commit()
+        analytics.rebuild(use_numpy=False)
+        expected = rollup()
+        analytics.rebuild(use_numpy=True)
+        assert rollup() == expected
+        assert analytics.check_parity() == []
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Chamber, Doctor, Schedule, User, Visit
+from app.routes.visits import waiting_cycles
+from tests.conftest import auth_headers
+
+SWAP_ERROR = 'Visits cannot swap slots in one batch; move one of them to a free slot first'
+
+
+@pytest.mark.parametrize('waits, expected', [
+    ({}, set()),
+    ({1: set(), 2: set()}, set()),
+    ({1: {2}, 2: {3}, 3: set()}, set()),
+    ({1: {2}, 2: {1}}, {1, 2}),
+    ({1: {2}, 2: {3}, 3: {1}, 4: {1}}, {1, 2, 3}),
+    ({1: {2}, 2: {1}, 3: {4}, 4: set()}, {1, 2}),
+])
+def test_waiting_cycles(waits, expected):
+    assert waiting_cycles(waits) == expected
+
+
+@pytest.fixture
+def visits(app):
+    """Visits booked by user 1 at 09:00, 09:15 and 09:30, and one of user 2's at 10:00."""
+    with app.app_context():
+        db.session.add_all([User(id=1, name='Owner'), User(id=2, name='Other')])
+        schedule = Schedule(time_slots={'weekday': ['09:00-11:00'], 'weekend': []})
+        chamber = Chamber(location='Dhanmondi', schedule=schedule)
+        doctor = Doctor(name='Doctor', contact_number='01700000000')
+        doctor.chambers.append(chamber)
+        db.session.add_all([schedule, chamber, doctor])
+        for minute, user_id in ((0, 1), (15, 1), (30, 1), (60, 2)):
+            db.session.add(Visit(chamber=chamber, doctor=doctor, booking_user_id=user_id, patient_user_id=user_id,
+                                 appointment_time=at(minute), visit_status='scheduled'))
+        db.session.commit()
+
+
+def at(minutes):
+    return datetime(2030, 1, 7, 9) + timedelta(minutes=minutes)
+
+
+def batch(app, *operations):
+    response = app.test_client().post('/visits/batch', json={'operations': list(operations)},
+                                      headers=auth_headers(app, 1))
+    assert response.status_code == 200
+    return [(result['status'], result.get('error')) for result in response.get_json()['results']]
+
+
+def appointment_times(app):
+    with app.app_context():
+        return {visit.id: visit.appointment_time for visit in Visit.query}
+
+
+def move(visit_id, minutes):
+    return {'id': visit_id, 'appointment_time': at(minutes).isoformat()}
+
+
+def test_moves_into_slots_vacated_by_the_batch(app, visits):
+    # 1 moves into the slot 2 leaves, although it is listed first
+    assert batch(app, move(1, 15), move(2, 45)) == [(200, None), (200, None)]
+    times = appointment_times(app)
+    assert (times[1], times[2]) == (at(15), at(45))
+
+
+def test_cancelled_visits_free_their_slot(app, visits):
+    assert batch(app, move(3, 15), {'id': 2, 'cancel': True}) == [(200, None), (200, None)]
+    assert appointment_times(app)[3] == at(15)
+
+
+def test_swaps_are_refused(app, visits):
+    assert batch(app, move(1, 15), move(2, 0)) == [(400, SWAP_ERROR), (400, SWAP_ERROR)]
+    assert batch(app, move(1, 15), move(2, 30), move(3, 0)) == [(400, SWAP_ERROR)] * 3
+    times = appointment_times(app)
+    assert (times[1], times[2], times[3]) == (at(0), at(15), at(30))
+
+
+def test_taken_slots_are_refused(app, visits):
+    results = batch(app, move(1, 60), move(2, 45), move(3, 45))
+    assert results == [(400, 'Time slot not available'), (200, None), (400, 'Time slot not available')]
+    # A refused move keeps its slot, so a move into it is refused too
+    assert batch(app, move(1, 60), move(2, 0)) == [(400, 'Time slot not available')] * 2
+
+
+def test_operations_fail_one_by_one(app, visits):
+    results = batch(app, {'id': 'one'}, {'id': 99}, {'id': 4, 'cancel': True},
+                    {'id': 1, 'visit_cost': 'free'}, {'id': 2, 'visit_status': 'completed'})
+    assert [status for status, _ in results] == [400, 404, 403, 400, 200]
+    with app.app_context():
+        assert db.session.get(Visit, 2).visit_status == 'completed'
+        assert db.session.get(Visit, 4).visit_status == 'scheduled'
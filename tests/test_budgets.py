@@ -0,0 +1,110 @@
+"""The benchmark regression guards, run under pytest.
+
+Each test reuses the seed data and limits of the matching
+``benchmarks`` script, so a budget changes in one place.
+"""
+import os
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.identity import get_identity
+from app.loaders import CHAMBER_PLAN, DOCTOR_PLAN, USER_PLAN, VISIT_PLAN
+from app.models import Chamber, Doctor, User, Visit
+from app.routes.visits import encode_cursor
+from app.schemas import ChamberSchema, DoctorSchema, UserSchema, VisitSchema
+from app.search import fts_available
+from app.serializers import compile_serializer
+from benchmarks import query_counts, query_plans, serializers, startup
+from tests.conftest import auth_headers, make_app
+
+
+@pytest.fixture(scope='module')
+def counted_client():
+    app = make_app()
+    statements = []
+    with app.app_context():
+        query_counts.seed()
+        # Per-engine probe and the token's identity are cached before any budgeted request
+        fts_available()
+        get_identity(1)
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+    return app.test_client(), auth_headers(app, 1), statements
+
+
+@pytest.mark.parametrize('path, budget', query_counts.BUDGETS.items())
+def test_statement_budget(counted_client, path, budget):
+    client, headers, statements = counted_client
+    statements.clear()
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert len(statements) <= budget, statements
+
+
+@pytest.fixture(scope='module')
+def planned_client():
+    app = make_app()
+    captured = []
+    with app.app_context():
+        query_plans.seed()
+        fts_available()
+        cursor = encode_cursor(db.session.get(Visit, 3))
+        engine = db.engine
+
+        def capture(conn, cursor_, statement, parameters, context, executemany):
+            if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                captured.append((statement, parameters))
+
+        event.listen(engine, 'before_cursor_execute', capture)
+    return app, auth_headers(app, 1), query_plans.requests(cursor), captured
+
+
+@pytest.mark.parametrize('index', range(len(query_plans.requests(''))),
+                         ids=[f'{method} {path}' for method, path, _ in query_plans.requests('')])
+def test_no_full_table_scan(planned_client, index):
+    app, headers, requests, captured = planned_client
+    method, path, body = requests[index]
+    captured.clear()
+    response = app.test_client().open(path, method=method, json=body, headers=headers)
+    assert response.status_code < 400
+
+    scans = []
+    with app.app_context(), db.engine.connect() as connection:
+        for statement, parameters in list(captured):
+            for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters):
+                match = query_plans.FULL_SCAN.match(row[-1])
+                if match and match.group(1) in query_plans.GUARDED_TABLES:
+                    scans.append((match.group(1), statement))
+    assert not scans
+
+
+@pytest.mark.parametrize('schema_class, model, plan', [
+    (DoctorSchema, Doctor, DOCTOR_PLAN),
+    (ChamberSchema, Chamber, CHAMBER_PLAN),
+    (VisitSchema, Visit, VISIT_PLAN),
+    (UserSchema, User, USER_PLAN),
+], ids=['doctor', 'chamber', 'visit', 'user'])
+def test_compiled_serializer_matches_schema(app, schema_class, model, plan):
+    with app.app_context():
+        serializers.seed(25)
+        rows = model.query.options(*plan).all()
+        serialize = compile_serializer(schema_class())
+        assert [serialize(row) for row in rows] == schema_class(many=True).dump(rows)
+
+
+@pytest.fixture(scope='module')
+def startup_database(tmp_path_factory):
+    database = 'sqlite:///' + os.path.join(tmp_path_factory.mktemp('startup'), 'startup.db')
+    startup.run(startup.SETUP, database)
+    return database
+
+
+@pytest.mark.parametrize('lazy', startup.MODES.values(), ids=startup.MODES.keys())
+def test_startup_imports(startup_database, lazy):
+    sample = startup.run(startup.PROBE, startup_database, '1' if lazy else '0',
+                         *startup.NEVER_AT_STARTUP, *startup.DEFERRED_WHEN_LAZY)
+    assert sample['status'] == 200
+    unexpected = [name for name in sample['loaded']
+                  if name in startup.NEVER_AT_STARTUP or (lazy and name in startup.DEFERRED_WHEN_LAZY)]
+    assert not unexpected
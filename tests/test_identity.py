@@ -0,0 +1,86 @@
+from app import db
+from app.identity import Identity, IdentityCache, get_identity, identity_cache
+from app.models import User
+
+
+def identity(user_id, *acts_for):
+    return Identity(user_id, None, frozenset((user_id, *acts_for)))
+
+
+def test_invalidating_a_member_drops_identities_that_act_for_it():
+    cache = IdentityCache()
+    cache.store(1, cache.version, identity(1, 2))
+    cache.store(3, cache.version, identity(3))
+    cache.invalidate([2])
+    assert cache.get(1) is None
+    assert cache.get(3) is not None
+
+
+def test_a_load_that_raced_a_change_is_not_stored():
+    cache = IdentityCache()
+    started = cache.version
+    cache.invalidate([2])
+    cache.store(1, started, identity(1, 2))
+    assert cache.get(1) is None
+    # Changes to users outside the identity do not matter
+    cache.store(3, started, identity(3))
+    assert cache.get(3) is not None
+    cache.store(1, cache.version, identity(1, 2))
+    assert cache.get(1) is not None
+
+
+def test_loads_older_than_forgotten_changes_are_not_stored():
+    cache = IdentityCache(maxsize=2)
+    started = cache.version
+    for user_id in (10, 11, 12):
+        cache.invalidate([user_id])
+    # The change to user 10 was forgotten, so the load cannot be checked against it
+    cache.store(1, started, identity(1))
+    assert cache.get(1) is None
+    cache.store(1, cache.version, identity(1))
+    assert cache.get(1) is not None
+
+
+def seed_family():
+    owner = User(id=1, name='Owner')
+    child = User(id=2, name='Child', is_primary_user=False, primary_user=owner)
+    grandchild = User(id=3, name='Grandchild', is_primary_user=False, primary_user=child)
+    db.session.add_all([owner, child, grandchild, User(id=4, name='Stranger')])
+    db.session.commit()
+
+
+def test_identity_acts_for_the_whole_subtree(app):
+    with app.app_context():
+        seed_family()
+        owner, child = get_identity(1), get_identity(2)
+        assert owner.acts_for == {1, 2, 3}
+        assert owner.primary_user_id is None
+        assert child.acts_for == {2, 3}
+        assert child.primary_user_id == 1
+        assert get_identity(99) is None
+
+
+def test_committed_user_changes_invalidate_cached_identities(app):
+    with app.app_context():
+        seed_family()
+        get_identity(1)
+        db.session.add(User(id=5, name='Newborn', is_primary_user=False, primary_user_id=3))
+        db.session.commit()
+        assert get_identity(1).acts_for == {1, 2, 3, 5}
+
+        # Moving a dependent away updates both the old and the new owner
+        get_identity(4)
+        db.session.get(User, 2).primary_user_id = 4
+        db.session.commit()
+        assert get_identity(1).acts_for == {1}
+        assert get_identity(4).acts_for == {2, 3, 4, 5}
+
+
+def test_rolled_back_changes_keep_cached_identities(app):
+    with app.app_context():
+        seed_family()
+        cached = get_identity(1)
+        db.session.add(User(id=5, name='Newborn', is_primary_user=False, primary_user_id=1))
+        db.session.flush()
+        db.session.rollback()
+        assert identity_cache.get(1) is cached
@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.jobs import DEAD, DONE, QUEUED, RUNNING, enqueue, job, retry_dead
+from app.models import Job
+from tests.conftest import make_app
+
+calls = []
+
+
+@job('tests.record')
+def record(payload, job):
+    calls.append((payload, job.attempts))
+    if payload.get('fail_until', 0) > len(calls):
+        raise RuntimeError('try again')
+
+
+@pytest.fixture
+def app():
+    calls.clear()
+    # No backoff, so a failed job is ready again at once
+    return make_app(JOB_RETRY_BASE_SECONDS=0)
+
+
+@pytest.fixture
+def pool(app):
+    return app.extensions['jobs']
+
+
+def queue(app, *args, **kwargs):
+    with app.app_context():
+        queued = enqueue(*args, **kwargs)
+        db.session.commit()
+        return queued and queued.id
+
+
+def get_job(app, job_id):
+    with app.app_context():
+        return db.session.get(Job, job_id)
+
+
+def test_job_runs_once(app, pool):
+    job_id = queue(app, 'tests.record', {'n': 1})
+    assert pool.run_once()
+    assert not pool.run_once()
+    assert calls == [({'n': 1}, 1)]
+    assert get_job(app, job_id).status == DONE
+    assert pool.metrics.snapshot()['completed'] == 1
+
+
+def test_failures_are_retried_until_they_succeed(app, pool):
+    job_id = queue(app, 'tests.record', {'fail_until': 3})
+    while pool.run_once():
+        pass
+    finished = get_job(app, job_id)
+    assert (finished.status, finished.attempts, finished.last_error) == (DONE, 3, None)
+    assert pool.metrics.snapshot()['retried'] == 2
+
+
+def test_exhausted_jobs_are_dead_until_retried(app, pool):
+    job_id = queue(app, 'tests.record', {'fail_until': 5}, max_attempts=2)
+    while pool.run_once():
+        pass
+    dead = get_job(app, job_id)
+    assert (dead.status, dead.attempts, dead.last_error) == (DEAD, 2, 'RuntimeError: try again')
+    assert pool.metrics.snapshot()['dead'] == 1
+
+    with app.app_context():
+        assert retry_dead(job_id)
+        assert not retry_dead(job_id)
+        db.session.commit()
+    assert get_job(app, job_id).status == QUEUED
+    while pool.run_once():
+        pass
+    # A fresh attempt budget: two more failures, then dead again
+    assert len(calls) == 4
+    assert get_job(app, job_id).status == DEAD
+
+
+def test_jobs_without_a_handler_die_at_once(app, pool):
+    job_id = queue(app, 'tests.missing')
+    assert pool.run_once()
+    dead = get_job(app, job_id)
+    assert (dead.status, dead.attempts) == (DEAD, 1)
+    assert 'tests.missing' in dead.last_error
+
+
+def test_a_key_holds_at_most_one_pending_job(app, pool):
+    first = queue(app, 'tests.record', key='k')
+    assert queue(app, 'tests.record', key='k') is None
+    pool.run_once()
+    assert queue(app, 'tests.record', key='k') not in (None, first)
+
+
+def test_rolled_back_jobs_are_never_run(app, pool):
+    with app.app_context():
+        enqueue('tests.record')
+        db.session.rollback()
+    assert not pool.run_once()
+
+
+def test_jobs_left_running_are_reclaimed(app, pool):
+    job_id = queue(app, 'tests.record')
+    with app.app_context():
+        crashed = db.session.get(Job, job_id)
+        crashed.status, crashed.attempts = RUNNING, 1
+        crashed.started_time = datetime.utcnow() - timedelta(seconds=app.config['JOB_VISIBILITY_TIMEOUT'] - 5)
+        db.session.commit()
+    assert not pool.run_once()
+
+    with app.app_context():
+        db.session.get(Job, job_id).started_time -= timedelta(seconds=10)
+        db.session.commit()
+    assert pool.run_once()
+    assert calls == [({}, 2)]
+    assert get_job(app, job_id).status == DONE
+
+
+def test_backoff_doubles_up_to_the_limit():
+    app = make_app(JOB_RETRY_BASE_SECONDS=2.0, JOB_RETRY_MAX_SECONDS=10.0)
+    pool = app.extensions['jobs']
+    for attempts, ceiling in ((1, 2), (2, 4), (3, 8), (4, 10), (10, 10)):
+        delay = pool.backoff(attempts).total_seconds()
+        assert ceiling / 2 <= delay <= ceiling
@@ -0,0 +1,155 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from app import db
+from app.gateway import GatewayError, GatewayUnavailable
+from app.models import Chamber, DailyRollup, Doctor, Job, Payment, User, Visit, chamber_operator
+from tests.conftest import auth_headers
+
+
+class FakeGateway:
+    """Records calls; each call pops its outcome from ``outcomes`` (success when empty)."""
+
+    def __init__(self, *outcomes, known=None):
+        self.outcomes = list(outcomes)
+        self.known = known or {}
+        self.calls = []
+
+    def _respond(self, method, reference, *args):
+        self.calls.append((method, reference, *args))
+        outcome = self.outcomes.pop(0) if self.outcomes else None
+        if isinstance(outcome, Exception):
+            raise outcome
+        return {'trxID': f'TRX-{len(self.calls)}'}
+
+    def deposit(self, reference, amount, bkash_number, transaction_id=None):
+        return self._respond('deposit', reference, amount)
+
+    def refund(self, reference, amount, transaction_id):
+        return self._respond('refund', reference, amount, transaction_id)
+
+    def query(self, reference):
+        self.calls.append(('query', reference))
+        return self.known.get(reference)
+
+
+@pytest.fixture
+def visit(app):
+    """Visit 1, booked by user 1 at a chamber user 2 operates."""
+    with app.app_context():
+        db.session.add_all([User(id=1, name='Patient'), User(id=2, name='Operator'), User(id=3, name='Other')])
+        chamber = Chamber(id=1, location='Dhanmondi')
+        doctor = Doctor(id=1, name='Doctor', contact_number='01700000000')
+        db.session.add_all([chamber, doctor, Visit(
+            id=1, chamber=chamber, doctor=doctor, booking_user_id=1, patient_user_id=1,
+            appointment_time=datetime(2030, 1, 7, 9), visit_status='scheduled'
+        )])
+        db.session.execute(insert(chamber_operator).values(chamber_id=1, operator_id=2))
+        db.session.commit()
+
+
+@pytest.fixture
+def gateway(app):
+    fake = app.extensions['payments'].client = FakeGateway()
+    return fake
+
+
+def post(app, kind, user_id, key='key-1', **body):
+    body = {'visit_id': 1, 'amount': 500, 'bkash_number': '01711111111', **body}
+    headers = {**auth_headers(app, user_id), 'Idempotency-Key': key} if key else auth_headers(app, user_id)
+    return app.test_client().post(f'/payments/{kind}', json=body, headers=headers)
+
+
+def run_jobs(app):
+    pool = app.extensions['jobs']
+    while pool.run_once():
+        pass
+
+
+def state(app, payment_id):
+    with app.app_context():
+        payment = db.session.get(Payment, payment_id)
+        return payment.status, payment.attempts, db.session.get(Visit, payment.visit_id).payment_status
+
+
+def test_deposits_are_recorded_once_per_key(app, visit):
+    first = post(app, 'deposit', 1)
+    assert first.status_code == 202
+    assert first.get_json()['status'] == 'pending'
+
+    replay = post(app, 'deposit', 1)
+    assert replay.status_code == 200
+    assert replay.get_json()['id'] == first.get_json()['id']
+    assert post(app, 'deposit', 1, amount=600).status_code == 422
+    # Only the booking user's family may pay for the visit
+    assert post(app, 'deposit', 3).status_code == 403
+    with app.app_context():
+        assert Payment.query.count() == 1
+        assert Job.query.filter_by(name='payments.process').count() == 1
+
+
+def test_requests_without_a_key_or_access_are_refused(app, visit):
+    assert post(app, 'deposit', 1, key=None).status_code == 400
+    assert post(app, 'deposit', 1, key='k' * 81).status_code == 400
+    assert post(app, 'refund', 1).status_code == 403
+    assert post(app, 'deposit', 1, visit_id=99).status_code == 404
+
+
+def test_deposit_then_refund(app, visit, gateway):
+    deposit_id = post(app, 'deposit', 1).get_json()['id']
+    run_jobs(app)
+    assert state(app, deposit_id) == ('completed', 1, 'deposit_paid')
+
+    refund = post(app, 'refund', 2, key='refund-1')
+    assert refund.status_code == 202
+    run_jobs(app)
+    assert state(app, refund.get_json()['id']) == ('refunded', 1, 'refunded')
+    # The refund names the deposit's gateway transaction
+    assert gateway.calls[-1] == ('refund', '2:refund-1', 500, 'TRX-1')
+    with app.app_context():
+        # Both settled on the same day, so the day's net is back to zero
+        assert sum(row.payment_net for row in DailyRollup.query) == 0
+
+
+def test_unreachable_gateway_is_retried(app, visit, gateway):
+    app.config['JOB_RETRY_BASE_SECONDS'] = 0
+    gateway.outcomes = [GatewayUnavailable('timeout'), GatewayUnavailable('timeout')]
+    payment_id = post(app, 'deposit', 1).get_json()['id']
+    run_jobs(app)
+    assert state(app, payment_id) == ('completed', 3, 'deposit_paid')
+    # Every attempt carried the same reference, so the gateway charges once
+    assert {call[1] for call in gateway.calls} == {'1:key-1'}
+
+
+def test_last_unreachable_attempt_fails_the_payment(app, visit, gateway):
+    app.config.update(JOB_RETRY_BASE_SECONDS=0, PAYMENT_MAX_ATTEMPTS=2)
+    gateway.outcomes = [GatewayUnavailable('timeout')] * 2
+    payment_id = post(app, 'deposit', 1).get_json()['id']
+    run_jobs(app)
+    assert state(app, payment_id) == ('failed', 2, None)
+
+
+def test_declined_payments_fail_without_retry(app, visit, gateway):
+    gateway.outcomes = [GatewayError('Insufficient balance')]
+    payment_id = post(app, 'deposit', 1).get_json()['id']
+    run_jobs(app)
+    assert state(app, payment_id) == ('failed', 1, None)
+    with app.app_context():
+        assert db.session.get(Payment, payment_id).last_error == 'Insufficient balance'
+
+
+def test_reconciliation_adopts_what_the_gateway_recorded(app, visit, gateway):
+    payment_id = post(app, 'deposit', 1).get_json()['id']
+    gateway.known['1:key-1'] = {'trxID': 'TRX-EARLIER'}
+    with app.app_context():
+        db.session.query(Job).delete()
+        db.session.commit()
+    app.config['PAYMENT_STALE_SECONDS'] = -1
+    assert app.extensions['payments'].reconcile() == 1
+    run_jobs(app)
+    assert state(app, payment_id) == ('completed', 1, 'deposit_paid')
+    assert gateway.calls == [('query', '1:key-1')]
+    with app.app_context():
+        assert db.session.get(Payment, payment_id).transaction_id == 'TRX-EARLIER'
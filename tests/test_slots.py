@@ -0,0 +1,125 @@
+from datetime import date, datetime
+
+import pytest
+
+from app import db
+from app.models import Chamber, Doctor, Schedule, Visit
+from app.slots import (
+    ScheduleError, booked_slots, calculate_available_slots, compile_schedule, get_compiled_schedule, schedule_cache
+)
+
+MONDAY = date(2030, 1, 7)
+FRIDAY = date(2030, 1, 11)
+
+
+def slot(minutes, slot_minutes=15):
+    return 1 << (minutes // slot_minutes)
+
+
+def test_ranges_and_single_slots():
+    compiled = compile_schedule({'weekday': ['09:00-10:00', '14:30'], 'weekend': ['10:00']})
+    expected = sum(slot(minute) for minute in range(9 * 60, 10 * 60, 15)) | slot(14 * 60 + 30)
+    assert compiled.day_mask(MONDAY) == expected
+    assert compiled.day_mask(FRIDAY) == slot(10 * 60)
+
+
+def test_slot_objects_and_length():
+    compiled = compile_schedule({'slot_minutes': 30, 'weekday': [{'start': '09:00', 'end': '10:15'}, {'start': '12:00'}]})
+    # A range ending mid-slot still covers that slot
+    assert compiled.day_mask(MONDAY) == slot(540, 30) | slot(570, 30) | slot(600, 30) | slot(720, 30)
+    assert compiled.slot_index(datetime(2030, 1, 7, 9, 45)) == 19
+
+
+def test_weekend_days_and_exceptions():
+    compiled = compile_schedule({
+        'weekday': ['09:00'],
+        'weekend': [],
+        'weekend_days': [5, 6],
+        'exceptions': ['2030-01-07', {'date': '2030-01-08', 'slots': ['11:00']}],
+    })
+    assert compiled.day_mask(FRIDAY) == slot(540)
+    assert compiled.day_mask(date(2030, 1, 12)) == 0
+    assert compiled.day_mask(MONDAY) == 0
+    assert compiled.day_mask(date(2030, 1, 8)) == slot(660)
+
+
+def test_range_is_clipped_to_the_day():
+    compiled = compile_schedule({'weekday': ['23:30-24:00'], 'slot_minutes': 15})
+    assert compiled.day_mask(MONDAY) == slot(23 * 60 + 30) | slot(23 * 60 + 45)
+
+
+@pytest.mark.parametrize('time_slots', [
+    ['09:00'],
+    {'slot_minutes': -15},
+    {'slot_minutes': 'quarter'},
+    {'weekend_days': [7]},
+    {'weekday': '09:00'},
+    {'weekday': ['9am']},
+    {'weekday': ['09:60']},
+    {'weekday': [{'end': '10:00'}]},
+    {'exceptions': {'date': '2030-01-01'}},
+    {'exceptions': ['01/01/2030']},
+])
+def test_malformed_schedules_are_rejected(time_slots):
+    with pytest.raises(ScheduleError):
+        compile_schedule(time_slots)
+
+
+def seed_chamber(doctors=2):
+    schedule = Schedule(time_slots={'weekday': ['09:00-10:00'], 'weekend': []})
+    chamber = Chamber(location='Dhanmondi', schedule=schedule)
+    members = [Doctor(name=f'Doctor {i}', contact_number=f'0170000000{i}') for i in range(doctors)]
+    for doctor in members:
+        doctor.chambers.append(chamber)
+    db.session.add_all([schedule, chamber, *members])
+    db.session.flush()
+    return chamber, members
+
+
+def book(chamber, doctor, hour, minute, status='scheduled'):
+    db.session.add(Visit(chamber=chamber, doctor=doctor, appointment_time=datetime(2030, 1, 7, hour, minute),
+                         visit_status=status))
+
+
+def test_slots_are_booked_per_doctor(app):
+    with app.app_context():
+        chamber, (first, second) = seed_chamber()
+        book(chamber, first, 9, 0)
+        book(chamber, first, 9, 15)
+        book(chamber, second, 9, 15)
+        book(chamber, second, 9, 30, status='cancelled')
+        db.session.commit()
+        compiled = compile_schedule(chamber.schedule.time_slots)
+
+        assert booked_slots(compiled, chamber.id, first.id, MONDAY, MONDAY) == {MONDAY: slot(540) | slot(555)}
+        assert booked_slots(compiled, chamber.id, second.id, MONDAY, MONDAY) == {MONDAY: slot(555)}
+        # A chamber slot is only taken once every doctor holds it
+        assert booked_slots(compiled, chamber.id, None, MONDAY, MONDAY) == {MONDAY: slot(555)}
+
+        available = calculate_available_slots(compiled, chamber.id, None, MONDAY, FRIDAY)
+        assert [moment.strftime('%H:%M') for moment in available[MONDAY]] == ['09:00', '09:30', '09:45']
+        assert available[FRIDAY] == []
+        assert len(available[date(2030, 1, 8)]) == 4
+
+
+def test_a_doctor_without_visits_keeps_the_chamber_slot_free(app):
+    with app.app_context():
+        chamber, (first, _) = seed_chamber()
+        book(chamber, first, 9, 0)
+        db.session.commit()
+        compiled = compile_schedule(chamber.schedule.time_slots)
+        assert booked_slots(compiled, chamber.id, None, MONDAY, MONDAY) == {}
+
+
+def test_compiled_schedule_is_recompiled_for_a_new_version(app):
+    with app.app_context():
+        chamber, _ = seed_chamber(doctors=1)
+        db.session.commit()
+        schedule = chamber.schedule
+        assert get_compiled_schedule(schedule.id, schedule.version).day_mask(MONDAY) == 0b1111 << 36
+
+        schedule.time_slots = {'weekday': ['11:00'], 'weekend': []}
+        schedule.version += 1
+        db.session.commit()
+        assert schedule_cache.lookup(schedule.id, schedule.version) is None
+        assert get_compiled_schedule(schedule.id, schedule.version).day_mask(MONDAY) == slot(660)